@@ -3,4 +3,6 @@ set -o errexit
 
 pip install -r requirements.txt
 python manage.py collectstatic --noinput
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+python manage.py createcachetable
+python manage.py generate_thumbnails
@@ -1,10 +1,12 @@
 from django.contrib import admin
+from django.db.models import Count
 from django.utils import timezone
 from .models import (
     VendingProduct, 
     CustomerSession, 
     PurchaseRecord, 
-    MoneyTransaction
+    MoneyTransaction,
+    CashFloat
 )
 
 
@@ -53,6 +55,9 @@ class PurchaseRecordInline(admin.TabularInline):
         return mauritius_time(obj)
     formatted_timestamp.short_description = 'Purchase Time'
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
     def has_add_permission(self, request, obj=None):
         return False
 
@@ -93,6 +98,10 @@ class CustomerSessionAdmin(admin.ModelAdmin):
     search_fields = ['customer_id']
     readonly_fields = ['session_start', 'formatted_session_time']
     ordering = ['-session_start']
+
+    # Large table: no unfiltered COUNT(*) next to search results, no facet counts
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
     
     inlines = [PurchaseRecordInline, MoneyTransactionInline]
 
@@ -109,9 +118,14 @@ class CustomerSessionAdmin(admin.ModelAdmin):
         return mauritius_time(obj)
     formatted_session_time.short_description = 'Session Time'
 
+    def get_queryset(self, request):
+        # Count the purchase lines in the changelist query instead of once per row
+        return super().get_queryset(request).annotate(line_count=Count('transactions'))
+
     def purchase_count(self, obj):
-        return obj.transactions.count()
+        return obj.line_count
     purchase_count.short_description = 'Items Purchased'
+    purchase_count.admin_order_field = 'line_count'
 
     def get_session_total(self, obj):
         return f"Rs {obj.final_total:.2f}"
@@ -134,7 +148,12 @@ class PurchaseRecordAdmin(admin.ModelAdmin):
     list_filter = ['transaction_type', 'timestamp']
     search_fields = ['product__product_name', 'customer_session__customer_id']
     readonly_fields = ['formatted_timestamp']
-    date_hierarchy = 'timestamp'
+    list_select_related = ['customer_session', 'product']
+
+    # Large table: the timestamp filter replaces date_hierarchy, whose
+    # drill-down runs a DISTINCT over every row's date on each page view
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
 
     def get_customer_name(self, obj):
         return obj.customer_session.customer_id
@@ -168,6 +187,11 @@ class MoneyTransactionAdmin(admin.ModelAdmin):
     ]
     list_filter = ['type', 'timestamp']
     search_fields = ['session__customer_id']
+    list_select_related = ['session']
+
+    # Large table: no unfiltered COUNT(*) next to search results, no facet counts
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
 
     def get_customer_name(self, obj):
         return obj.session.customer_id
@@ -192,6 +216,19 @@ class MoneyTransactionAdmin(admin.ModelAdmin):
 
 
 
+@admin.register(CashFloat)
+class CashFloatAdmin(admin.ModelAdmin):
+    list_display = ['denomination', 'count', 'get_total_amount']
+    list_editable = ['count']
+    ordering = ['-denomination']
+
+    def get_total_amount(self, obj):
+        return f"Rs {obj.denomination * obj.count:.2f}"
+    get_total_amount.short_description = 'Total Amount'
+
+
+
+
 # Admin
 admin.site.site_header = "Polytechnic Ebene Vending Machine Administration"
 admin.site.site_title = "Vending Machine Admin"
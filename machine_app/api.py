@@ -1,25 +1,185 @@
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import add_never_cache_headers
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.db import transaction
+from django.db.models import Q, Sum
 from decimal import Decimal
+import base64
+import csv
 import json
 
-from .models import VendingProduct, PurchaseRecord, CustomerSession, MoneyTransaction
+from .models import (
+    VendingProduct, PurchaseRecord, CustomerSession, MoneyTransaction, SalesRollup, CashRollup
+)
+from .ledger import CheckoutLedger
+from .pricing import price_cart
+from .catalogue import get_products
+from .conditional import catalogue_etag, history_conditions
+from .events import events_since, last_event_id, long_poll_slot
+from .change import ChangeUnavailable, settle_payment
+from .sqlite_tuning import immediate_atomic
+from .metrics import metrics_store
+
+# History page sizes
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Rows fetched per database round trip when streaming an export
+EXPORT_CHUNK_SIZE = 2000
+
+
+# ---------------------------
+# HISTORY PAGINATION HELPERS
+# ---------------------------
+def encode_cursor(timestamp, pk):
+    """Encode a (timestamp, id) position as an opaque cursor string"""
+    raw = json.dumps([timestamp.isoformat(), pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor back to (timestamp, id)"""
+    try:
+        timestamp, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        parsed = parse_datetime(timestamp)
+        if parsed is None:
+            raise ValueError
+        return parsed, int(pk)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def parse_time_param(value, name):
+    """Parse a since/until query parameter into an aware datetime"""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid '{name}' timestamp")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def filter_history(request, queryset, time_field, customer_field):
+    """Apply the ?since= / ?until= / ?customer_id= filters to a history queryset"""
+    params = request.GET
+
+    if params.get('since'):
+        queryset = queryset.filter(**{f"{time_field}__gte": parse_time_param(params['since'], 'since')})
+    if params.get('until'):
+        queryset = queryset.filter(**{f"{time_field}__lt": parse_time_param(params['until'], 'until')})
+    if params.get('customer_id'):
+        queryset = queryset.filter(**{customer_field: params['customer_id']})
+    return queryset
+
+
+def paginate_history(request, queryset, time_field, customer_field):
+    """
+    Keyset-paginate a history queryset, newest first, on (time_field, id).
+
+    Supports ?since= / ?until= time windows, ?customer_id= and ?cursor=,
+    and returns (rows, next_cursor). Raises ValueError on bad parameters.
+    """
+    params = request.GET
+
+    try:
+        limit = int(params.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("Invalid 'limit'")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    queryset = filter_history(request, queryset, time_field, customer_field)
+
+    if params.get('cursor'):
+        cursor_time, cursor_id = decode_cursor(params['cursor'])
+        queryset = queryset.filter(
+            Q(**{f"{time_field}__lt": cursor_time}) |
+            Q(**{time_field: cursor_time, "id__lt": cursor_id})
+        )
+
+    rows = list(queryset.order_by(f"-{time_field}", "-id")[:limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if isinstance(last, dict):
+            next_cursor = encode_cursor(last[time_field], last['id'])
+        else:
+            next_cursor = encode_cursor(getattr(last, time_field), last.id)
+
+    return rows, next_cursor
+
+
+# ---------------------------
+# HISTORY EXPORT HELPERS
+# ---------------------------
+class Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def export_value(value):
+    """Convert a database value into something JSON/CSV friendly"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, 'strftime'):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return value
 
-# Valid money denominations (in Rs)
-VALID_DENOMINATIONS = [5, 10, 20, 25, 50, 100, 200]
+
+def stream_export(queryset, columns, export_format, filename):
+    """
+    Stream a history queryset as NDJSON or CSV.
+
+    `columns` maps output names to ORM lookups. Rows are read with
+    values_list().iterator() so only one chunk is held in memory at a time.
+    """
+    rows = queryset.values_list(*columns.values()).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    names = list(columns.keys())
+
+    if export_format == 'csv':
+        writer = csv.writer(Echo())
+
+        def lines():
+            yield writer.writerow(names)
+            for row in rows:
+                yield writer.writerow([export_value(v) for v in row])
+
+        content_type = 'text/csv'
+    else:
+        def lines():
+            for row in rows:
+                yield json.dumps(dict(zip(names, map(export_value, row)))) + "\n"
+
+        content_type = 'application/x-ndjson'
+
+    response = StreamingHttpResponse(lines(), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
 
 
 # ---------------------------
 # PRODUCTS API
 # ---------------------------
 @csrf_exempt
+@condition(etag_func=catalogue_etag)
 def products_api(request):
     """List all products or create a new one"""
     if request.method == 'GET':
-        products = list(VendingProduct.objects.values(
-            'id', 'product_name', 'cost', 'available_quantity', 'category', 'is_available'
-        ))
+        products = [{
+            "id": product.id,
+            "product_name": product.product_name,
+            "cost": product.cost,
+            "available_quantity": product.available_quantity,
+            "category": product.category,
+            "is_available": product.is_available
+        } for product in get_products()]
         return JsonResponse(products, safe=False)
 
     elif request.method == 'POST':
@@ -98,51 +258,60 @@ def purchase_api(request):
         if not customer_id or not product_id:
             return JsonResponse({"error": "Missing required fields"}, status=400)
 
-        product = VendingProduct.objects.get(id=product_id)
-        total_cost = Decimal(product.cost) * quantity
+        if quantity <= 0:
+            return JsonResponse({"error": "Quantity must be at least 1"}, status=400)
 
-        if product.available_quantity < quantity:
-            return JsonResponse({"error": "Insufficient stock"}, status=400)
+        priced = price_cart({product_id: quantity})
+        if priced.missing:
+            return JsonResponse({"error": "Product not found"}, status=404)
+        product = priced.lines[0]['product']
+        total_cost = priced.total
 
         if deposited_amount < total_cost:
             deficit = total_cost - deposited_amount
             return JsonResponse({"error": f"Insufficient funds. Need Rs {deficit:.2f} more."}, status=400)
 
-        # Calculate change
-        change = round(deposited_amount - total_cost, 2)
-
-        # Create session
-        session = CustomerSession.objects.create(
-            customer_id=customer_id,
-            deposited_amount=deposited_amount,
-            final_total=total_cost,
-            returned_change=change,
-            is_completed=True
-        )
-
-        # Log purchase
-        PurchaseRecord.objects.create(
-            customer_session=session,
-            product=product,
-            quantity=quantity,
-            total_price=total_cost,
-            transaction_type='purchase'
-        )
+        with immediate_atomic():
+            # Take the stock first; the conditional UPDATE fails instead of going negative
+            if VendingProduct.objects.reserve_stock({product.id: quantity}):
+                return JsonResponse({"error": "Insufficient stock"}, status=400)
+
+            # Pay the change out of the machine's float
+            try:
+                settlement = settle_payment(deposited_amount, total_cost, data.get("inserted"))
+            except ChangeUnavailable as e:
+                transaction.set_rollback(True)
+                return JsonResponse({"error": str(e)}, status=400)
+            change = settlement.change
+
+            # Create session
+            session = CustomerSession.objects.create(
+                customer_id=customer_id,
+                deposited_amount=deposited_amount,
+                final_total=total_cost,
+                returned_change=change,
+                is_completed=True
+            )
 
-        # Update product stock
-        product.available_quantity -= quantity
-        product.save()
+            # Log purchase
+            ledger = CheckoutLedger(session)
+            for denom, count in settlement.inserted.items():
+                ledger.add_money(denom, count, 'inserted')
+            for denom, count in settlement.breakdown.items():
+                ledger.add_money(denom, count, 'change')
+            ledger.add_purchase(product, quantity, total_cost)
+            ledger.commit()
 
         return JsonResponse({
             "message": "Purchase successful",
             "product": product.product_name,
             "quantity": quantity,
             "total_cost": float(total_cost),
-            "change_returned": float(change)
+            "change_returned": float(change),
+            "change_breakdown": {str(d): n for d, n in settlement.breakdown.items()},
+            "change_shortfall": float(settlement.shortfall)
         })
 
-    except VendingProduct.DoesNotExist:
-        return JsonResponse({"error": "Product not found"}, status=404)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=400)
 
@@ -150,12 +319,46 @@ def purchase_api(request):
 # ---------------------------
 # PURCHASE RECORDS API (Admin Dashboard)
 # ---------------------------
+@condition(**history_conditions(PurchaseRecord, 'timestamp'))
 def purchases_api(request):
-    """Return all recorded purchases for admin dashboard"""
+    """Return recorded purchases for admin dashboard, one page at a time (or ?format=ndjson/csv export)"""
     if request.method != 'GET':
         return JsonResponse({"error": "GET required"}, status=400)
 
-    purchases = PurchaseRecord.objects.select_related('customer_session', 'product').order_by('-timestamp')
+    export_format = request.GET.get('format')
+    if export_format in ('ndjson', 'csv'):
+        try:
+            purchases = filter_history(
+                request, PurchaseRecord.objects.all(), 'timestamp', 'customer_session__customer_id'
+            )
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        return stream_export(
+            purchases.order_by('-timestamp', '-id'),
+            {
+                "customer": 'customer_session__customer_id',
+                "product": 'product__product_name',
+                "quantity": 'quantity',
+                "total_price": 'total_price',
+                "deposited_amount": 'customer_session__deposited_amount',
+                "change_returned": 'customer_session__returned_change',
+                "transaction_type": 'transaction_type',
+                "timestamp": 'timestamp',
+            },
+            export_format,
+            'purchases'
+        )
+
+    try:
+        purchases, next_cursor = paginate_history(
+            request,
+            PurchaseRecord.objects.select_related('customer_session', 'product'),
+            'timestamp',
+            'customer_session__customer_id'
+        )
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
     data = []
     for p in purchases:
         data.append({
@@ -168,18 +371,25 @@ def purchases_api(request):
             "transaction_type": p.transaction_type,
             "timestamp": p.timestamp.strftime("%Y-%m-%d %H:%M:%S")
         })
-    return JsonResponse(data, safe=False)
+    return JsonResponse({"results": data, "next_cursor": next_cursor})
 
 
 # ---------------------------
 # CUSTOMER SESSIONS API
 # ---------------------------
+@condition(**history_conditions(CustomerSession, 'session_start'))
 def sessions_api(request):
-    """Return all customer sessions (admin view)"""
+    """Return customer sessions (admin view), one page at a time"""
     if request.method != 'GET':
         return JsonResponse({"error": "GET required"}, status=400)
 
-    sessions = CustomerSession.objects.all().order_by('-session_start')
+    try:
+        sessions, next_cursor = paginate_history(
+            request, CustomerSession.objects.all(), 'session_start', 'customer_id'
+        )
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
     data = []
     for s in sessions:
         data.append({
@@ -191,18 +401,50 @@ def sessions_api(request):
             "is_completed": s.is_completed,
             "timestamp": s.session_start.strftime("%Y-%m-%d %H:%M:%S")
         })
-    return JsonResponse(data, safe=False)
+    return JsonResponse({"results": data, "next_cursor": next_cursor})
 
 
 # ---------------------------
 # MONEY TRANSACTION LOG (OPTIONAL)
 # ---------------------------
+@condition(**history_conditions(MoneyTransaction, 'timestamp'))
 def money_transactions_api(request):
-    """Return all money transactions (inserted and change)"""
+    """Return money transactions (inserted and change), one page at a time (or ?format=ndjson/csv export)"""
     if request.method != 'GET':
         return JsonResponse({"error": "GET required"}, status=400)
 
-    transactions = MoneyTransaction.objects.select_related('session').order_by('-timestamp')
+    export_format = request.GET.get('format')
+    if export_format in ('ndjson', 'csv'):
+        try:
+            transactions = filter_history(
+                request, MoneyTransaction.objects.all(), 'timestamp', 'session__customer_id'
+            )
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        return stream_export(
+            transactions.order_by('-timestamp', '-id'),
+            {
+                "session_id": 'session_id',
+                "customer": 'session__customer_id',
+                "type": 'type',
+                "denomination": 'denomination',
+                "count": 'count',
+                "timestamp": 'timestamp',
+            },
+            export_format,
+            'money_transactions'
+        )
+
+    try:
+        transactions, next_cursor = paginate_history(
+            request,
+            MoneyTransaction.objects.select_related('session'),
+            'timestamp',
+            'session__customer_id'
+        )
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
     data = []
     for t in transactions:
         data.append({
@@ -213,18 +455,161 @@ def money_transactions_api(request):
             "count": t.count,
             "timestamp": t.timestamp.strftime("%Y-%m-%d %H:%M:%S")
         })
-    return JsonResponse(data, safe=False)
+    return JsonResponse({"results": data, "next_cursor": next_cursor})
 
 from django.http import JsonResponse
 from .models import PurchaseRecord
 
+@condition(**history_conditions(PurchaseRecord, 'timestamp'))
 def orders_api(request):
     """
-    Simple API to fetch all purchase transactions.
+    Simple API to fetch purchase transactions, one page at a time.
     """
-    orders = PurchaseRecord.objects.all().values(
-        'id', 'product__product_name', 'quantity', 'total_price',
-        'transaction_type', 'timestamp', 'customer_session__customer_id'
-    )
+    try:
+        orders, next_cursor = paginate_history(
+            request,
+            PurchaseRecord.objects.values(
+                'id', 'product__product_name', 'quantity', 'total_price',
+                'transaction_type', 'timestamp', 'customer_session__customer_id'
+            ),
+            'timestamp',
+            'customer_session__customer_id'
+        )
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
 
-    return JsonResponse(list(orders), safe=False)
+    return JsonResponse({"results": orders, "next_cursor": next_cursor})
+
+
+# ---------------------------
+# LIVE STOCK AND SALES EVENTS
+# ---------------------------
+def events_api(request):
+    """
+    Long-poll for 'stock', 'session' and 'catalogue' events after ?since=<id>.
+
+    Without ?since the current id is returned at once: take it first, then
+    load the catalogue/history, then poll from it so nothing is missed.
+    With ?since the request waits up to ?timeout= seconds (capped at
+    EVENTS_MAX_WAIT) for something newer. "reset": true means the id is
+    too old to replay; reload in full and continue from "last_id".
+    When EVENTS_MAX_WAITERS requests are already waiting, the answer comes
+    at once with "retry_after" (also sent as Retry-After) in seconds.
+    """
+    if request.method != 'GET':
+        return JsonResponse({"error": "GET required"}, status=400)
+
+    since = request.GET.get('since')
+    if not since:
+        response = JsonResponse({"events": [], "last_id": last_event_id(), "reset": False})
+        add_never_cache_headers(response)
+        return response
+
+    try:
+        since = int(since)
+        timeout = float(request.GET.get('timeout', settings.EVENTS_MAX_WAIT))
+    except ValueError:
+        return JsonResponse({"error": "since must be an integer and timeout a number"}, status=400)
+    timeout = min(max(timeout, 0), settings.EVENTS_MAX_WAIT)
+
+    with long_poll_slot() as may_wait:
+        events, last_id, reset = events_since(since, timeout if may_wait else 0)
+    body = {"events": events, "last_id": last_id, "reset": reset}
+    if timeout and not may_wait:
+        body["retry_after"] = settings.EVENTS_BUSY_RETRY
+    response = JsonResponse(body)
+    if "retry_after" in body:
+        response['Retry-After'] = str(settings.EVENTS_BUSY_RETRY)
+    add_never_cache_headers(response)
+    return response
+
+
+# ---------------------------
+# SALES STATS (FROM ROLLUPS)
+# ---------------------------
+def stats_api(request):
+    """
+    Quantity and revenue per product or category, and cash in / change out,
+    per hour or day. Reads only the rollup tables, never the raw ledger.
+
+    ?period=hour|day (default day), ?group=product|category (default
+    product), ?since= / ?until= on the bucket start, ?limit= rows (newest first).
+    """
+    if request.method != 'GET':
+        return JsonResponse({"error": "GET required"}, status=400)
+
+    params = request.GET
+    period = params.get('period', 'day')
+    group = params.get('group', 'product')
+    if period not in ('hour', 'day'):
+        return JsonResponse({"error": "period must be 'hour' or 'day'"}, status=400)
+    if group not in ('product', 'category'):
+        return JsonResponse({"error": "group must be 'product' or 'category'"}, status=400)
+
+    sales = SalesRollup.objects.filter(period=period)
+    cash = CashRollup.objects.filter(period=period)
+    try:
+        limit = max(1, min(int(params.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+        if params.get('since'):
+            since = parse_time_param(params['since'], 'since')
+            sales = sales.filter(period_start__gte=since)
+            cash = cash.filter(period_start__gte=since)
+        if params.get('until'):
+            until = parse_time_param(params['until'], 'until')
+            sales = sales.filter(period_start__lt=until)
+            cash = cash.filter(period_start__lt=until)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    if group == 'category':
+        rows = sales.values('period_start', 'category').annotate(
+            quantity=Sum('quantity'), revenue=Sum('revenue')
+        ).order_by('-period_start', 'category')
+    else:
+        rows = sales.values(
+            'period_start', 'product_id', 'product__product_name', 'category', 'quantity', 'revenue'
+        ).order_by('-period_start', 'category', 'product__product_name')
+
+    data = []
+    for row in rows[:limit]:
+        entry = {
+            "period_start": row['period_start'].strftime("%Y-%m-%d %H:%M:%S"),
+            "category": row['category'],
+            "quantity": row['quantity'],
+            "revenue": float(row['revenue']),
+        }
+        if group == 'product':
+            entry["product_id"] = row['product_id']
+            entry["product_name"] = row['product__product_name']
+        data.append(entry)
+
+    cash_data = [{
+        "period_start": c.period_start.strftime("%Y-%m-%d %H:%M:%S"),
+        "cash_in": float(c.cash_in),
+        "change_out": float(c.change_out),
+    } for c in cash.order_by('-period_start')[:limit]]
+
+    sales_totals = sales.aggregate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+    cash_totals = cash.aggregate(cash_in=Sum('cash_in'), change_out=Sum('change_out'))
+    return JsonResponse({
+        "period": period,
+        "group": group,
+        "sales": data,
+        "cash": cash_data,
+        "totals": {
+            "quantity": sales_totals['quantity'] or 0,
+            "revenue": float(sales_totals['revenue'] or 0),
+            "cash_in": float(cash_totals['cash_in'] or 0),
+            "change_out": float(cash_totals['change_out'] or 0),
+        },
+    })
+
+
+# ---------------------------
+# REQUEST METRICS (PROMETHEUS)
+# ---------------------------
+def metrics_view(request):
+    """Per-view request counts, latency histograms and query costs in Prometheus text format"""
+    if not settings.METRICS_ENABLED:
+        raise Http404("Metrics are disabled")
+    return HttpResponse(metrics_store().render(), content_type='text/plain; version=0.0.4; charset=utf-8')
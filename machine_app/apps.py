@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class MachineAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'machine_app'
+
+    def ready(self):
+        # Connect the catalogue cache invalidation, live event, SQLite tuning and thumbnail receivers
+        from . import catalogue  # noqa: F401
+        from . import events  # noqa: F401
+        from . import sqlite_tuning  # noqa: F401
+        from . import thumbnails  # noqa: F401
@@ -0,0 +1,46 @@
+# ---------------------------
+# SESSION CART STORE
+# ---------------------------
+# The cart lives in the session as {product id: quantity} and nothing
+# else: names, prices and totals are re-read from the catalogue when they
+# are needed. That keeps the session payload a few bytes, which matters
+# with the signed-cookie engine (the whole session travels in a cookie)
+# and keeps stale prices out of the checkout.
+
+CART_KEY = 'cart'
+
+
+class CartStore:
+    """Compact cart kept in request.session"""
+
+    def __init__(self, session):
+        self.session = session
+
+    def quantities(self):
+        """Map product id -> quantity (ints); empty if there is no cart"""
+        raw = self.session.get(CART_KEY)
+        if not isinstance(raw, dict):
+            return {}
+        return {int(product_id): int(qty) for product_id, qty in raw.items()}
+
+    def set(self, priced):
+        """Store the lines of a PricedCart; session keys must be strings for JSON"""
+        self.session[CART_KEY] = {str(line['product'].id): line['quantity'] for line in priced.lines}
+
+    def clear(self):
+        if CART_KEY in self.session:
+            del self.session[CART_KEY]
+
+    def __bool__(self):
+        return bool(self.quantities())
+
+
+def cart_lines(priced):
+    """The cart rows the purchase templates show, built from a PricedCart"""
+    return [{
+        'id': line['product'].id,
+        'name': line['product'].product_name,
+        'price': float(line['unit_price']),
+        'qty': line['quantity'],
+        'total_price': float(line['line_total'])
+    } for line in priced.lines]
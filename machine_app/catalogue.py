@@ -0,0 +1,100 @@
+import time
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import VendingProduct, stock_changed
+
+
+# ---------------------------
+# PRODUCT CATALOGUE CACHE
+# ---------------------------
+# Two layers: a per-process copy of the catalogue, and a shared cache
+# (settings.CATALOGUE_CACHE_ALIAS) that every gunicorn worker can see.
+# Both are keyed by a catalogue version that only ever goes up; any
+# product save/delete or stock change bumps it once the transaction commits.
+# The keys also carry the database they were read from, so a test or
+# benchmark database never shares entries with the live one.
+
+VERSION_KEY = 'catalogue:{db}:version'
+DATA_KEY = 'catalogue:{db}:products:{version}'
+DATA_TIMEOUT = 60 * 60
+
+_local = {'key': None, 'products': None}
+_stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def shared_cache():
+    return caches[settings.CATALOGUE_CACHE_ALIAS]
+
+
+def database_scope():
+    """Short id of the database VendingProduct is read from"""
+    name = str(connections[VendingProduct.objects.db].settings_dict['NAME'])
+    return f"{zlib.crc32(name.encode()):08x}"
+
+
+def current_version():
+    """Return the catalogue version, starting a new series if it was evicted"""
+    cache = shared_cache()
+    key = VERSION_KEY.format(db=database_scope())
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a restarted cache never reuses an old version
+        cache.add(key, time.time_ns() // 1000, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version():
+    """Invalidate every cached copy of the catalogue"""
+    cache = shared_cache()
+    key = VERSION_KEY.format(db=database_scope())
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns() // 1000, timeout=None)
+    _local['key'] = None
+    _local['products'] = None
+    _stats['invalidations'] += 1
+
+
+def get_products():
+    """Return all VendingProduct instances (Meta ordering), served from cache when fresh"""
+    key = DATA_KEY.format(db=database_scope(), version=current_version())
+
+    if _local['key'] == key:
+        _stats['local_hits'] += 1
+        return _local['products']
+
+    cache = shared_cache()
+    products = cache.get(key)
+    if products is not None:
+        _stats['shared_hits'] += 1
+    else:
+        _stats['misses'] += 1
+        products = list(VendingProduct.objects.all())
+        cache.set(key, products, DATA_TIMEOUT)
+
+    _local['key'] = key
+    _local['products'] = products
+    return products
+
+
+def catalogue_stats():
+    """Hit/miss counters for this process, plus the current version"""
+    return dict(_stats, version=current_version())
+
+
+# ---------------------------
+# INVALIDATION
+# ---------------------------
+@receiver(post_save, sender=VendingProduct)
+@receiver(post_delete, sender=VendingProduct)
+@receiver(stock_changed, sender=VendingProduct)
+def invalidate_catalogue(sender, **kwargs):
+    transaction.on_commit(bump_version)
@@ -0,0 +1,208 @@
+from decimal import Decimal
+from math import gcd
+from functools import reduce
+
+from django.db import transaction
+
+from .models import CashFloat
+
+
+# ---------------------------
+# CHANGE-MAKING ENGINE
+# ---------------------------
+# All arithmetic is in integer cents. Amounts are indexed in units of the
+# greatest common divisor of the denominations (Rs 5 here), which keeps
+# the lookup tables small.
+#
+# The unbounded table gives, for every amount up to CHANGE_TABLE_CAP, the
+# largest amount that can be paid out and its fewest-pieces breakdown.
+# When the float holds enough of each note that breakdown is used as is
+# (one lookup); otherwise a bounded knapsack over the actual float finds
+# the fewest pieces that still pay the same amount.
+
+VALID_DENOMINATIONS = [5, 10, 20, 25, 50, 100, 200]
+
+# Amounts (in rupees) covered by the precomputed tables; larger ones grow them on demand
+CHANGE_TABLE_CAP = 2000
+
+
+class ChangeUnavailable(Exception):
+    """The float cannot pay out the change owed"""
+
+
+def to_cents(amount):
+    return int((Decimal(str(amount)) * 100).quantize(Decimal('1')))
+
+
+def from_cents(cents):
+    return (Decimal(cents) / 100).quantize(Decimal('0.01'))
+
+
+class ChangeTables:
+    """Fewest-pieces breakdown and largest payable amount for every amount up to a cap"""
+
+    def __init__(self, denominations, cap):
+        self.denominations = sorted(to_cents(d) for d in denominations)
+        self.unit = reduce(gcd, self.denominations)
+        self.units = [d // self.unit for d in self.denominations]
+        self.pieces = [0]
+        self.breakdowns = [(0,) * len(self.units)]
+        self.payable = [0]
+        self.extend(to_cents(cap) // self.unit)
+
+    def extend(self, size):
+        for amount in range(len(self.pieces), size + 1):
+            best, best_index = None, None
+            for index, d in enumerate(self.units):
+                if d <= amount and self.pieces[amount - d] is not None:
+                    if best is None or self.pieces[amount - d] + 1 < best:
+                        best, best_index = self.pieces[amount - d] + 1, index
+            self.pieces.append(best)
+            if best is None:
+                self.breakdowns.append(None)
+                self.payable.append(self.payable[amount - 1])
+            else:
+                counts = list(self.breakdowns[amount - self.units[best_index]])
+                counts[best_index] += 1
+                self.breakdowns.append(tuple(counts))
+                self.payable.append(amount)
+
+    def lookup(self, cents):
+        """(payable cents, fewest-pieces counts per denomination) for an unlimited float"""
+        amount = cents // self.unit
+        if amount >= len(self.pieces):
+            self.extend(amount)
+        payable = self.payable[amount]
+        return payable * self.unit, self.breakdowns[payable]
+
+
+def solve_bounded(units, available, target):
+    """
+    Fewest pieces summing exactly to `target` units using at most
+    available[i] pieces of units[i] (bounded knapsack, binary-split into
+    0/1 items). Returns the counts per denomination, or None.
+    """
+    items = []
+    for index, (d, count) in enumerate(zip(units, available)):
+        count = min(count, target // d)
+        k = 1
+        while count > 0:
+            take = min(k, count)
+            items.append((index, take, take * d))
+            count -= take
+            k *= 2
+
+    infinity = float('inf')
+    best = [0] + [infinity] * target
+    took = []
+    for index, take, weight in items:
+        row = bytearray(target + 1)
+        for amount in range(target, weight - 1, -1):
+            if best[amount - weight] + take < best[amount]:
+                best[amount] = best[amount - weight] + take
+                row[amount] = 1
+        took.append(row)
+
+    if best[target] == infinity:
+        return None
+    counts = [0] * len(units)
+    amount = target
+    for (index, take, weight), row in zip(reversed(items), reversed(took)):
+        if row[amount]:
+            counts[index] += take
+            amount -= weight
+    return counts
+
+
+_tables = ChangeTables(VALID_DENOMINATIONS, CHANGE_TABLE_CAP)
+
+
+def make_change(change_cents, float_counts):
+    """
+    Break change_cents into notes/coins from float_counts ({cents: count}).
+
+    Pays the largest amount the denominations can form (the remainder
+    below the smallest note is the shortfall) with the fewest pieces the
+    float allows. Returns ({cents: count}, shortfall_cents); raises
+    ChangeUnavailable if the float cannot cover that amount.
+    """
+    payable, counts = _tables.lookup(change_cents)
+    available = [float_counts.get(d, 0) for d in _tables.denominations]
+
+    if any(n > have for n, have in zip(counts, available)):
+        counts = solve_bounded(_tables.units, available, payable // _tables.unit)
+        if counts is None:
+            raise ChangeUnavailable(
+                f"Cannot give Rs {from_cents(payable)} in change right now. "
+                f"Please insert a smaller amount."
+            )
+
+    breakdown = {d: n for d, n in zip(_tables.denominations, counts) if n}
+    return breakdown, change_cents - payable
+
+
+def denomination_key(cents):
+    """Cents back to the denomination as the rest of the app writes it (5, 10, ... or a Decimal)"""
+    return cents // 100 if cents % 100 == 0 else from_cents(cents)
+
+
+def notes_for(amount):
+    """Fewest-notes breakdown of an amount paid in ({rupees: count}), for callers that only know the total"""
+    _, counts = _tables.lookup(to_cents(amount))
+    return {denomination_key(d): n for d, n in zip(_tables.denominations, counts) if n}
+
+
+class Settlement:
+    """Outcome of settle_payment(); amounts are Decimal, breakdowns {denomination: count}"""
+
+    def __init__(self, change, breakdown, shortfall, inserted):
+        self.change = change
+        self.breakdown = breakdown
+        self.shortfall = shortfall
+        self.inserted = inserted
+
+
+def inserted_notes(deposited, inserted=None):
+    """
+    Validate the notes/coins paid in ({denomination: count}) against the
+    deposited amount; without them the deposit is taken as its
+    fewest-notes breakdown. Returns {denomination: count}.
+    """
+    if not inserted:
+        return notes_for(deposited)
+    inserted = {to_cents(d): int(n) for d, n in inserted.items() if int(n) > 0}
+    if any(d not in _tables.denominations for d in inserted):
+        raise ValueError("Unknown denomination in inserted money")
+    if sum(d * n for d, n in inserted.items()) != to_cents(deposited):
+        raise ValueError("Inserted notes do not add up to the deposited amount")
+    return {denomination_key(d): n for d, n in inserted.items()}
+
+
+def settle_payment(deposited, total, inserted=None):
+    """
+    Take the inserted money into the float and pay the change out of it.
+
+    `inserted` maps denomination -> count (see inserted_notes()). Runs in a
+    savepoint: if the change cannot be paid, ChangeUnavailable is raised
+    and the float is untouched.
+    """
+    inserted = inserted_notes(deposited, inserted)
+
+    change_cents = to_cents(deposited) - to_cents(total)
+    if change_cents < 0:
+        raise ValueError("Deposited amount is less than the total")
+
+    with transaction.atomic():
+        CashFloat.objects.replenish({to_cents(d): n for d, n in inserted.items()})
+        while True:
+            breakdown, shortfall = make_change(change_cents, CashFloat.objects.counts())
+            if CashFloat.objects.dispense(breakdown):
+                break
+            # Another checkout emptied a drawer between reading and dispensing; solve again
+
+    return Settlement(
+        change=from_cents(change_cents),
+        breakdown={denomination_key(d): n for d, n in sorted(breakdown.items(), reverse=True)},
+        shortfall=from_cents(shortfall),
+        inserted=inserted,
+    )
@@ -0,0 +1,42 @@
+from django.db.models import Count, Max
+
+from .catalogue import current_version
+
+
+# ---------------------------
+# CONDITIONAL GET VALIDATORS
+# ---------------------------
+# Used with django.views.decorators.http.condition so that unchanged
+# listings are answered with 304 Not Modified instead of a full body.
+
+def catalogue_etag(request, *args, **kwargs):
+    """ETag for product listings: the catalogue cache version"""
+    return f"catalogue-{current_version()}"
+
+
+def history_conditions(model, time_field, **filters):
+    """
+    Build condition() kwargs for a history table.
+
+    The validator is the row count, the highest id and the latest
+    timestamp, all read in one aggregate query per request.
+    """
+    label = model._meta.model_name
+
+    def state(request):
+        memo = request.__dict__.setdefault('_history_state', {})
+        if label not in memo:
+            memo[label] = model.objects.filter(**filters).aggregate(
+                count=Count('id'), last_id=Max('id'), latest=Max(time_field)
+            )
+        return memo[label]
+
+    def etag_func(request, *args, **kwargs):
+        s = state(request)
+        latest = s['latest'].timestamp() if s['latest'] else 0
+        return f"{label}-{s['count']}-{s['last_id'] or 0}-{latest}"
+
+    def last_modified_func(request, *args, **kwargs):
+        return state(request)['latest']
+
+    return {'etag_func': etag_func, 'last_modified_func': last_modified_func}
@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import VendingProduct, CustomerSession, PurchaseRecord, stock_changed
+
+
+# ---------------------------
+# LIVE EVENT LOG
+# ---------------------------
+# A bounded, in-process log of what changed, so kiosks and the admin
+# dashboard can long-poll /api/events/?since=<id> and apply deltas instead
+# of re-downloading the catalogue and the purchase history.
+#
+# Events are only published once the transaction that caused them has
+# committed. The log lives in this process: it is shared by every request
+# handled here (one gunicorn worker, any number of threads), not across
+# worker processes. Ids are seeded from the clock, so a client holding an
+# id from before a restart is told to reset instead of silently missing
+# events.
+
+_log = deque(maxlen=settings.EVENT_LOG_SIZE)
+_condition = threading.Condition()
+_state = {'last_id': time.time_ns() // 1000}
+# Every waiting long-poll holds a gunicorn thread; keep some for other requests
+_waiters = threading.BoundedSemaphore(settings.EVENTS_MAX_WAITERS)
+
+
+def publish(event_type, data):
+    """Append an event to the log and wake every waiting long-poll"""
+    with _condition:
+        _state['last_id'] += 1
+        _log.append({
+            'id': _state['last_id'],
+            'type': event_type,
+            'time': timezone.now().isoformat(),
+            'data': data,
+        })
+        _condition.notify_all()
+
+
+def last_event_id():
+    with _condition:
+        return _state['last_id']
+
+
+@contextmanager
+def long_poll_slot():
+    """
+    Yield True if this request may wait for events. At most
+    EVENTS_MAX_WAITERS requests wait at once; the others should answer
+    straight away and tell the client to come back later.
+    """
+    acquired = _waiters.acquire(blocking=False)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            _waiters.release()
+
+
+def events_since(since, timeout=0):
+    """
+    Return (events, last_id, reset) for everything after `since`.
+
+    Blocks for up to `timeout` seconds while nothing newer exists. reset is
+    True when `since` is older than the retained log (or from another
+    process run); the client should reload in full and continue from last_id.
+    """
+    deadline = time.monotonic() + timeout
+    with _condition:
+        while _state['last_id'] <= since:
+            remaining = deadline - time.monotonic()
+            if since > _state['last_id'] or remaining <= 0:
+                break
+            _condition.wait(remaining)
+
+        last_id = _state['last_id']
+        oldest = _log[0]['id'] if _log else last_id + 1
+        if since > last_id or since < oldest - 1:
+            return [], last_id, True
+        return [event for event in _log if event['id'] > since], last_id, False
+
+
+# ---------------------------
+# EVENT PAYLOADS
+# ---------------------------
+def publish_stock(product_ids, deltas=None):
+    """One 'stock' event per product with the committed quantity (and the change, when known)"""
+    deltas = deltas or {}
+    rows = VendingProduct.objects.filter(id__in=product_ids).values_list(
+        'id', 'available_quantity', 'is_available'
+    )
+    for product_id, quantity, is_available in rows:
+        publish('stock', {
+            'product_id': product_id,
+            'available_quantity': quantity,
+            'is_available': is_available,
+            'delta': deltas.get(product_id),
+        })
+
+
+def publish_session(session_id):
+    """A 'session' event shaped like one row of /api/purchases/"""
+    session = CustomerSession.objects.filter(id=session_id, is_completed=True).first()
+    if session is None:
+        return
+    items = PurchaseRecord.objects.filter(
+        customer_session_id=session_id, transaction_type='purchase'
+    ).annotate(product_name=F('product__product_name')).values('product_name', 'quantity')
+
+    publish('session', {
+        'id': session.id,
+        'customer': session.customer_id,
+        'total_amount': float(session.final_total),
+        'deposited_amount': float(session.deposited_amount),
+        'change_returned': float(session.returned_change),
+        'timestamp': session.session_start.astimezone(ZoneInfo("Indian/Mauritius")).isoformat(),
+        'items': list(items),
+    })
+
+
+# ---------------------------
+# SIGNAL RECEIVERS
+# ---------------------------
+@receiver(stock_changed, sender=VendingProduct)
+def stock_event(sender, product_ids=(), deltas=None, **kwargs):
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: publish_stock(product_ids, deltas))
+
+
+@receiver(post_save, sender=CustomerSession)
+def session_event(sender, instance, created, **kwargs):
+    if created and instance.is_completed:
+        session_id = instance.pk
+        transaction.on_commit(lambda: publish_session(session_id))
+
+
+@receiver(post_save, sender=VendingProduct)
+@receiver(post_delete, sender=VendingProduct)
+def catalogue_event(sender, instance, **kwargs):
+    # Edits other than stock (name, price, image...) are not sent as
+    # deltas; clients reload the catalogue, which is a cheap 304 if unchanged.
+    data = {'product_id': instance.pk, 'deleted': 'created' not in kwargs}
+    transaction.on_commit(lambda: publish('catalogue', data))
@@ -0,0 +1,364 @@
+import atexit
+import fcntl
+import json
+import logging
+import os
+import struct
+import threading
+import zlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Max
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import VendingProduct, CustomerSession, CashFloat, MAURITIUS_OFFSET, stock_changed
+from .ledger import CheckoutLedger
+from .pricing import price_cart
+from .change import Settlement, denomination_key, from_cents, inserted_notes, make_change, to_cents
+from .sqlite_tuning import immediate_atomic
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------
+# WRITE-BEHIND PURCHASE JOURNAL
+# ---------------------------
+# Optional checkout mode for kiosks (settings.PURCHASE_JOURNAL). A checkout
+# is checked against stock, prices and cash float held in memory, appended
+# to a local journal file, fsync'd, and answered. A background thread then
+# writes the journal into CustomerSession / MoneyTransaction /
+# PurchaseRecord in batches, so the database can be briefly unreachable
+# without stopping sales.
+#
+# Records are length-prefixed: a 4-byte length and a CRC32 of the payload,
+# then the payload as JSON. A record torn by a crash fails the length or
+# CRC check and is cut off when the journal is next opened. Every record
+# carries a sequence number that is stored on its CustomerSession
+# (journal_seq, unique), so replaying a record that already reached the
+# database is a no-op. The journal is replayed when it is opened at
+# startup and emptied whenever everything in it has been written.
+#
+# The in-memory state belongs to one process: the journal file is locked by
+# the first process that opens it, and other processes fall back to the
+# ordinary synchronous checkout. Run gunicorn with one worker and threads.
+# With more workers the in-memory stock only sees their checkouts when it
+# is reloaded after each flush, so the same units can be sold twice; the
+# flush then stops the stock at zero and reports the oversell (printed and
+# counted in PurchaseJournal.oversold).
+
+HEADER = struct.Struct('>II')  # payload length, CRC32 of the payload
+
+
+class JournalUnavailable(Exception):
+    """The journal is locked by another process"""
+
+
+class OutOfStock(Exception):
+    """Not enough stock for some cart lines"""
+
+    def __init__(self, product_ids):
+        super().__init__(f"Not enough stock for products {product_ids}")
+        self.product_ids = product_ids
+
+
+def encode_record(payload):
+    data = json.dumps(payload, separators=(',', ':')).encode()
+    return HEADER.pack(len(data), zlib.crc32(data)) + data
+
+
+def read_records(file):
+    """All complete records in the file, and the length they take up"""
+    file.seek(0)
+    data = file.read()
+    records = []
+    offset = 0
+    while offset + HEADER.size <= len(data):
+        length, crc = HEADER.unpack_from(data, offset)
+        payload = data[offset + HEADER.size:offset + HEADER.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        records.append(json.loads(payload))
+        offset += HEADER.size + length
+    return records, offset
+
+
+class PurchaseJournal:
+    def __init__(self, path, batch_size, interval):
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file = open(path, 'a+b')
+        try:
+            fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.file.close()
+            raise JournalUnavailable(f"{path} is in use by another process")
+
+        self.pending, valid_length = read_records(self.file)
+        if valid_length < os.fstat(self.file.fileno()).st_size:
+            logger.warning("Purchase journal: dropping a torn record at byte %s", valid_length)
+            self.file.truncate(valid_length)
+            os.fsync(self.file.fileno())
+        self.next_seq = self.pending[-1]['seq'] + 1 if self.pending else 1
+
+        # Guards the file, the pending records and the in-memory state
+        self.lock = threading.Lock()
+        self.products = {}
+        self.stock = {}
+        self.float = {}
+        self.loaded = False
+        # Units sold from the journal that the database no longer had, by product id
+        self.oversold = {}
+
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='purchase-journal', daemon=True)
+
+    # ---------------------------
+    # CHECKOUT (request threads)
+    # ---------------------------
+    def price(self, quantities):
+        """price_cart() against the in-memory catalogue"""
+        return price_cart(quantities, catalogue=self.products)
+
+    def checkout(self, customer, priced, deposited, inserted=None):
+        """
+        Sell a priced cart: check stock and change against memory, append
+        the record and fsync it. Returns (Settlement, journal sequence
+        number). Raises OutOfStock or ChangeUnavailable, leaving nothing
+        recorded.
+        """
+        inserted = inserted_notes(deposited, inserted)
+        inserted_cents = {to_cents(d): n for d, n in inserted.items()}
+        change_cents = to_cents(deposited) - to_cents(priced.total)
+        if change_cents < 0:
+            raise ValueError("Deposited amount is less than the total")
+
+        with self.lock:
+            short = [pid for pid, qty in priced.quantities().items() if self.stock.get(pid, 0) < qty]
+            if short:
+                raise OutOfStock(short)
+
+            float_counts = dict(self.float)
+            for cents, n in inserted_cents.items():
+                float_counts[cents] = float_counts.get(cents, 0) + n
+            breakdown, shortfall = make_change(change_cents, float_counts)
+
+            record = {
+                'seq': self.next_seq,
+                'ts': timezone.now().isoformat(),
+                'customer': customer,
+                'deposited': str(deposited),
+                'total': str(priced.total),
+                'change': str(from_cents(change_cents)),
+                'lines': [[line['product'].id, line['quantity'], str(line['line_total'])] for line in priced.lines],
+                'inserted': inserted_cents,
+                'change_out': breakdown,
+            }
+            self.append(record)
+
+            self.next_seq += 1
+            for pid, qty in priced.quantities().items():
+                self.stock[pid] -= qty
+            for cents, n in breakdown.items():
+                float_counts[cents] -= n
+            self.float = float_counts
+            self.pending.append(record)
+            if len(self.pending) >= self.batch_size:
+                self.wake.set()
+
+        settlement = Settlement(
+            change=from_cents(change_cents),
+            breakdown={denomination_key(d): n for d, n in sorted(breakdown.items(), reverse=True)},
+            shortfall=from_cents(shortfall),
+            inserted=inserted,
+        )
+        return settlement, record['seq']
+
+    def append(self, record):
+        """Write one record and fsync it; a failed write is cut back off"""
+        end = os.fstat(self.file.fileno()).st_size
+        try:
+            self.file.write(encode_record(record))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        except OSError:
+            self.file.truncate(end)
+            raise
+
+    # ---------------------------
+    # FLUSHER (background thread)
+    # ---------------------------
+    def start(self):
+        """Replay what the journal still holds, load the in-memory state and start flushing"""
+        try:
+            self.flush_all()
+            self.reload()
+        except Exception as e:
+            logger.warning("Purchase journal: database unavailable at startup (%s); retrying in the background", e)
+            connection.close()
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        try:
+            self.flush_all()
+        except Exception as e:
+            logger.error("Purchase journal: %s checkouts left in %s (%s)", len(self.pending), self.path, e)
+
+    def run(self):
+        delay = self.interval
+        while not self.stopped.is_set():
+            self.wake.wait(delay)
+            self.wake.clear()
+            try:
+                self.flush_all()
+                self.reload()
+                delay = self.interval
+            except Exception as e:
+                # Database down or locked: keep the records and back off
+                logger.warning("Purchase journal: flush failed (%s); %s checkouts waiting", e, len(self.pending))
+                connection.close()
+                delay = min(delay * 2, 30)
+        connection.close()
+
+    def flush_all(self):
+        while self.flush():
+            pass
+
+    def flush(self):
+        """Write the oldest batch of pending records to the database; returns how many"""
+        with self.lock:
+            batch = self.pending[:self.batch_size]
+        if not batch:
+            return 0
+
+        with immediate_atomic():
+            written = set(CustomerSession.objects.filter(
+                journal_seq__in=[record['seq'] for record in batch]
+            ).values_list('journal_seq', flat=True))
+            records = [record for record in batch if record['seq'] not in written]
+            products = VendingProduct.objects.in_bulk({line[0] for record in records for line in record['lines']})
+
+            deltas = {}
+            inserted = {}
+            change_out = {}
+            for record in records:
+                timestamp = parse_datetime(record['ts'])
+                session = CustomerSession.objects.create(
+                    customer_id=record['customer'],
+                    deposited_amount=Decimal(record['deposited']),
+                    final_total=Decimal(record['total']),
+                    returned_change=Decimal(record['change']),
+                    session_start=timestamp,
+                    is_completed=True,
+                    journal_seq=record['seq'],
+                )
+                ledger = CheckoutLedger(session)
+                for cents, n in record['inserted'].items():
+                    ledger.add_money(denomination_key(int(cents)), n, 'inserted')
+                    inserted[int(cents)] = inserted.get(int(cents), 0) + n
+                for cents, n in record['change_out'].items():
+                    ledger.add_money(denomination_key(int(cents)), n, 'change')
+                    change_out[int(cents)] = change_out.get(int(cents), 0) + n
+                for product_id, quantity, line_total in record['lines']:
+                    product = products.get(product_id)
+                    if product is None:
+                        # Deleted since the sale; the session and money rows still record it
+                        continue
+                    ledger.add_purchase(product, quantity, Decimal(line_total))
+                    deltas[product_id] = deltas.get(product_id, 0) - quantity
+                ledger.commit(timestamp + MAURITIUS_OFFSET)
+
+            # The sale already happened, so stock is taken unconditionally (never below zero)
+            oversold = {
+                product_id: -delta - products[product_id].available_quantity
+                for product_id, delta in deltas.items()
+                if products[product_id].available_quantity < -delta
+            }
+            if oversold:
+                logger.warning("Purchase journal: sold more than the database had (product id: units) %s; "
+                               "stock set to 0", oversold)
+            for product_id, delta in deltas.items():
+                VendingProduct.objects.filter(id=product_id).update(
+                    available_quantity=Greatest(F('available_quantity') + delta, 0)
+                )
+            if deltas:
+                stock_changed.send(sender=VendingProduct, product_ids=list(deltas), deltas=deltas)
+
+            CashFloat.objects.replenish(inserted)
+            if not CashFloat.objects.dispense(change_out):
+                logger.warning("Purchase journal: float in the database is short of %s; not updated", change_out)
+
+        with self.lock:
+            for product_id, units in oversold.items():
+                self.oversold[product_id] = self.oversold.get(product_id, 0) + units
+            del self.pending[:len(batch)]
+            if not self.pending:
+                # Everything is in the database now
+                self.file.truncate(0)
+                os.fsync(self.file.fileno())
+        return len(batch)
+
+    def reload(self):
+        """Refresh stock, prices and float from the database, less what is still pending"""
+        products = VendingProduct.objects.in_bulk()
+        float_counts = CashFloat.objects.counts()
+        last_seq = CustomerSession.objects.aggregate(last=Max('journal_seq'))['last'] or 0
+
+        with self.lock:
+            stock = {pid: product.available_quantity for pid, product in products.items()}
+            for record in self.pending:
+                for product_id, quantity, _ in record['lines']:
+                    if product_id in stock:
+                        stock[product_id] -= quantity
+                for cents, n in record['inserted'].items():
+                    float_counts[int(cents)] = float_counts.get(int(cents), 0) + n
+                for cents, n in record['change_out'].items():
+                    float_counts[int(cents)] = float_counts.get(int(cents), 0) - n
+            self.products = products
+            self.stock = stock
+            self.float = float_counts
+            # Never reuse a sequence number, even after the journal was emptied
+            self.next_seq = max(self.next_seq, last_seq + 1)
+            self.loaded = True
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def purchase_journal():
+    """
+    The running journal, or None when journaled mode is off, the journal
+    belongs to another process, or its state has not been loaded yet.
+    Opens (and replays) the journal on first use.
+    """
+    global _journal
+    if not settings.PURCHASE_JOURNAL:
+        return None
+    with _journal_lock:
+        if _journal is None:
+            try:
+                _journal = PurchaseJournal(
+                    settings.PURCHASE_JOURNAL_PATH,
+                    settings.PURCHASE_JOURNAL_BATCH,
+                    settings.PURCHASE_JOURNAL_INTERVAL,
+                )
+                _journal.start()
+            except JournalUnavailable as e:
+                logger.warning("Purchase journal: %s; using synchronous checkouts", e)
+                _journal = False
+    if _journal and _journal.loaded:
+        return _journal
+    return None
@@ -0,0 +1,54 @@
+from .models import PurchaseRecord, MoneyTransaction, ledger_timestamp
+from .rollups import record_checkout
+
+
+# ---------------------------
+# CHECKOUT LEDGER WRITER
+# ---------------------------
+class CheckoutLedger:
+    """
+    Collects every ledger row of one checkout and writes them in one go.
+
+    Money movements and purchase lines are buffered with add_money() and
+    add_purchase(), then commit() issues at most one bulk_create per model,
+    so a checkout costs the same number of INSERTs whatever the cart size.
+    All rows of a checkout share one timestamp. The sales rollups are
+    updated in the same transaction, also with a fixed number of queries.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.money = []
+        self.purchases = []
+
+    def add_money(self, denomination, count, type):
+        """Record notes/coins inserted or returned as change"""
+        if count > 0:
+            self.money.append(MoneyTransaction(
+                session=self.session,
+                denomination=denomination,
+                count=count,
+                type=type
+            ))
+
+    def add_purchase(self, product, quantity, total_price, transaction_type='purchase'):
+        """Record a purchased (or refilled) cart line"""
+        self.purchases.append(PurchaseRecord(
+            customer_session=self.session,
+            product=product,
+            quantity=quantity,
+            total_price=total_price,
+            transaction_type=transaction_type
+        ))
+
+    def commit(self, timestamp=None):
+        """Insert all buffered rows, one bulk_create per model"""
+        timestamp = timestamp or ledger_timestamp()
+        for row in self.money + self.purchases:
+            row.fill_ledger_fields(timestamp)
+
+        if self.money:
+            MoneyTransaction.objects.bulk_create(self.money)
+        if self.purchases:
+            PurchaseRecord.objects.bulk_create(self.purchases)
+        record_checkout(self.purchases, self.money)
@@ -0,0 +1,78 @@
+import contextlib
+import io
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from machine_app.models import VendingProduct, CashFloat
+
+SESSION_ENGINES = ['db', 'cached_db', 'signed_cookies']
+
+
+class Command(BaseCommand):
+    help = (
+        "Time full web checkouts (cart + payment) under each session engine. "
+        "Everything runs in one transaction that is rolled back, so no "
+        "sessions, stock or ledger rows are left behind."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkouts', type=int, default=200,
+                            help="Checkouts per session engine (default: 200)")
+        parser.add_argument('--engines', nargs='+', default=SESSION_ENGINES, choices=SESSION_ENGINES,
+                            help="Session engines to compare (default: all)")
+
+    def handle(self, *args, **options):
+        checkouts = options['checkouts']
+
+        with transaction.atomic():
+            product = VendingProduct.objects.create(
+                product_name='Benchmark item', cost=25,
+                available_quantity=checkouts * len(options['engines']) + 1
+            )
+            CashFloat.objects.get_or_create(denomination=25)
+
+            self.stdout.write(f"{checkouts} checkouts per engine\n")
+            self.stdout.write(f"{'engine':<16}{'mean ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}"
+                              f"{'queries':>9}{'session q':>11}")
+            for engine in options['engines']:
+                self.run_engine(engine, product, checkouts)
+
+            transaction.set_rollback(True)
+
+    def run_engine(self, engine, product, checkouts):
+        with override_settings(
+            SESSION_ENGINE=f'django.contrib.sessions.backends.{engine}',
+            ALLOWED_HOSTS=['*'],
+            SECURE_SSL_REDIRECT=False,
+        ):
+            client = Client()
+            client.post('/', {'role': 'student'})
+            client.post('/enter_name/', {'student_name': 'benchmark'})
+
+            timings = []
+            queries = []
+            session_queries = []
+            # The views print debug lines for every request; keep them out of the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(checkouts):
+                    with CaptureQueriesContext(connection) as captured:
+                        started = time.perf_counter()
+                        client.post('/purchase/', {'cart_submitted': '1', f'qty_{product.id}': '1'})
+                        response = client.post('/purchase/', {'process_payment': '1', 'insert_25': '1'})
+                        timings.append((time.perf_counter() - started) * 1000)
+                    if response.status_code != 200:
+                        raise CommandError(f"{engine}: checkout returned HTTP {response.status_code}")
+                    queries.append(len(captured))
+                    session_queries.append(sum('django_session' in q['sql'] for q in captured.captured_queries))
+
+        p95 = statistics.quantiles(timings, n=100)[94] if len(timings) > 1 else timings[0]
+        self.stdout.write(
+            f"{engine:<16}{statistics.mean(timings):>9.2f}{statistics.median(timings):>9.2f}"
+            f"{p95:>9.2f}{max(timings):>9.2f}{statistics.mean(queries):>9.1f}"
+            f"{statistics.mean(session_queries):>11.1f}"
+        )
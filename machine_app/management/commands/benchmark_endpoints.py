@@ -0,0 +1,291 @@
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from machine_app.models import VendingProduct, CustomerSession, PurchaseRecord, MoneyTransaction, MAURITIUS_OFFSET
+from machine_app.change import notes_for
+
+SCENARIOS = ['api_products', 'api_purchases', 'api_purchase', 'web_checkout']
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the catalogue, history and checkout endpoints against a "
+        "temporary database seeded with products and past sessions. Reports "
+        "p50/p95/p99 latency, throughput and queries per request, and writes "
+        "them to a JSON file that can be compared with a previous run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=40, help="Products to seed (default: 40)")
+        parser.add_argument('--sessions', type=int, default=2000,
+                            help="Historical customer sessions to seed (default: 2000)")
+        parser.add_argument('--requests', type=int, default=200,
+                            help="Measured requests per scenario (default: 200)")
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help="Client threads per scenario (default: 4)")
+        parser.add_argument('--warmup', type=int, default=5,
+                            help="Unmeasured requests per thread before each scenario (default: 5)")
+        parser.add_argument('--scenarios', nargs='+', default=SCENARIOS, choices=SCENARIOS)
+        parser.add_argument('--seed', type=int, default=1, help="Random seed for the data and carts")
+        parser.add_argument('--output', default='benchmark-results.json',
+                            help="JSON file for the results (default: benchmark-results.json)")
+        parser.add_argument('--compare', help="Earlier results file to print the differences against")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--requests and --concurrency must be at least 1")
+
+        previous = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                previous = json.load(f)
+
+        self.random = random.Random(options['seed'])
+        with self.temporary_database(), override_settings(
+            ALLOWED_HOSTS=['*'],
+            SECURE_SSL_REDIRECT=False,
+            PURCHASE_JOURNAL=False,
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-sessions'},
+                settings.CATALOGUE_CACHE_ALIAS: {
+                    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                    'LOCATION': 'benchmark-catalogue',
+                },
+            },
+        ):
+            self.seed(options['products'], options['sessions'])
+            results = {}
+            for name in options['scenarios']:
+                results[name] = self.run_scenario(name, options)
+                self.report(name, results[name], previous)
+
+        report = {
+            'commit': git_commit(),
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'config': {key: options[key] for key in ('products', 'sessions', 'requests', 'concurrency', 'warmup', 'seed')},
+            'scenarios': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    # ---------------------------
+    # TEMPORARY DATABASE AND DATA
+    # ---------------------------
+    @contextlib.contextmanager
+    def temporary_database(self):
+        """A migrated test database; for SQLite a file, so WAL and concurrent writers behave as in production"""
+        with tempfile.TemporaryDirectory() as scratch:
+            if connection.vendor == 'sqlite':
+                connection.settings_dict['TEST']['NAME'] = os.path.join(scratch, 'benchmark.sqlite3')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                yield
+            finally:
+                connections.close_all()
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, product_count, session_count):
+        rng = self.random
+        self.products = VendingProduct.objects.bulk_create([
+            VendingProduct(
+                product_name=f"Benchmark {i}",
+                cost=Decimal(rng.choice([10, 15, 20, 25, 30, 35, 50])),
+                available_quantity=1000000,
+                category='snacks' if i % 2 else 'drinks',
+            ) for i in range(product_count)
+        ])
+
+        now = timezone.now()
+        sessions = []
+        carts = []
+        for i in range(session_count):
+            cart = {product: rng.randint(1, 3) for product in rng.sample(self.products, rng.randint(1, 3))}
+            total = sum(product.cost * qty for product, qty in cart.items())
+            deposited = total + rng.choice([0, 5, 10, 20])
+            sessions.append(CustomerSession(
+                customer_id=f"student{i % 300}",
+                deposited_amount=deposited,
+                final_total=total,
+                returned_change=deposited - total,
+                session_start=now - timedelta(minutes=rng.randint(1, 60 * 24 * 60)),
+                is_completed=True,
+            ))
+            carts.append(cart)
+        sessions = CustomerSession.objects.bulk_create(sessions, batch_size=500)
+
+        purchases = []
+        money = []
+        for session, cart in zip(sessions, carts):
+            timestamp = session.session_start + MAURITIUS_OFFSET
+            lines = [PurchaseRecord(
+                customer_session=session, product=product, quantity=qty,
+                total_price=product.cost * qty, transaction_type='purchase'
+            ) for product, qty in cart.items()]
+            notes = [MoneyTransaction(session=session, denomination=denom, count=count, type='inserted')
+                     for denom, count in notes_for(session.deposited_amount).items()]
+            for row in lines + notes:
+                row.fill_ledger_fields(timestamp)
+            purchases.extend(lines)
+            money.extend(notes)
+        PurchaseRecord.objects.bulk_create(purchases, batch_size=1000)
+        MoneyTransaction.objects.bulk_create(money, batch_size=1000)
+        self.stdout.write(
+            f"Seeded {len(self.products)} products, {len(sessions)} sessions, "
+            f"{len(purchases)} purchase lines and {len(money)} money transactions"
+        )
+        self.stdout.write(f"\n{'scenario':<16}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+                          f"{'queries':>9}{'errors':>8}")
+
+    # ---------------------------
+    # SCENARIOS
+    # ---------------------------
+    def random_cart(self, rng):
+        return {product: rng.randint(1, 2) for product in rng.sample(self.products, rng.randint(1, 3))}
+
+    def make_request(self, name, client, rng):
+        """Issue one scenario request; returns the final HTTP status"""
+        if name == 'api_products':
+            return client.get('/api/products/').status_code
+        if name == 'api_purchases':
+            return client.get('/api/purchases/').status_code
+        if name == 'api_purchase':
+            cart = self.random_cart(rng)
+            total = sum(product.cost * qty for product, qty in cart.items())
+            body = {
+                'customer': 'benchmark',
+                'items': [{'product': product.id, 'quantity': qty} for product, qty in cart.items()],
+                'deposited_amount': str(total),
+            }
+            return client.post('/api/purchase/', json.dumps(body), content_type='application/json').status_code
+        # web_checkout: cart page, then payment with exact notes
+        cart = self.random_cart(rng)
+        total = sum(product.cost * qty for product, qty in cart.items())
+        response = client.post('/purchase/', {
+            'cart_submitted': '1', **{f'qty_{product.id}': qty for product, qty in cart.items()}
+        })
+        if response.status_code != 200:
+            return response.status_code
+        payment = {'process_payment': '1', **{f'insert_{d}': n for d, n in notes_for(total).items()}}
+        return client.post('/purchase/', payment).status_code
+
+    def run_scenario(self, name, options):
+        threads = options['concurrency']
+        per_thread = [options['requests'] // threads + (i < options['requests'] % threads) for i in range(threads)]
+        samples = []
+        errors = []
+        lock = threading.Lock()
+        ready = threading.Barrier(threads + 1)
+
+        def worker(index, count):
+            rng = random.Random(options['seed'] * 1000 + index)
+            client = Client()
+            if name == 'web_checkout':
+                client.post('/', {'role': 'student'})
+                client.post('/enter_name/', {'student_name': f'bench{index}'})
+            for _ in range(options['warmup']):
+                self.make_request(name, client, rng)
+            ready.wait()
+
+            mine = []
+            failed = 0
+            for _ in range(count):
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    try:
+                        status = self.make_request(name, client, rng)
+                    except Exception:
+                        status = 500
+                    elapsed = (time.perf_counter() - started) * 1000
+                mine.append((elapsed, len(captured)))
+                failed += status >= 400
+            connection.close()
+            with lock:
+                samples.extend(mine)
+                errors.append(failed)
+
+        workers = [threading.Thread(target=worker, args=(i, count)) for i, count in enumerate(per_thread)]
+        # The views print debug lines for every request; keep them out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            for thread in workers:
+                thread.start()
+            ready.wait()
+            started = time.perf_counter()
+            for thread in workers:
+                thread.join()
+            wall = time.perf_counter() - started
+
+        latencies = [s[0] for s in samples]
+        queries = [s[1] for s in samples]
+        return {
+            'requests': len(samples),
+            'errors': sum(errors),
+            'concurrency': threads,
+            'seconds': round(wall, 3),
+            'throughput_rps': round(len(samples) / wall, 1),
+            'latency_ms': {
+                'mean': round(statistics.mean(latencies), 2),
+                'p50': round(percentile(latencies, 50), 2),
+                'p95': round(percentile(latencies, 95), 2),
+                'p99': round(percentile(latencies, 99), 2),
+                'max': round(max(latencies), 2),
+            },
+            'queries_per_request': {
+                'mean': round(statistics.mean(queries), 1),
+                'max': max(queries),
+            },
+        }
+
+    def report(self, name, result, previous):
+        latency = result['latency_ms']
+        self.stdout.write(
+            f"{name:<16}{result['throughput_rps']:>8.1f}{latency['p50']:>9.2f}{latency['p95']:>9.2f}"
+            f"{latency['p99']:>9.2f}{result['queries_per_request']['mean']:>9.1f}{result['errors']:>8}"
+        )
+        before = (previous or {}).get('scenarios', {}).get(name)
+        if before:
+            def change(new, old):
+                return f"{(new - old) / old * 100:+.0f}%" if old else "n/a"
+            self.stdout.write(
+                f"{'  vs ' + str(previous.get('commit')):<16}{change(result['throughput_rps'], before['throughput_rps']):>8}"
+                f"{change(latency['p50'], before['latency_ms']['p50']):>9}"
+                f"{change(latency['p95'], before['latency_ms']['p95']):>9}"
+                f"{change(latency['p99'], before['latency_ms']['p99']):>9}"
+                f"{change(result['queries_per_request']['mean'], before['queries_per_request']['mean']):>9}"
+            )
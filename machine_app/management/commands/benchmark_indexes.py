@@ -0,0 +1,150 @@
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from django.db.utils import ConnectionHandler
+from django.utils import timezone
+
+from machine_app.models import VendingProduct, CustomerSession, PurchaseRecord, MoneyTransaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway SQLite database and print the query plans and timings "
+        "of the history queries before and after the composite indexes are added"
+    )
+
+    models = [VendingProduct, CustomerSession, PurchaseRecord, MoneyTransaction]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000,
+                            help="Purchase and money transaction rows to seed (default 1,000,000)")
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+
+        with tempfile.TemporaryDirectory() as tmp:
+            handler = ConnectionHandler({
+                'default': {
+                    'ENGINE': 'django.db.backends.sqlite3',
+                    'NAME': os.path.join(tmp, 'bench.sqlite3'),
+                }
+            })
+            conn = handler['default']
+            try:
+                self.create_schema(conn)
+                self.stdout.write(f"Seeding {rows:,} rows per history table...")
+                started = time.perf_counter()
+                self.seed(conn, rows)
+                self.stdout.write(f"Seeded in {time.perf_counter() - started:.1f}s\n")
+
+                self.report(conn, "BEFORE (foreign key indexes only)")
+                with conn.schema_editor() as editor:
+                    for model in self.models:
+                        for index in model._meta.indexes:
+                            editor.add_index(model, index)
+                with conn.cursor() as cursor:
+                    cursor.execute("ANALYZE")
+                self.report(conn, "AFTER (composite history indexes)")
+            finally:
+                conn.close()
+
+    def create_schema(self, conn):
+        """Create the tables without the Meta indexes so both plans can be compared"""
+        with conn.schema_editor() as editor:
+            for model in self.models:
+                editor.create_model(model)
+        with conn.schema_editor() as editor:
+            for model in self.models:
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+
+    def seed(self, conn, rows):
+        # Row counts are formatted in as integers; no user input reaches this SQL
+        sessions = max(rows // 2, 1)
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH RECURSIVE seq(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM seq WHERE x < 20)
+                INSERT INTO {VendingProduct._meta.db_table}
+                    (product_name, cost, available_quantity, product_image, category, is_available)
+                SELECT 'Product ' || x, 25, 30, '', CASE x % 2 WHEN 0 THEN 'snacks' ELSE 'drinks' END, 1
+                FROM seq
+                """
+            )
+            cursor.execute(
+                f"""
+                WITH RECURSIVE seq(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM seq WHERE x < {sessions})
+                INSERT INTO {CustomerSession._meta.db_table}
+                    (customer_id, deposited_amount, final_total, returned_change, session_start, is_completed)
+                SELECT 'student' || (x % 500), 100, 75, 25,
+                       datetime('2024-01-01', '+' || (x * 60) || ' seconds'), x % 10 != 0
+                FROM seq
+                """
+            )
+            cursor.execute(
+                f"""
+                WITH RECURSIVE seq(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM seq WHERE x < {rows})
+                INSERT INTO {PurchaseRecord._meta.db_table}
+                    (customer_session_id, product_id, quantity, total_price, transaction_type, timestamp)
+                SELECT (x % {sessions}) + 1, (x % 20) + 1, 1 + x % 3, 25 * (1 + x % 3),
+                       CASE WHEN x % 50 = 0 THEN 'refill' ELSE 'purchase' END,
+                       datetime('2024-01-01', '+' || (x * 30) || ' seconds')
+                FROM seq
+                """
+            )
+            cursor.execute(
+                f"""
+                WITH RECURSIVE seq(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM seq WHERE x < {rows})
+                INSERT INTO {MoneyTransaction._meta.db_table}
+                    (session_id, denomination, count, type, timestamp)
+                SELECT (x % {sessions}) + 1, 25, 1 + x % 4,
+                       CASE WHEN x % 3 = 0 THEN 'change' ELSE 'inserted' END,
+                       datetime('2024-01-01', '+' || (x * 30) || ' seconds')
+                FROM seq
+                """
+            )
+            cursor.execute("ANALYZE")
+
+    def query_shapes(self):
+        """The history queries issued by api.py, views.py and admin.py"""
+        since = timezone.make_aware(datetime(2024, 6, 1))
+        return [
+            ("purchases page (-timestamp, -id)",
+             PurchaseRecord.objects.order_by('-timestamp', '-id')[:101]),
+            ("purchases since window",
+             PurchaseRecord.objects.filter(timestamp__gte=since).order_by('-timestamp', '-id')[:101]),
+            ("admin purchases by transaction_type",
+             PurchaseRecord.objects.filter(transaction_type='refill').order_by('-timestamp')[:100]),
+            ("money page (-timestamp, -id)",
+             MoneyTransaction.objects.order_by('-timestamp', '-id')[:101]),
+            ("admin money by type",
+             MoneyTransaction.objects.filter(type='change').order_by('-timestamp')[:100]),
+            ("completed sessions (api_purchases)",
+             CustomerSession.objects.filter(is_completed=True).order_by('-session_start')[:100]),
+            ("sessions page (-session_start, -id)",
+             CustomerSession.objects.order_by('-session_start', '-id')[:101]),
+            ("sessions for one customer_id",
+             CustomerSession.objects.filter(customer_id='student42').order_by('-session_start', '-id')[:101]),
+        ]
+
+    def report(self, conn, title):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        with conn.cursor() as cursor:
+            for label, queryset in self.query_shapes():
+                sql, params = queryset.query.get_compiler(connection=conn).as_sql()
+
+                cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+                plan = [row[-1] for row in cursor.fetchall()]
+
+                started = time.perf_counter()
+                cursor.execute(sql, params)
+                cursor.fetchall()
+                elapsed = (time.perf_counter() - started) * 1000
+
+                self.stdout.write(f"  {label}: {elapsed:.2f} ms")
+                for step in plan:
+                    self.stdout.write(f"      {step}")
+        self.stdout.write("")
@@ -0,0 +1,103 @@
+import contextlib
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings
+
+from machine_app.models import VendingProduct
+
+
+def purchase_worker(product_id, purchases, start, results):
+    """One forked 'gunicorn worker': buy one item `purchases` times through /api/purchase/"""
+    client = Client()
+    body = json.dumps({
+        'customer': 'benchmark',
+        'items': [{'product': product_id, 'quantity': 1}],
+        'deposited_amount': 25,
+        'inserted': {'25': 1},
+    })
+    ok = failed = 0
+    start.wait()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(purchases):
+            try:
+                response = client.post('/api/purchase/', body, content_type='application/json')
+                if response.status_code == 200:
+                    ok += 1
+                else:
+                    failed += 1
+            except Exception:
+                failed += 1
+    connections.close_all()
+    results.put((ok, failed))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare concurrent purchases per second on SQLite with the default "
+        "settings and with the production profile (WAL, busy_timeout, "
+        "synchronous=NORMAL, IMMEDIATE purchase transactions). Each run uses "
+        "a fresh scratch database; the configured database is not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Concurrent worker processes (default: 4)")
+        parser.add_argument('--purchases', type=int, default=100,
+                            help="Purchases per worker (default: 100)")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("This benchmark only applies to SQLite databases.")
+
+        workers, purchases = options['workers'], options['purchases']
+        original_name = connection.settings_dict['NAME']
+        self.stdout.write(f"{workers} workers x {purchases} purchases\n")
+        self.stdout.write(f"{'profile':<10}{'ok':>7}{'failed':>8}{'seconds':>9}{'purchases/s':>13}")
+
+        with tempfile.TemporaryDirectory() as scratch:
+            try:
+                for profile, tuned in (('default', False), ('tuned', True)):
+                    connections.close_all()
+                    connection.settings_dict['NAME'] = os.path.join(scratch, f'{profile}.sqlite3')
+                    with override_settings(SQLITE_TUNING=tuned, ALLOWED_HOSTS=['*'], SECURE_SSL_REDIRECT=False):
+                        self.run_profile(profile, workers, purchases)
+            finally:
+                connections.close_all()
+                connection.settings_dict['NAME'] = original_name
+
+    def run_profile(self, profile, workers, purchases):
+        call_command('migrate', verbosity=0)
+        product = VendingProduct.objects.create(
+            product_name='Benchmark item', cost=25, available_quantity=workers * purchases
+        )
+        # Children must open their own connections, not share the parent's
+        connections.close_all()
+
+        context = multiprocessing.get_context('fork')
+        start = context.Event()
+        results = context.Queue()
+        processes = [
+            context.Process(target=purchase_worker, args=(product.id, purchases, start, results))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+
+        started = time.perf_counter()
+        start.set()
+        counts = [results.get() for _ in processes]
+        elapsed = time.perf_counter() - started
+        for process in processes:
+            process.join()
+
+        ok = sum(c[0] for c in counts)
+        failed = sum(c[1] for c in counts)
+        self.stdout.write(f"{profile:<10}{ok:>7}{failed:>8}{elapsed:>9.2f}{ok / elapsed:>13.1f}")
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from machine_app.journal import JournalUnavailable, PurchaseJournal
+
+
+class Command(BaseCommand):
+    help = (
+        "Write every checkout left in the purchase journal to the database "
+        "and empty the journal. The server must be stopped: the journal can "
+        "only be opened by one process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=settings.PURCHASE_JOURNAL_PATH,
+                            help="Journal file (default: settings.PURCHASE_JOURNAL_PATH)")
+
+    def handle(self, *args, **options):
+        try:
+            journal = PurchaseJournal(options['path'], settings.PURCHASE_JOURNAL_BATCH, settings.PURCHASE_JOURNAL_INTERVAL)
+        except JournalUnavailable as e:
+            raise CommandError(str(e))
+
+        pending = len(journal.pending)
+        written = 0
+        while True:
+            count = journal.flush()
+            if not count:
+                break
+            written += count
+            self.stdout.write(f"  {written}/{pending} checkouts written")
+
+        for product_id, units in journal.oversold.items():
+            self.stderr.write(f"  Product {product_id}: {units} sold beyond the stock in the database")
+        self.stdout.write(self.style.SUCCESS(f"Flushed {written} journaled checkouts."))
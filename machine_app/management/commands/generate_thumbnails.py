@@ -0,0 +1,68 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from machine_app.catalogue import bump_version
+from machine_app.models import VendingProduct
+from machine_app.thumbnails import generate_variants, store_variants
+
+
+def backfill_one(name, force):
+    try:
+        variants, written = generate_variants(name, force=force)
+        return name, variants, written, None
+    except (OSError, ValueError) as e:
+        return name, None, [], str(e)
+
+
+class Command(BaseCommand):
+    help = "Create the 80px/200px PNG and WebP thumbnails for existing product images"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Worker processes (default: CPU count)")
+        parser.add_argument('--force', action='store_true',
+                            help="Regenerate thumbnails that already exist")
+
+    def handle(self, *args, **options):
+        products = {}
+        for product_id, name, thumbnails in (
+            VendingProduct.objects.exclude(product_image='').exclude(product_image__isnull=True)
+            .values_list('id', 'product_image', 'thumbnails')
+        ):
+            products.setdefault(name, []).append((product_id, thumbnails))
+        names = sorted(products)
+        if not names:
+            self.stdout.write("No product images to process.")
+            return
+
+        # Worker processes must not inherit open database connections
+        connections.close_all()
+
+        created = failed = recorded = 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as pool:
+            results = list(pool.map(backfill_one, names, [options['force']] * len(names)))
+
+        for name, variants, written, error in results:
+            if error:
+                failed += 1
+                self.stderr.write(f"  {name}: {error}")
+                continue
+            if written:
+                created += 1
+                self.stdout.write(f"  {name}: {len(written)} thumbnails")
+            thumbnails = {'source': name, 'variants': variants}
+            stale = [product_id for product_id, current in products[name] if current != thumbnails]
+            if stale:
+                store_variants(stale, thumbnails)
+                recorded += 1
+
+        if created or recorded:
+            # /api/products/ lists the thumbnails recorded on each product; make clients fetch it again
+            bump_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {len(names)} images: {created} updated, {failed} failed."
+        ))
@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired sessions in small batches, so checkouts are never "
+        "stuck behind one long DELETE on the SQLite write lock"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Sessions deleted per transaction (default: 1000)")
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help="Seconds to sleep between batches (default: 0.05)")
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE.endswith('signed_cookies'):
+            self.stdout.write("Sessions are stored in signed cookies; nothing to purge.")
+            return
+
+        now = timezone.now()
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                keys = list(
+                    Session.objects.filter(expire_date__lt=now)
+                    .values_list('session_key', flat=True)[:options['batch_size']]
+                )
+                if not keys:
+                    break
+                deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+            self.stdout.write(f"  {deleted} expired sessions deleted")
+            time.sleep(options['pause'])
+
+        # Cached copies of expired cached_db sessions simply age out of the cache
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} expired sessions."))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from machine_app.models import PurchaseRecord, MoneyTransaction, SalesRollup, CashRollup
+from machine_app.rollups import RollupTotals
+
+
+def ledger_chunks(queryset, fields, chunk_size):
+    """Yield lists of value tuples, walking the ledger by id so each chunk is one indexed query"""
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).order_by('id').values_list('id', *fields)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1][0]
+
+
+class Command(BaseCommand):
+    help = "Rebuild the hourly/daily sales and cash rollups from PurchaseRecord and MoneyTransaction"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help="Ledger rows read and rollup rows written per batch (default: 5000)")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        totals = RollupTotals()
+        lines = cash = 0
+
+        # One transaction: checkouts wait for the rebuild instead of adding
+        # to buckets that are about to be replaced.
+        with transaction.atomic():
+            purchases = PurchaseRecord.objects.filter(transaction_type='purchase')
+            fields = ('timestamp', 'product_id', 'product__category', 'quantity', 'total_price')
+            for chunk in ledger_chunks(purchases, fields, chunk_size):
+                for _, timestamp, product_id, category, quantity, total_price in chunk:
+                    totals.add_sale(timestamp, product_id, category, quantity, total_price)
+                lines += len(chunk)
+                self.stdout.write(f"  {lines} purchase lines read")
+
+            fields = ('timestamp', 'type', 'denomination', 'count')
+            for chunk in ledger_chunks(MoneyTransaction.objects.all(), fields, chunk_size):
+                for _, timestamp, type, denomination, count in chunk:
+                    totals.add_money(timestamp, type, denomination * count)
+                cash += len(chunk)
+                self.stdout.write(f"  {cash} money transactions read")
+
+            SalesRollup.objects.all().delete()
+            CashRollup.objects.all().delete()
+            sales_rows = SalesRollup.objects.bulk_create(totals.sales_rows(), batch_size=chunk_size)
+            cash_rows = CashRollup.objects.bulk_create(totals.cash_rows(), batch_size=chunk_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {len(sales_rows)} sales and {len(cash_rows)} cash rollups "
+            f"from {lines} purchase lines and {cash} money transactions."
+        ))
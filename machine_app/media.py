@@ -0,0 +1,119 @@
+import hashlib
+import mimetypes
+import os
+import re
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.views.decorators.http import condition, require_safe
+
+
+# ---------------------------
+# MEDIA FILE SERVING
+# ---------------------------
+# Replaces django.views.static.serve for /media/: strong content ETags,
+# long-lived Cache-Control, single byte ranges, and FileResponse so the
+# WSGI server can use sendfile(). Images are already compressed, so no
+# Content-Encoding is applied.
+
+# Names carrying a content hash never change: the thumbnails written by
+# thumbnails.generate_variants, e.g. Monster_80.3f2a9c1b0d4e.webp
+HASHED_NAME = re.compile(r"\.[0-9a-f]{12,}\.[A-Za-z0-9]+$")
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+RANGE_HEADER = re.compile(r"^bytes=(\d*)-(\d*)$")
+RANGE_CHUNK_SIZE = 64 * 1024
+
+
+def media_path(path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Invalid media path")
+    if not os.path.isfile(full_path):
+        raise Http404("Media file not found")
+    return full_path
+
+
+@lru_cache(maxsize=4096)
+def content_hash(full_path, size, mtime_ns):
+    """SHA-1 of a file's content, recomputed only when its size or mtime changes"""
+    digest = hashlib.sha1()
+    with open(full_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(RANGE_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def media_etag(request, path):
+    """Strong ETag: hash of the file's content"""
+    full_path = media_path(path)
+    stat = os.stat(full_path)
+    return content_hash(full_path, stat.st_size, stat.st_mtime_ns)
+
+
+def media_last_modified(request, path):
+    return datetime.fromtimestamp(os.stat(media_path(path)).st_mtime, tz=timezone.utc)
+
+
+def range_response(request, full_path, size, content_type):
+    """206/416 response for a single 'bytes=start-end' range, or None to send the whole file"""
+    match = RANGE_HEADER.match(request.headers.get('Range', ''))
+    if not match or not any(match.groups()):
+        return None
+
+    start, end = match.groups()
+    if start:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(size - int(end), 0)
+        end = size - 1
+
+    if start > end or start >= size:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{size}"
+        return response
+
+    length = end - start + 1
+
+    def chunks():
+        with open(full_path, 'rb') as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                data = f.read(min(RANGE_CHUNK_SIZE, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+
+    response = StreamingHttpResponse(chunks(), status=206, content_type=content_type)
+    response['Content-Range'] = f"bytes {start}-{end}/{size}"
+    response['Content-Length'] = str(length)
+    return response
+
+
+@require_safe
+@condition(etag_func=media_etag, last_modified_func=media_last_modified)
+def serve_media(request, path):
+    """Serve a file from MEDIA_ROOT with validators and cache headers"""
+    full_path = media_path(path)
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    size = os.path.getsize(full_path)
+
+    response = range_response(request, full_path, size, content_type)
+    if response is None:
+        # FileResponse hands the file to wsgi.file_wrapper (sendfile on gunicorn)
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+
+    response['Accept-Ranges'] = 'bytes'
+    if HASHED_NAME.search(path):
+        response['Cache-Control'] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        response['Cache-Control'] = f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}"
+    return response
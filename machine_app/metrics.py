@@ -0,0 +1,259 @@
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from bisect import bisect_left
+from operator import add
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.urls import URLPattern, URLResolver, get_resolver
+
+
+# ---------------------------
+# REQUEST METRICS
+# ---------------------------
+# For every URL name: requests by status class, a latency histogram, and
+# the number and total time of database queries (counted with
+# connection.execute_wrapper). Served in Prometheus text format at
+# /metrics.
+#
+# The counters live in a memory-mapped file (settings.METRICS_FILE) so
+# every gunicorn worker on the machine writes to the same place. Each
+# process claims its own region of the file with a byte-range lock and
+# only ever adds to that region, so recording a request needs no
+# cross-process locking; /metrics adds the regions up. A region outlives
+# the process that wrote it, which keeps the counters monotonic across
+# worker restarts.
+#
+# A file is never resized once written: workers still running old code
+# may have it mapped. The layout checksum is part of the file name
+# (metrics.bin -> metrics-1a2b3c4d.bin), so a change to the URLs or the
+# fields starts a new file and the old one is left to the old workers.
+
+# Latency histogram bucket bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATUS_CLASSES = ('1xx', '2xx', '3xx', '4xx', '5xx')
+# Requests that matched no URL (404s, static files served before routing)
+UNMATCHED = 'unmatched'
+
+# int64 fields kept per URL name
+STATUS_FIELD = 0
+BUCKET_FIELD = STATUS_FIELD + len(STATUS_CLASSES)
+LATENCY_SUM_FIELD = BUCKET_FIELD + len(BUCKETS) + 1  # one extra bucket for +Inf
+QUERIES_FIELD = LATENCY_SUM_FIELD + 1
+QUERY_TIME_FIELD = QUERIES_FIELD + 1
+FIELDS = QUERY_TIME_FIELD + 1
+
+MAGIC = b'VMMETRC1'
+HEADER = struct.Struct('<8sQ')  # magic, layout checksum
+
+
+def url_names(patterns=None, namespace=''):
+    """Every named URL in the urlconf, with namespaces (e.g. 'admin:index')"""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    names = set()
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = f"{namespace}{pattern.namespace}:" if pattern.namespace else namespace
+            names |= url_names(pattern.url_patterns, prefix)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(namespace + pattern.name)
+    return names
+
+
+class MetricsStore:
+    """Per-view counters in a file shared by every process on the machine"""
+
+    def __init__(self, path, views, processes):
+        self.views = sorted(set(views) | {UNMATCHED})
+        self.index = {view: i for i, view in enumerate(self.views)}
+        self.processes = processes
+        self.region = len(self.views) * FIELDS  # int64s per process
+        size = HEADER.size + processes * self.region * 8
+        layout = zlib.crc32(f"{FIELDS}:{processes}:{','.join(self.views)}".encode())
+
+        root, ext = os.path.splitext(path)
+        self.path = f"{root}-{layout:08x}{ext}"
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            current = os.fstat(self.fd).st_size
+            if current == 0 or (current == size and os.pread(self.fd, HEADER.size, 0) != HEADER.pack(MAGIC, layout)):
+                # First process with this layout, or one that died setting the file up
+                os.ftruncate(self.fd, size)
+                os.pwrite(self.fd, HEADER.pack(MAGIC, layout), 0)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        if current not in (0, size):
+            os.close(self.fd)
+            raise ValueError(f"{self.path} has the wrong size for its layout; remove it")
+
+        self.map = mmap.mmap(self.fd, size)
+        self.values = memoryview(self.map)[HEADER.size:].cast('q')
+        self.lock = threading.Lock()
+        self.pid = None
+        self.base = None
+
+    def claim_region(self):
+        """Lock the first free process region; None if every region is taken"""
+        self.pid = os.getpid()
+        self.base = None
+        for slot in range(self.processes):
+            try:
+                fcntl.lockf(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB, self.region * 8, HEADER.size + slot * self.region * 8)
+            except OSError:
+                continue
+            self.base = slot * self.region
+            return
+
+    def record(self, view, status, seconds, queries, query_seconds):
+        with self.lock:
+            # Byte-range locks are not inherited, so a forked worker claims its own region
+            if self.pid != os.getpid():
+                self.claim_region()
+            if self.base is None:
+                return
+            values = self.values
+            offset = self.base + self.index.get(view, self.index[UNMATCHED]) * FIELDS
+            values[offset + STATUS_FIELD + min(max(status // 100, 1), 5) - 1] += 1
+            values[offset + BUCKET_FIELD + bisect_left(BUCKETS, seconds)] += 1
+            values[offset + LATENCY_SUM_FIELD] += int(seconds * 1000000)
+            values[offset + QUERIES_FIELD] += queries
+            values[offset + QUERY_TIME_FIELD] += int(query_seconds * 1000000)
+
+    def totals(self):
+        """Map view -> summed fields, for views that have seen requests"""
+        summed = [0] * self.region
+        for slot in range(self.processes):
+            summed = list(map(add, summed, self.values[slot * self.region:(slot + 1) * self.region]))
+        totals = {}
+        for i, view in enumerate(self.views):
+            fields = summed[i * FIELDS:(i + 1) * FIELDS]
+            if any(fields[STATUS_FIELD:BUCKET_FIELD]):
+                totals[view] = fields
+        return totals
+
+    def render(self):
+        """Prometheus text exposition format"""
+        totals = self.totals()
+        lines = [
+            '# HELP vending_http_requests_total Requests handled, by URL name and status class.',
+            '# TYPE vending_http_requests_total counter',
+        ]
+        for view, fields in totals.items():
+            for i, status in enumerate(STATUS_CLASSES):
+                if fields[STATUS_FIELD + i]:
+                    lines.append(f'vending_http_requests_total{{view="{view}",status="{status}"}} {fields[STATUS_FIELD + i]}')
+
+        lines += [
+            '# HELP vending_http_request_duration_seconds Request latency, by URL name.',
+            '# TYPE vending_http_request_duration_seconds histogram',
+        ]
+        for view, fields in totals.items():
+            cumulative = 0
+            for i, bound in enumerate(BUCKETS + (None,)):
+                cumulative += fields[BUCKET_FIELD + i]
+                le = '+Inf' if bound is None else repr(bound)
+                lines.append(f'vending_http_request_duration_seconds_bucket{{view="{view}",le="{le}"}} {cumulative}')
+            lines.append(f'vending_http_request_duration_seconds_sum{{view="{view}"}} {fields[LATENCY_SUM_FIELD] / 1000000}')
+            lines.append(f'vending_http_request_duration_seconds_count{{view="{view}"}} {cumulative}')
+
+        lines += [
+            '# HELP vending_db_queries_total Database queries run, by URL name.',
+            '# TYPE vending_db_queries_total counter',
+        ]
+        lines += [f'vending_db_queries_total{{view="{view}"}} {fields[QUERIES_FIELD]}' for view, fields in totals.items()]
+        lines += [
+            '# HELP vending_db_query_duration_seconds_total Time spent in database queries, by URL name.',
+            '# TYPE vending_db_query_duration_seconds_total counter',
+        ]
+        lines += [
+            f'vending_db_query_duration_seconds_total{{view="{view}"}} {fields[QUERY_TIME_FIELD] / 1000000}'
+            for view, fields in totals.items()
+        ]
+        return '\n'.join(lines) + '\n'
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def metrics_store():
+    """The process's MetricsStore, opened on first use (after the URLs are loaded)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MetricsStore(settings.METRICS_FILE, url_names(), settings.METRICS_MAX_PROCESSES)
+    return _store
+
+
+class QueryCounter:
+    """connection.execute_wrapper() callable counting queries and their time"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class CountedStream:
+    """
+    Streaming content wrapper that keeps counting queries while the body is
+    consumed (the history exports read rows only then), and calls done()
+    once the server closes the response.
+    """
+
+    def __init__(self, content, queries, done):
+        self.content = content
+        self.queries = queries
+        self.done = done
+
+    def __iter__(self):
+        with connection.execute_wrapper(self.queries):
+            yield from self.content
+
+    def close(self):
+        self.done()
+
+
+class MetricsMiddleware:
+    """Record latency and database cost of every request under its URL name"""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        view = match.view_name if match and match.url_name else UNMATCHED
+
+        def record():
+            elapsed = time.perf_counter() - started
+            metrics_store().record(view, response.status_code, elapsed, queries.count, queries.seconds)
+
+        if response.streaming:
+            # Latency and queries include sending the body
+            response.streaming_content = CountedStream(response.streaming_content, queries, record)
+        else:
+            record()
+        return response
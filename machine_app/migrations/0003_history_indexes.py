@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machine_app', '0002_moneytransaction_timestamp'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='moneytransaction',
+            options={'ordering': ['-timestamp'], 'verbose_name': 'Money Transaction', 'verbose_name_plural': 'Money Transactions'},
+        ),
+        migrations.AlterModelOptions(
+            name='purchaserecord',
+            options={'ordering': ['-timestamp'], 'verbose_name': 'Purchase Record', 'verbose_name_plural': 'Purchase Records'},
+        ),
+        migrations.AddIndex(
+            model_name='customersession',
+            index=models.Index(fields=['is_completed', '-session_start'], name='session_completed_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customersession',
+            index=models.Index(fields=['-session_start', '-id'], name='session_start_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customersession',
+            index=models.Index(fields=['customer_id', '-session_start', '-id'], name='session_customer_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moneytransaction',
+            index=models.Index(fields=['-timestamp', '-id'], name='money_timestamp_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moneytransaction',
+            index=models.Index(fields=['type', '-timestamp'], name='money_type_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserecord',
+            index=models.Index(fields=['-timestamp', '-id'], name='purchase_timestamp_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserecord',
+            index=models.Index(fields=['transaction_type', '-timestamp'], name='purchase_type_timestamp_idx'),
+        ),
+    ]
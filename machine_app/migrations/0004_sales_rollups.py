@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machine_app', '0003_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=4)),
+                ('period_start', models.DateTimeField()),
+                ('cash_in', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('change_out', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'verbose_name': 'Cash Rollup',
+                'verbose_name_plural': 'Cash Rollups',
+                'ordering': ['-period_start'],
+                'constraints': [models.UniqueConstraint(fields=('period', 'period_start'), name='cash_rollup_bucket_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=4)),
+                ('period_start', models.DateTimeField()),
+                ('category', models.CharField(max_length=20)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='machine_app.vendingproduct')),
+            ],
+            options={
+                'verbose_name': 'Sales Rollup',
+                'verbose_name_plural': 'Sales Rollups',
+                'ordering': ['-period_start', 'category'],
+                'indexes': [models.Index(fields=['period', 'category', 'period_start'], name='sales_rollup_category_idx')],
+                'constraints': [models.UniqueConstraint(fields=('period', 'period_start', 'product'), name='sales_rollup_bucket_uniq')],
+            },
+        ),
+    ]
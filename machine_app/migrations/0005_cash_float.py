@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:16
+
+from django.db import migrations, models
+
+# Notes/coins of each denomination the machine starts with
+INITIAL_FLOAT = {5: 20, 10: 20, 20: 20, 25: 20, 50: 20, 100: 10, 200: 5}
+
+
+def seed_float(apps, schema_editor):
+    CashFloat = apps.get_model('machine_app', 'CashFloat')
+    CashFloat.objects.bulk_create(
+        [CashFloat(denomination=d, count=n) for d, n in INITIAL_FLOAT.items()]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machine_app', '0004_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashFloat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('denomination', models.DecimalField(decimal_places=2, max_digits=6, unique=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Cash Float',
+                'verbose_name_plural': 'Cash Float',
+                'ordering': ['denomination'],
+            },
+        ),
+        migrations.RunPython(seed_float, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machine_app', '0005_cash_float'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customersession',
+            name='journal_seq',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machine_app', '0006_customersession_journal_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendingproduct',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+from machine_app.rollups import RollupTotals
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    Fill the rollups from the ledger already in the database, as the
+    rebuild_rollups command does; checkouts keep them current from here on.
+    """
+    PurchaseRecord = apps.get_model('machine_app', 'PurchaseRecord')
+    MoneyTransaction = apps.get_model('machine_app', 'MoneyTransaction')
+    SalesRollup = apps.get_model('machine_app', 'SalesRollup')
+    CashRollup = apps.get_model('machine_app', 'CashRollup')
+
+    totals = RollupTotals()
+    purchases = PurchaseRecord.objects.filter(transaction_type='purchase').values_list(
+        'timestamp', 'product_id', 'product__category', 'quantity', 'total_price'
+    )
+    for timestamp, product_id, category, quantity, total_price in purchases.iterator():
+        totals.add_sale(timestamp, product_id, category, quantity, total_price)
+    money = MoneyTransaction.objects.values_list('timestamp', 'type', 'denomination', 'count')
+    for timestamp, type, denomination, count in money.iterator():
+        totals.add_money(timestamp, type, denomination * count)
+
+    SalesRollup.objects.all().delete()
+    CashRollup.objects.all().delete()
+    SalesRollup.objects.bulk_create([
+        SalesRollup(period=period, period_start=start, product_id=product_id,
+                    category=category, quantity=quantity, revenue=revenue)
+        for (period, start, product_id, category), (quantity, revenue) in totals.sales.items()
+    ], batch_size=5000)
+    CashRollup.objects.bulk_create([
+        CashRollup(period=period, period_start=start, cash_in=cash_in, change_out=change_out)
+        for (period, start), (cash_in, change_out) in totals.cash.items()
+    ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machine_app', '0007_vendingproduct_thumbnails'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:56
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('machine_app', '0008_backfill_rollups'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='customersession',
+            name='session_completed_start_idx',
+        ),
+    ]
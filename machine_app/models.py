@@ -1,11 +1,75 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.dispatch import Signal
 from django.utils import timezone
 from datetime import timedelta
+from decimal import Decimal
 
 # Mauritius timezone offset
 MAURITIUS_OFFSET = timedelta(hours=4)
 
 
+# Sent after stock levels change through a bulk UPDATE (no post_save is fired)
+stock_changed = Signal()
+
+
+def ledger_timestamp():
+    """Timestamp stored on ledger rows (Mauritius local time)"""
+    return timezone.now() + MAURITIUS_OFFSET
+
+
+# ---------------------------
+# PRODUCT QUERYSET
+# ---------------------------
+class VendingProductQuerySet(models.QuerySet):
+    def reserve_stock(self, quantities):
+        """
+        Atomically take stock for a whole cart.
+
+        `quantities` maps product id -> quantity. All lines are decremented
+        with a single conditional UPDATE
+        (available_quantity = available_quantity - n WHERE available_quantity >= n),
+        or none of them are. Returns the list of product ids that could not
+        be served; an empty list means the stock was reserved.
+        """
+        quantities = {pid: qty for pid, qty in quantities.items() if qty > 0}
+        if not quantities:
+            return []
+
+        needed = Case(
+            *[When(id=pid, then=Value(qty)) for pid, qty in quantities.items()],
+            output_field=IntegerField()
+        )
+
+        while True:
+            with transaction.atomic():
+                updated = self.filter(
+                    id__in=quantities, available_quantity__gte=needed
+                ).update(available_quantity=F('available_quantity') - needed)
+                if updated == len(quantities):
+                    stock_changed.send(
+                        sender=VendingProduct,
+                        product_ids=list(quantities),
+                        deltas={pid: -qty for pid, qty in quantities.items()}
+                    )
+                    return []
+                transaction.set_rollback(True)
+
+            stock = dict(self.filter(id__in=quantities).values_list('id', 'available_quantity'))
+            failed = [pid for pid, qty in quantities.items() if stock.get(pid, 0) < qty]
+            if failed:
+                return failed
+            # Stock was replenished between the UPDATE and the check; try again
+
+    def restock(self, capacity=30):
+        """Refill every product in the queryset to `capacity` with one UPDATE"""
+        product_ids = list(self.values_list('id', flat=True))
+        if product_ids:
+            VendingProduct.objects.filter(id__in=product_ids).update(available_quantity=capacity)
+            stock_changed.send(sender=VendingProduct, product_ids=product_ids)
+        return len(product_ids)
+
+
 # ---------------------------
 # PRODUCT MODEL
 # ---------------------------
@@ -21,6 +85,10 @@ class VendingProduct(models.Model):
     product_image = models.ImageField(upload_to='products/', blank=True, null=True)
     category = models.CharField(max_length=20, choices=PRODUCT_CATEGORIES, default='snacks')
     is_available = models.BooleanField(default=True)
+    # {'source': image name, 'variants': {'80': {'png': name, 'webp': name}, ...}}, see thumbnails.py
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)
+
+    objects = VendingProductQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Vending Product"
@@ -32,16 +100,15 @@ class VendingProduct(models.Model):
 
     def reduce_stock(self, quantity):
         """Reduce available stock when a purchase is made"""
-        if self.available_quantity >= quantity:
-            self.available_quantity -= quantity
-            self.save()
-            return True
-        return False
+        if VendingProduct.objects.reserve_stock({self.pk: quantity}):
+            return False
+        self.refresh_from_db(fields=['available_quantity'])
+        return True
 
     def restock_product(self):
         """Refill product to maximum capacity (30)"""
+        VendingProduct.objects.filter(pk=self.pk).restock(30)
         self.available_quantity = 30
-        self.save()
 
 
 # ---------------------------
@@ -54,6 +121,8 @@ class CustomerSession(models.Model):
     returned_change = models.DecimalField(max_digits=8, decimal_places=2, default=0)
     session_start = models.DateTimeField(default=timezone.now)
     is_completed = models.BooleanField(default=False)
+    # Sequence number of the purchase journal record this session was written from
+    journal_seq = models.PositiveBigIntegerField(null=True, blank=True, unique=True, editable=False)
 
     @property
     def timestamp(self):
@@ -62,6 +131,14 @@ class CustomerSession(models.Model):
     class Meta:
         verbose_name = "Customer Session"
         verbose_name_plural = "Customer Sessions"
+        indexes = [
+            # sessions_api keyset pagination, the admin default ordering, and
+            # api_purchases (completed sessions newest first: nearly every
+            # session is completed, so the planner walks this index)
+            models.Index(fields=['-session_start', '-id'], name='session_start_id_idx'),
+            # ?customer_id= filters and admin search
+            models.Index(fields=['customer_id', '-session_start', '-id'], name='session_customer_start_idx'),
+        ]
 
     def __str__(self):
         return f"{self.customer_id} - {self.session_start.strftime('%d/%m/%Y %H:%M')}"
@@ -94,19 +171,29 @@ class PurchaseRecord(models.Model):
     transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPES, default='purchase')
     timestamp = models.DateTimeField(default=timezone.now)
 
-    def save(self, *args, **kwargs):
-        """Automatically calculate total and set timestamp"""
+    def fill_ledger_fields(self, timestamp=None):
+        """Calculate total and set timestamp (also used before bulk_create)"""
         if not self.total_price and self.transaction_type == 'purchase':
             self.total_price = self.product.cost * self.quantity
 
         # Use Mauritius local time
-        self.timestamp = timezone.now() + MAURITIUS_OFFSET
+        self.timestamp = timestamp or ledger_timestamp()
+
+    def save(self, *args, **kwargs):
+        """Automatically calculate total and set timestamp"""
+        self.fill_ledger_fields()
         super().save(*args, **kwargs)
 
     class Meta:
         verbose_name = "Purchase Record"
         verbose_name_plural = "Purchase Records"
         ordering = ['-timestamp']
+        indexes = [
+            # Default ordering and purchases_api/orders_api keyset pagination
+            models.Index(fields=['-timestamp', '-id'], name='purchase_timestamp_id_idx'),
+            # Admin transaction_type filter with the default ordering
+            models.Index(fields=['transaction_type', '-timestamp'], name='purchase_type_timestamp_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.product_name} x {self.quantity} ({self.transaction_type})"
@@ -131,15 +218,142 @@ class MoneyTransaction(models.Model):
     type = models.CharField(max_length=10, choices=TYPE_CHOICES)
     timestamp = models.DateTimeField(default=timezone.now)
 
+    def fill_ledger_fields(self, timestamp=None):
+        """Set timestamp in Mauritius time (also used before bulk_create)"""
+        self.timestamp = timestamp or ledger_timestamp()
+
     def save(self, *args, **kwargs):
         """Set timestamp in Mauritius time"""
-        self.timestamp = timezone.now() + MAURITIUS_OFFSET
+        self.fill_ledger_fields()
         super().save(*args, **kwargs)
 
     class Meta:
         verbose_name = "Money Transaction"
         verbose_name_plural = "Money Transactions"
         ordering = ['-timestamp']
+        indexes = [
+            # Default ordering and money_transactions_api keyset pagination
+            models.Index(fields=['-timestamp', '-id'], name='money_timestamp_id_idx'),
+            # Admin type filter with the default ordering
+            models.Index(fields=['type', '-timestamp'], name='money_type_timestamp_idx'),
+        ]
 
     def __str__(self):
         return f"{self.type} - Rs {self.denomination} x {self.count}"
+
+
+# ---------------------------
+# SALES ROLLUPS
+# ---------------------------
+# Pre-aggregated totals, kept up to date by CheckoutLedger.commit() in
+# the same transaction as the purchase (see rollups.py) and rebuilt from
+# the raw ledger with `manage.py rebuild_rollups`. Buckets follow the
+# ledger timestamps, which are already stored in Mauritius time.
+ROLLUP_PERIODS = [
+    ('hour', 'Hourly'),
+    ('day', 'Daily'),
+]
+
+
+class SalesRollup(models.Model):
+    period = models.CharField(max_length=4, choices=ROLLUP_PERIODS)
+    period_start = models.DateTimeField()
+    product = models.ForeignKey(VendingProduct, on_delete=models.CASCADE, related_name='sales_rollups')
+    category = models.CharField(max_length=20)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Sales Rollup"
+        verbose_name_plural = "Sales Rollups"
+        ordering = ['-period_start', 'category']
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'period_start', 'product'], name='sales_rollup_bucket_uniq'),
+        ]
+        indexes = [
+            # /api/stats/ per-category totals over a time window
+            models.Index(fields=['period', 'category', 'period_start'], name='sales_rollup_category_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.period} {self.period_start:%d/%m/%Y %H:%M}: {self.quantity}"
+
+
+class CashRollup(models.Model):
+    period = models.CharField(max_length=4, choices=ROLLUP_PERIODS)
+    period_start = models.DateTimeField()
+    cash_in = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    change_out = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Cash Rollup"
+        verbose_name_plural = "Cash Rollups"
+        ordering = ['-period_start']
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'period_start'], name='cash_rollup_bucket_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.period_start:%d/%m/%Y %H:%M}: in {self.cash_in}, out {self.change_out}"
+
+
+# ---------------------------
+# CASH FLOAT (CHANGE INVENTORY)
+# ---------------------------
+class CashFloatQuerySet(models.QuerySet):
+    def counts(self):
+        """Map denomination in cents -> notes/coins held"""
+        return {int(d * 100): n for d, n in self.values_list('denomination', 'count')}
+
+    def replenish(self, counts):
+        """Add notes/coins ({cents: count}) to the float with one UPDATE per new denomination"""
+        counts = {cents: n for cents, n in counts.items() if n > 0}
+        if not counts:
+            return
+        existing = set(self.counts())
+        for cents in counts:
+            if cents not in existing:
+                self.get_or_create(denomination=Decimal(cents) / 100)
+        self.filter(denomination__in=[Decimal(c) / 100 for c in counts]).update(
+            count=F('count') + Case(
+                *[When(denomination=Decimal(c) / 100, then=Value(n)) for c, n in counts.items()],
+                output_field=IntegerField()
+            )
+        )
+
+    def dispense(self, counts):
+        """
+        Take notes/coins ({cents: count}) out of the float with one
+        conditional UPDATE; all or nothing. Returns False if a drawer
+        no longer holds enough.
+        """
+        counts = {cents: n for cents, n in counts.items() if n > 0}
+        if not counts:
+            return True
+        needed = Case(
+            *[When(denomination=Decimal(c) / 100, then=Value(n)) for c, n in counts.items()],
+            output_field=IntegerField()
+        )
+        with transaction.atomic():
+            updated = self.filter(
+                denomination__in=[Decimal(c) / 100 for c in counts], count__gte=needed
+            ).update(count=F('count') - needed)
+            if updated == len(counts):
+                return True
+            transaction.set_rollback(True)
+        return False
+
+
+class CashFloat(models.Model):
+    denomination = models.DecimalField(max_digits=6, decimal_places=2, unique=True)
+    count = models.PositiveIntegerField(default=0)
+
+    objects = CashFloatQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Cash Float"
+        verbose_name_plural = "Cash Float"
+        ordering = ['denomination']
+
+    def __str__(self):
+        return f"Rs {self.denomination} x {self.count}"
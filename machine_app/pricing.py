@@ -0,0 +1,63 @@
+from decimal import Decimal
+
+from .models import VendingProduct
+
+
+# ---------------------------
+# CART PRICING SERVICE
+# ---------------------------
+class PricedCart:
+    """A cart resolved against the catalogue, with Decimal line totals"""
+
+    def __init__(self, lines, missing):
+        self.lines = lines
+        self.missing = missing
+        self.total = sum((line['line_total'] for line in lines), Decimal('0'))
+
+    def quantities(self):
+        """Map product id -> quantity, as taken by reserve_stock()"""
+        return {line['product'].id: line['quantity'] for line in self.lines}
+
+
+def price_cart(quantities, for_update=False, catalogue=None):
+    """
+    Resolve a whole cart with a single query.
+
+    `quantities` is a {product_id: quantity} dict or an iterable of
+    (product_id, quantity) pairs. Lines with a quantity of zero or less are dropped, and quantities for a
+    repeated product id are added together. Ids that do not exist end up in
+    `missing`. Pass for_update=True inside a transaction to lock the rows
+    while the purchase is written. Pass `catalogue` ({product_id: product})
+    to price against products already in memory instead of querying.
+    """
+    if hasattr(quantities, 'items'):
+        quantities = quantities.items()
+
+    wanted = {}
+    for product_id, quantity in quantities:
+        product_id, quantity = int(product_id), int(quantity)
+        if quantity > 0:
+            wanted[product_id] = wanted.get(product_id, 0) + quantity
+
+    if catalogue is not None:
+        products = catalogue
+    else:
+        queryset = VendingProduct.objects.all()
+        if for_update:
+            queryset = queryset.select_for_update()
+        products = queryset.in_bulk(wanted) if wanted else {}
+
+    lines = []
+    missing = []
+    for product_id, quantity in wanted.items():
+        product = products.get(product_id)
+        if product is None:
+            missing.append(product_id)
+            continue
+        lines.append({
+            'product': product,
+            'quantity': quantity,
+            'unit_price': product.cost,
+            'line_total': product.cost * quantity,
+        })
+    return PricedCart(lines, missing)
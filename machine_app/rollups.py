@@ -0,0 +1,107 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Q, Value, When
+
+from .models import SalesRollup, CashRollup
+
+
+# ---------------------------
+# SALES ROLLUP MAINTENANCE
+# ---------------------------
+# Hourly and daily totals per product (with its category) and for cash
+# inserted / change returned. Only 'purchase' lines count as sales;
+# refills move stock, not money.
+
+def period_starts(timestamp):
+    """The hourly and daily bucket a ledger timestamp falls into"""
+    hour = timestamp.replace(minute=0, second=0, microsecond=0)
+    return [('hour', hour), ('day', hour.replace(hour=0))]
+
+
+class RollupTotals:
+    """In-memory totals for a batch of ledger rows, keyed by bucket"""
+
+    def __init__(self):
+        self.sales = defaultdict(lambda: [0, Decimal('0')])   # (period, start, product_id, category) -> [qty, revenue]
+        self.cash = defaultdict(lambda: [Decimal('0'), Decimal('0')])   # (period, start) -> [cash_in, change_out]
+
+    def add_sale(self, timestamp, product_id, category, quantity, revenue):
+        for period, start in period_starts(timestamp):
+            totals = self.sales[(period, start, product_id, category)]
+            totals[0] += quantity
+            totals[1] += revenue
+
+    def add_money(self, timestamp, type, amount):
+        for period, start in period_starts(timestamp):
+            self.cash[(period, start)][0 if type == 'inserted' else 1] += amount
+
+    def sales_rows(self):
+        return [
+            SalesRollup(period=period, period_start=start, product_id=product_id,
+                        category=category, quantity=quantity, revenue=revenue)
+            for (period, start, product_id, category), (quantity, revenue) in self.sales.items()
+        ]
+
+    def cash_rows(self):
+        return [
+            CashRollup(period=period, period_start=start, cash_in=cash_in, change_out=change_out)
+            for (period, start), (cash_in, change_out) in self.cash.items()
+        ]
+
+
+def add_to_buckets(model, key_fields, rows, amount_fields):
+    """
+    Add the amounts of unsaved rollup rows to the stored buckets with the
+    same key, in a fixed number of queries whatever the number of rows:
+    one SELECT for the buckets that exist, one UPDATE with a Case over
+    them, and one bulk_create for the new ones.
+    """
+    if not rows:
+        return
+    wanted = {tuple(getattr(row, field) for field in key_fields): row for row in rows}
+    match = Q()
+    for key in wanted:
+        match |= Q(**dict(zip(key_fields, key)))
+    existing = {
+        tuple(values[1:]): values[0]
+        for values in model.objects.filter(match).values_list('id', *key_fields)
+    }
+
+    if existing:
+        model.objects.filter(id__in=existing.values()).update(**{
+            field: F(field) + Case(
+                *[When(id=pk, then=Value(getattr(wanted[key], field))) for key, pk in existing.items()],
+                output_field=model._meta.get_field(field)
+            )
+            for field in amount_fields
+        })
+
+    missing = [row for key, row in wanted.items() if key not in existing]
+    if missing:
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(missing)
+        except IntegrityError:
+            # Another checkout created one of these buckets first; add to it instead
+            add_to_buckets(model, key_fields, missing, amount_fields)
+
+
+def record_checkout(purchases, money):
+    """
+    Fold one checkout's PurchaseRecord and MoneyTransaction rows into the
+    rollups. Call inside the checkout's transaction, after its rows have
+    their timestamps, so the totals commit (or roll back) with it. The cost
+    is the same few queries per rollup model whatever the cart size.
+    """
+    totals = RollupTotals()
+    for row in purchases:
+        if row.transaction_type == 'purchase':
+            totals.add_sale(row.timestamp, row.product_id, row.product.category,
+                            row.quantity, row.total_price)
+    for row in money:
+        totals.add_money(row.timestamp, row.type, row.denomination * row.count)
+
+    add_to_buckets(SalesRollup, ('period', 'period_start', 'product_id'), totals.sales_rows(), ('quantity', 'revenue'))
+    add_to_buckets(CashRollup, ('period', 'period_start'), totals.cash_rows(), ('cash_in', 'change_out'))
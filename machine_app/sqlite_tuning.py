@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+# ---------------------------
+# SQLITE PRODUCTION PROFILE
+# ---------------------------
+# The kiosks run on the bundled db.sqlite3 with several gunicorn workers.
+# With the default rollback journal a writer blocks every reader, and two
+# deferred transactions that both upgrade to a write lock fail at once
+# with "database is locked" (waiting cannot help, so busy_timeout is
+# skipped). The profile below switches to WAL, lets writers queue on
+# busy_timeout, and starts the purchase transactions as IMMEDIATE so they
+# take the write lock up front and queue instead of deadlocking.
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Apply settings.SQLITE_PRAGMAS to every new SQLite connection"""
+    if connection.vendor != 'sqlite' or not settings.SQLITE_TUNING:
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+
+
+class ImmediateAtomic(transaction.Atomic):
+    """
+    transaction.atomic() that opens the outermost SQLite transaction with
+    BEGIN IMMEDIATE. Nested blocks are plain savepoints, and other
+    databases (or SQLITE_TUNING off) get an ordinary atomic block.
+    """
+
+    def __enter__(self):
+        connection = transaction.get_connection(self.using)
+        if connection.vendor != 'sqlite' or connection.in_atomic_block or not settings.SQLITE_TUNING:
+            return super().__enter__()
+
+        # Connect first: opening the connection resets transaction_mode from OPTIONS
+        connection.ensure_connection()
+        previous = connection.transaction_mode
+        connection.transaction_mode = 'IMMEDIATE'
+        try:
+            return super().__enter__()
+        finally:
+            connection.transaction_mode = previous
+
+
+def immediate_atomic(using=None):
+    """Use as a decorator or context manager, like transaction.atomic"""
+    if callable(using):
+        return ImmediateAtomic(None, True, False)(using)
+    return ImmediateAtomic(using, True, False)
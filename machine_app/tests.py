@@ -0,0 +1,464 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import ExitStack
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from .catalogue import bump_version, get_products
+from .change import (
+    VALID_DENOMINATIONS, ChangeTables, ChangeUnavailable, inserted_notes, make_change, settle_payment, solve_bounded,
+)
+from .events import last_event_id, long_poll_slot
+from .journal import PurchaseJournal
+from .metrics import STATUS_FIELD, MetricsStore
+from .models import CashFloat, CustomerSession, MoneyTransaction, PurchaseRecord, VendingProduct
+
+
+def student_client(client, name='kesh'):
+    """Log the test client in as a student, as the index and enter_name pages do"""
+    session = client.session
+    session['role'] = 'student'
+    session['student_name'] = name
+    session.save()
+    return client
+
+
+def create_history(count, products):
+    """Completed sessions buying one of each product, paid exactly with Rs 5 coins"""
+    for i in range(count):
+        total = sum(p.cost for p in products)
+        session = CustomerSession.objects.create(
+            customer_id=f"student{i}", deposited_amount=total, final_total=total, is_completed=True
+        )
+        for product in products:
+            PurchaseRecord.objects.create(customer_session=session, product=product, quantity=1, total_price=product.cost)
+        MoneyTransaction.objects.create(session=session, denomination=Decimal('5'), count=int(total / 5), type='inserted')
+
+
+# ---------------------------
+# PURCHASE HISTORY QUERY COUNT
+# ---------------------------
+class PurchaseHistoryQueryCountTests(TestCase):
+    def setUp(self):
+        self.products = [
+            VendingProduct.objects.create(product_name=f"Item {i}", cost=Decimal('5'), available_quantity=30)
+            for i in range(3)
+        ]
+
+    def assertHistoryQueries(self, sessions):
+        # ETag aggregate, sessions, and every session's purchase lines in one prefetch
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/purchases/')
+        self.assertEqual(len(response.json()), sessions)
+
+    def test_query_count_does_not_grow_with_history(self):
+        create_history(2, self.products)
+        self.assertHistoryQueries(2)
+        create_history(50, self.products)
+        self.assertHistoryQueries(52)
+
+
+# ---------------------------
+# CHANGE MAKING
+# ---------------------------
+def fewest_pieces(cents, denominations):
+    """Reference minimum piece count by plain dynamic programming"""
+    best = [0] + [None] * cents
+    for amount in range(1, cents + 1):
+        options = [best[amount - d] for d in denominations if d <= amount and best[amount - d] is not None]
+        best[amount] = min(options) + 1 if options else None
+    return best[cents]
+
+
+def greedy(cents, denominations):
+    counts = {}
+    for d in sorted(denominations, reverse=True):
+        counts[d], cents = divmod(cents, d)
+    return {d: n for d, n in counts.items() if n}
+
+
+class ChangeMakingTests(TestCase):
+    DENOMINATIONS = [d * 100 for d in VALID_DENOMINATIONS]
+
+    def stock_float(self, **counts):
+        """Set the float (seeded by the migrations) to exactly these drawers, e.g. rs20=2"""
+        CashFloat.objects.update(count=0)
+        for rupees, n in counts.items():
+            CashFloat.objects.update_or_create(denomination=Decimal(rupees[2:]), defaults={'count': n})
+
+    def float_counts(self):
+        return {cents: n for cents, n in CashFloat.objects.counts().items() if n}
+
+    def test_unlimited_lookup_is_fewest_pieces(self):
+        tables = ChangeTables(VALID_DENOMINATIONS, 1000)
+        for cents in range(0, 100001, 500):
+            payable, counts = tables.lookup(cents)
+            self.assertEqual(payable, cents)
+            self.assertEqual(sum(d * n for d, n in zip(tables.denominations, counts)), cents)
+            self.assertEqual(sum(counts), fewest_pieces(cents // 500, [d // 500 for d in self.DENOMINATIONS]))
+            # Never more pieces than greedy
+            self.assertLessEqual(sum(counts), sum(greedy(cents, self.DENOMINATIONS).values()))
+
+    def test_lookup_agrees_with_greedy_where_greedy_is_optimal(self):
+        self.assertEqual(make_change(38500, {d: 10 for d in self.DENOMINATIONS})[0], greedy(38500, self.DENOMINATIONS))
+        # Greedy would give 25 + 10 + 5
+        self.assertEqual(make_change(4000, {d: 10 for d in self.DENOMINATIONS})[0], {2000: 2})
+
+    def test_falls_back_to_the_float_when_a_note_is_missing(self):
+        float_counts = {d: 10 for d in self.DENOMINATIONS if d != 2000}
+        self.assertEqual(make_change(4000, float_counts), ({2500: 1, 1000: 1, 500: 1}, 0))
+        self.assertEqual(solve_bounded([1, 2, 4, 5], [3, 0, 1, 0], 7), [3, 0, 1, 0])
+        self.assertIsNone(solve_bounded([1, 2], [0, 3], 7))
+
+    def test_shortfall_below_the_smallest_coin(self):
+        self.assertEqual(make_change(350, {500: 5}), ({}, 350))
+        self.assertEqual(make_change(750, {500: 5}), ({500: 1}, 250))
+        self.stock_float(rs5=5)
+        settlement = settle_payment(Decimal('20'), Decimal('12.50'), {20: 1})
+        self.assertEqual(settlement.breakdown, {5: 1})
+        self.assertEqual(settlement.shortfall, Decimal('2.50'))
+
+    def test_inserted_notes_are_validated(self):
+        self.assertEqual(inserted_notes(Decimal('35'), {20: 1, 10: 1, 5: 1, 50: 0}), {20: 1, 10: 1, 5: 1})
+        self.assertEqual(inserted_notes(Decimal('35')), {25: 1, 10: 1})
+        with self.assertRaisesMessage(ValueError, "Unknown denomination"):
+            inserted_notes(Decimal('3'), {3: 1})
+        with self.assertRaisesMessage(ValueError, "do not add up"):
+            inserted_notes(Decimal('50'), {20: 2})
+
+    def test_unavailable_change_leaves_the_float_untouched(self):
+        self.stock_float(rs100=3)
+        with self.assertRaises(ChangeUnavailable):
+            settle_payment(Decimal('100'), Decimal('50'), {100: 1})
+        self.assertEqual(self.float_counts(), {10000: 3})
+
+    def test_dispense_is_retried_when_a_drawer_empties(self):
+        self.stock_float(rs5=2, rs10=2, rs20=2, rs25=2)
+        real_counts = CashFloat.objects.counts
+
+        def stale_counts():
+            counts = real_counts()
+            if not CashFloat.objects.filter(denomination=20, count=0).exists():
+                # Another checkout takes both Rs 20 notes after this read
+                CashFloat.objects.filter(denomination=20).update(count=0)
+            return counts
+
+        with mock.patch.object(CashFloat.objects, 'counts', side_effect=stale_counts) as counts:
+            settlement = settle_payment(Decimal('40'), Decimal('0'), {20: 2})
+        self.assertEqual(counts.call_count, 2)
+        self.assertEqual(settlement.breakdown, {25: 1, 10: 1, 5: 1})
+        self.assertEqual(self.float_counts(), {500: 1, 1000: 1, 2500: 1})
+
+
+# ---------------------------
+# ADMIN CHANGELIST QUERY COUNT
+# ---------------------------
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class AdminChangelistQueryCountTests(TestCase):
+    # User, paginator count and the page of rows with its joins or annotation;
+    # the session itself is read from the session cache
+    CHANGELISTS = {
+        'customersession': 3,
+        'purchaserecord': 3,
+        'moneytransaction': 3,
+        'cashfloat': 4,  # small table: keeps the full result count
+    }
+
+    def setUp(self):
+        self.products = [
+            VendingProduct.objects.create(product_name=f"Item {i}", cost=Decimal('5'), available_quantity=30)
+            for i in range(3)
+        ]
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    def assertChangelistQueries(self):
+        for model, queries in self.CHANGELISTS.items():
+            with self.subTest(model=model), self.assertNumQueries(queries):
+                response = self.client.get(f'/admin/machine_app/{model}/')
+                self.assertEqual(response.status_code, 200)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        create_history(2, self.products)
+        self.assertChangelistQueries()
+        create_history(40, self.products)
+        self.assertChangelistQueries()
+
+
+# ---------------------------
+# CHECKOUT QUERY COUNT
+# ---------------------------
+class CheckoutQueryCountTests(TestCase):
+    def setUp(self):
+        self.products = [
+            VendingProduct.objects.create(product_name=f"Item {i}", cost=Decimal('5'), available_quantity=30)
+            for i in range(10)
+        ]
+        student_client(self.client)
+
+    def pay(self, products):
+        """Web checkout of one of each product, paid exactly in Rs 5 coins; returns the payment's query count"""
+        self.client.post('/purchase/', {'cart_submitted': '1', **{f'qty_{p.id}': '1' for p in products}})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/purchase/', {'process_payment': '1', 'insert_5': str(len(products))})
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        # The first checkout creates the rollup buckets for every product
+        self.pay(self.products)
+        self.assertEqual(self.pay(self.products[:1]), self.pay(self.products))
+
+
+# ---------------------------
+# CATALOGUE CACHE
+# ---------------------------
+class CatalogueCacheTests(TestCase):
+    def test_committed_changes_invalidate_the_catalogue(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cola = VendingProduct.objects.create(product_name="Cola", cost=Decimal('25'), available_quantity=5)
+        self.assertEqual([p.cost for p in get_products()], [Decimal('25')])
+
+        cola.cost = Decimal('30')
+        with self.captureOnCommitCallbacks(execute=True):
+            cola.save()
+        self.assertEqual([p.cost for p in get_products()], [Decimal('30')])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            VendingProduct.objects.reserve_stock({cola.id: 2})
+        self.assertEqual([p.available_quantity for p in get_products()], [3])
+
+
+# ---------------------------
+# PRODUCT THUMBNAILS
+# ---------------------------
+class ProductThumbnailTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        # Saving the product creates the thumbnails (thumbnails.create_thumbnails),
+        # and the commit invalidates the cached catalogue
+        self.product = self.create_product("Monster", 'Monster.png', 'red')
+
+    def create_product(self, name, image_name, colour):
+        buffer = io.BytesIO()
+        Image.new('RGB', (300, 300), colour).save(buffer, image_name.rsplit('.', 1)[1].upper())
+        product = VendingProduct(product_name=name, cost=Decimal('50'), available_quantity=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            product.product_image.save(image_name, ContentFile(buffer.getvalue()))
+        return product
+
+    def listed(self):
+        return {product['name']: product for product in self.client.get('/api/products/').json()}
+
+    def test_lists_generated_thumbnails(self):
+        product = self.listed()['Monster']
+        self.assertRegex(product['thumbnail'], r'/media/products/Monster_80\.[0-9a-f]{12}\.png$')
+        self.assertEqual(set(product['thumbnails']), {'80', '200'})
+        self.assertEqual(self.client.get(product['thumbnail']).status_code, 200)
+
+    def test_same_stem_images_get_their_own_thumbnails(self):
+        self.create_product("Monster Ultra", 'Monster.webp', 'blue')
+        listed = self.listed()
+        self.assertNotEqual(listed['Monster']['thumbnail'], listed['Monster Ultra']['thumbnail'])
+        red, blue = (Image.open(io.BytesIO(self.client.get(listed[name]['thumbnail']).getvalue())).convert('RGB')
+                     for name in ('Monster', 'Monster Ultra'))
+        self.assertEqual(red.getpixel((40, 40)), (255, 0, 0))
+        self.assertEqual(blue.getpixel((40, 40)), (0, 0, 255))
+
+    def test_listing_does_not_touch_storage(self):
+        with mock.patch.object(FileSystemStorage, 'exists') as exists:
+            self.listed()
+        self.assertFalse(exists.called)
+
+    def test_falls_back_to_original_without_thumbnails(self):
+        # e.g. an image uploaded before thumbnails existed, until generate_thumbnails runs
+        with self.captureOnCommitCallbacks(execute=True):
+            VendingProduct.objects.filter(pk=self.product.pk).update(thumbnails={})
+            bump_version()
+        product = self.listed()['Monster']
+        self.assertEqual(product['thumbnail'], product['image'])
+        self.assertIsNone(product['thumbnails'])
+
+
+# ---------------------------
+# MEDIA FILE SERVING
+# ---------------------------
+class MediaServingTests(TestCase):
+    CONTENT = bytes(range(256)) * 4
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media, MEDIA_CACHE_MAX_AGE=600))
+        os.makedirs(os.path.join(media, 'products'))
+        for name in ('Monster.png', 'Monster_80.3f2a9c1b0d4e.png'):
+            with open(os.path.join(media, 'products', name), 'wb') as f:
+                f.write(self.CONTENT)
+
+    def get(self, path, **headers):
+        return self.client.get(f'/media/products/{path}', headers=headers)
+
+    def test_etag_revalidates_with_304(self):
+        response = self.get('Monster.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT)
+        self.assertEqual(self.get('Monster.png', if_none_match=response['ETag']).status_code, 304)
+        self.assertEqual(self.get('Monster.png', if_none_match='"stale"').status_code, 200)
+
+    def test_single_byte_range(self):
+        response = self.get('Monster.png', range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.CONTENT)}')
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT[10:20])
+        response = self.get('Monster.png', range='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT[-5:])
+
+    def test_unsatisfiable_range(self):
+        response = self.get('Monster.png', range=f'bytes={len(self.CONTENT)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.CONTENT)}')
+
+    def test_hashed_names_are_immutable(self):
+        self.assertEqual(self.get('Monster_80.3f2a9c1b0d4e.png')['Cache-Control'],
+                         'public, max-age=31536000, immutable')
+        self.assertEqual(self.get('Monster.png')['Cache-Control'], 'public, max-age=600')
+
+# ---------------------------
+# CONCURRENT STOCK RESERVATION
+# ---------------------------
+class ConcurrentReserveStockTests(TransactionTestCase):
+    """Runs against the file-backed test database, one connection per thread"""
+
+    def test_stock_never_goes_negative(self):
+        cola = VendingProduct.objects.create(product_name="Cola", cost=Decimal('25'), available_quantity=20)
+        chips = VendingProduct.objects.create(product_name="Chips", cost=Decimal('15'), available_quantity=20)
+        cart = {cola.id: 2, chips.id: 1}
+        results = []
+        errors = []
+        start = threading.Barrier(8)
+
+        def buyer():
+            try:
+                start.wait()
+                for _ in range(5):
+                    results.append(VendingProduct.objects.reserve_stock(cart))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buyer) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), 40)
+        sold = results.count([])
+        self.assertEqual(sold, 10)
+        self.assertTrue(all(failed == [cola.id] for failed in results if failed))
+        cola.refresh_from_db()
+        chips.refresh_from_db()
+        self.assertEqual(cola.available_quantity, 0)
+        self.assertEqual(chips.available_quantity, 20 - sold)
+
+
+# ---------------------------
+# LIVE EVENTS
+# ---------------------------
+class EventLongPollTests(TestCase):
+    def test_answers_at_once_when_every_waiting_slot_is_taken(self):
+        with ExitStack() as stack:
+            slots = [stack.enter_context(long_poll_slot()) for _ in range(settings.EVENTS_MAX_WAITERS)]
+            self.assertTrue(all(slots))
+            response = self.client.get('/api/events/', {'since': last_event_id(), 'timeout': 20})
+        self.assertEqual(response.json()['retry_after'], settings.EVENTS_BUSY_RETRY)
+        self.assertEqual(response['Retry-After'], str(settings.EVENTS_BUSY_RETRY))
+        self.assertEqual(response.json()['events'], [])
+
+    def test_waits_when_a_slot_is_free(self):
+        response = self.client.get('/api/events/', {'since': last_event_id(), 'timeout': 0.05})
+        self.assertNotIn('retry_after', response.json())
+
+
+# ---------------------------
+# PURCHASE JOURNAL
+# ---------------------------
+class PurchaseJournalTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.cola = VendingProduct.objects.create(product_name="Cola", cost=Decimal('25'), available_quantity=3)
+        self.journal = PurchaseJournal(os.path.join(directory, 'purchases.log'), batch_size=100, interval=1)
+        self.addCleanup(self.journal.file.close)
+        self.journal.reload()
+
+    def test_cart_step_is_priced_without_the_database(self):
+        student_client(self.client)
+        with mock.patch('machine_app.views.purchase_journal', return_value=self.journal), \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/purchase/', {'cart_submitted': '1', f'qty_{self.cola.id}': '2'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_cost'], 50.0)
+        self.assertFalse([q for q in queries.captured_queries if 'vendingproduct' in q['sql']])
+
+    def test_flush_reports_units_sold_twice(self):
+        self.journal.checkout('kesh', self.journal.price({self.cola.id: 2}), Decimal('50'))
+        # A synchronous checkout in another worker sells from the same stock meanwhile
+        VendingProduct.objects.filter(id=self.cola.id).update(available_quantity=1)
+        self.journal.flush_all()
+        self.cola.refresh_from_db()
+        self.assertEqual(self.cola.available_quantity, 0)
+        self.assertEqual(self.journal.oversold, {self.cola.id: 1})
+
+
+# ---------------------------
+# REQUEST METRICS
+# ---------------------------
+class MetricsStoreTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'metrics.bin')
+
+    def test_new_layout_leaves_the_mapped_file_alone(self):
+        old = MetricsStore(self.path, ['index'], processes=2)
+        old.record('index', 200, 0.01, 3, 0.001)
+        # A deploy adds a URL while the old worker is still running
+        new = MetricsStore(self.path, ['index', 'stats_api'], processes=2)
+        self.assertNotEqual(old.path, new.path)
+        old.record('index', 200, 0.01, 3, 0.001)
+        self.assertEqual(old.totals()['index'][STATUS_FIELD + 1], 2)  # 2xx
+        self.assertEqual(new.totals(), {})
+
+    def test_counts_queries_run_while_streaming_an_export(self):
+        create_history(3, [VendingProduct.objects.create(product_name="Cola", cost=Decimal('25'))])
+        store = mock.Mock()
+        with mock.patch('machine_app.metrics.metrics_store', return_value=store):
+            response = self.client.get('/api/money-transactions/', {'format': 'csv'})
+            self.assertFalse(store.record.called)
+            with CaptureQueriesContext(connection) as streamed:
+                self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 4)
+            response.close()
+        view, status, seconds, queries, query_seconds = store.record.call_args.args
+        self.assertEqual(view, 'money_transactions_api')
+        self.assertGreaterEqual(queries, len(streamed) + 1)
+
+    def test_same_layout_shares_the_counters(self):
+        first = MetricsStore(self.path, ['index'], processes=2)
+        first.record('index', 200, 0.01, 3, 0.001)
+        self.assertEqual(MetricsStore(self.path, ['index'], processes=2).totals()['index'][STATUS_FIELD + 1], 1)
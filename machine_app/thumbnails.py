@@ -0,0 +1,110 @@
+import hashlib
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from PIL import Image
+
+from .models import VendingProduct
+
+
+# ---------------------------
+# PRODUCT IMAGE VARIANTS
+# ---------------------------
+# Every uploaded product image gets fixed-size thumbnails stored beside the
+# original, named after it plus a hash of its content, e.g.
+# products/Monster.webp -> products/Monster_80.3f2a9c1b0d4e.png,
+# products/Monster_80.3f2a9c1b0d4e.webp, products/Monster_200.3f2a9c1b0d4e.png, ...
+# Two images with the same stem (Monster.png, Monster.webp) never share
+# thumbnails, and a name never changes content, so /media/ can serve it as
+# immutable. The names are stored on the product (VendingProduct.thumbnails)
+# when they are generated, so listing them needs no storage lookups.
+
+THUMBNAIL_SIZES = (80, 200)
+THUMBNAIL_FORMATS = {'png': 'PNG', 'webp': 'WEBP'}
+DIGEST_LENGTH = 12
+
+
+def variant_name(name, size, ext, digest):
+    root, _ = os.path.splitext(name)
+    return f"{root}_{size}.{digest}.{ext}"
+
+
+def variant_names(name, digest):
+    """{'80': {'png': name, 'webp': name}, '200': {...}} for an image whose content hashes to digest"""
+    return {
+        str(size): {ext: variant_name(name, size, ext, digest) for ext in THUMBNAIL_FORMATS}
+        for size in THUMBNAIL_SIZES
+    }
+
+
+def variant_urls(product):
+    """The product's generated thumbnails as URLs, in the shape of variant_names(); {} if there are none"""
+    thumbnails = product.thumbnails or {}
+    if not product.product_image or thumbnails.get('source') != product.product_image.name:
+        return {}
+    storage = product.product_image.storage
+    return {
+        size: {ext: storage.url(name) for ext, name in formats.items()}
+        for size, formats in thumbnails['variants'].items()
+    }
+
+
+def image_storage():
+    return VendingProduct._meta.get_field('product_image').storage
+
+
+def generate_variants(name, force=False):
+    """
+    Create the missing thumbnails of one stored image. Returns
+    (variant_names(), names written).
+    """
+    storage = image_storage()
+    with storage.open(name, 'rb') as f:
+        data = f.read()
+    variants = variant_names(name, hashlib.sha1(data).hexdigest()[:DIGEST_LENGTH])
+    wanted = [v for formats in variants.values() for v in formats.values()]
+    if not force and all(storage.exists(v) for v in wanted):
+        return variants, []
+
+    original = Image.open(io.BytesIO(data))
+    original.load()
+    original = original.convert('RGBA')
+
+    written = []
+    for size in THUMBNAIL_SIZES:
+        thumb = original.copy()
+        thumb.thumbnail((size, size), Image.Resampling.LANCZOS)
+        for ext, pil_format in THUMBNAIL_FORMATS.items():
+            buffer = io.BytesIO()
+            thumb.save(buffer, pil_format, optimize=True)
+            target = variants[str(size)][ext]
+            # Overwrite in place; storage.save() would otherwise pick a new name
+            if storage.exists(target):
+                storage.delete(target)
+            written.append(storage.save(target, ContentFile(buffer.getvalue())))
+    return variants, written
+
+
+def store_variants(product_ids, thumbnails):
+    """Record generated thumbnails on the products (an UPDATE, so no post_save runs again)"""
+    VendingProduct.objects.filter(id__in=product_ids).update(thumbnails=thumbnails)
+
+
+@receiver(post_save, sender=VendingProduct)
+def create_thumbnails(sender, instance, **kwargs):
+    thumbnails = {}
+    if instance.product_image:
+        name = instance.product_image.name
+        if (instance.thumbnails or {}).get('source') == name:
+            return  # already made for this image
+        try:
+            variants, _ = generate_variants(name)
+            thumbnails = {'source': name, 'variants': variants}
+        except (OSError, ValueError) as e:
+            print(f"Could not create thumbnails for {name}: {e}")
+    if thumbnails != instance.thumbnails:
+        instance.thumbnails = thumbnails
+        store_variants([instance.pk], thumbnails)
@@ -29,6 +29,7 @@ urlpatterns = [
 
 from django.urls import path
 from . import views
+from . import api
 
 urlpatterns = [
     # YOUR EXISTING URL PATTERNS (KEEP THESE)
@@ -38,10 +39,24 @@ urlpatterns = [
     path('products/', views.products, name='products'),
     path('purchase/', views.purchase, name='purchase'),
     path('logout/', views.logout_view, name='logout'),
-    path('api/products/', views.products_api, name='products_api'),
-    
+
     # ADD THESE NEW API ENDPOINTS FOR TKINTER
     path('api/products/', views.api_products, name='api_products'),
     path('api/purchase/', views.api_purchase, name='api_purchase'), 
     path('api/purchases/', views.api_purchases, name='api_purchases'),
+
+    # PAGINATED HISTORY ENDPOINTS (?cursor=, ?since=, ?until=, ?customer_id=)
+    path('api/sessions/', api.sessions_api, name='sessions_api'),
+    path('api/orders/', api.orders_api, name='orders_api'),
+    path('api/purchase-records/', api.purchases_api, name='purchases_api'),
+    path('api/money-transactions/', api.money_transactions_api, name='money_transactions_api'),
+
+    # LIVE STOCK AND SALES EVENTS (long-poll with ?since=)
+    path('api/events/', api.events_api, name='events_api'),
+
+    # SALES STATS FROM THE ROLLUP TABLES (?period=, ?group=, ?since=, ?until=)
+    path('api/stats/', api.stats_api, name='stats_api'),
+
+    # PER-VIEW REQUEST METRICS (Prometheus text format)
+    path('metrics', api.metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -1,16 +1,29 @@
 import json
+import logging
 from decimal import Decimal
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
 from django.conf import settings
 from django.contrib import messages
 from django.db import transaction
+from django.db.models import F, Prefetch
 from django.http import HttpResponse
-from .models import VendingProduct, PurchaseRecord, CustomerSession, MoneyTransaction
+from django.views.decorators.http import condition
+from .models import VendingProduct, PurchaseRecord, CustomerSession
+from .ledger import CheckoutLedger
+from .pricing import price_cart
+from .catalogue import get_products
+from .conditional import catalogue_etag, history_conditions
+from .thumbnails import variant_urls
+from .change import VALID_DENOMINATIONS, ChangeUnavailable, settle_payment
+from .cart import CartStore, cart_lines
+from .sqlite_tuning import immediate_atomic
+from .journal import OutOfStock, purchase_journal
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo   # <-- ADDED
 
-VALID_DENOMINATIONS = [5, 10, 20, 25, 50, 100, 200]
+logger = logging.getLogger(__name__)
+
 
 def get_mauritius_time():
     """Get current Mauritius time correctly"""
@@ -27,7 +40,9 @@ def index(request):
         if role == 'admin':
             return redirect('/admin/')
         elif role == 'student':
-            request.session.flush()
+            # Only a previous visitor's session needs throwing away
+            if not request.session.is_empty():
+                request.session.flush()
             request.session['role'] = 'student'
             return redirect('enter_name')
     return render(request, 'machine_app/index.html')
@@ -52,7 +67,7 @@ def vending_machine(request):
     if role != 'student' or not student_name:
         return redirect('index')
 
-    products = VendingProduct.objects.all()
+    products = get_products()
     return render(request, 'machine_app/vending_machine.html', {
         "products": products,
         "MEDIA_URL": settings.MEDIA_URL,
@@ -65,8 +80,9 @@ def products(request):
     if role != 'student' or not student_name:
         return redirect('index')
 
-    snacks = VendingProduct.objects.filter(category='snacks', is_available=True)
-    drinks = VendingProduct.objects.filter(category='drinks', is_available=True)
+    products = get_products()
+    snacks = [p for p in products if p.category == 'snacks' and p.is_available]
+    drinks = [p for p in products if p.category == 'drinks' and p.is_available]
     
     return render(request, 'machine_app/products.html', {
         'snacks': snacks,
@@ -74,8 +90,17 @@ def products(request):
         'student_name': student_name
     })
 
-@transaction.atomic
 def purchase(request):
+    if request.method == 'POST' and ('process_payment' in request.POST or 'cart_submitted' in request.POST):
+        journal = purchase_journal()
+        if journal:
+            if 'process_payment' in request.POST:
+                return journaled_payment(request, journal)
+            # Priced from the journal's catalogue, without touching the database
+            return submit_cart(request, journal.price)
+    return direct_purchase(request)
+
+def direct_purchase(request):
     student_name = request.session.get('student_name', '')
     if not student_name:
         return redirect('enter_name')
@@ -85,200 +110,246 @@ def purchase(request):
         print("POST keys:", list(request.POST.keys()))
         
         if 'cart_submitted' in request.POST:
-            print("=== CART SUBMISSION DETECTED ===")
-            cart = []
-            total_cost = 0
-            for key, value in request.POST.items():
-                if key.startswith('qty_'):
-                    try:
-                        prod_id = int(key.split('_')[1])
-                        qty = int(value)
-                    except (ValueError, IndexError):
-                        continue
-                    if qty > 0:
-                        product = VendingProduct.objects.get(id=prod_id)
-                        item_total = float(product.cost) * qty
-                        cart.append({
-                            'id': prod_id,
-                            'name': product.product_name,
-                            'price': float(product.cost),
-                            'qty': qty,
-                            'total_price': item_total
-                        })
-                        total_cost += item_total
-
-            if not cart:
-                messages.error(request, "Your cart is empty!")
-                return redirect('products')
-
-            request.session['cart'] = cart
-            request.session['total_cost'] = total_cost
-            print(f"Cart saved to session: {cart}")
-
-            return render(request, 'machine_app/purchase.html', {
-                'cart': cart,
-                'total_cost': total_cost,
-                'student_name': student_name,
-                'denominations': VALID_DENOMINATIONS
-            })
+            return submit_cart(request, price_cart)
 
         elif 'process_payment' in request.POST:
-            print("=== PAYMENT PROCESSING DETECTED ===")
-            
-            cart = request.session.get('cart', [])
-            total_cost = request.session.get('total_cost', 0)
-            
-            print("Cart from session:", cart)
-            print("Total cost from session:", total_cost)
-
-            if not cart:
-                messages.error(request, "❌ Cart is empty. Please select items first.")
-                return redirect('products')
-
-            inserted = {}
-            money_inserted = 0
-            for denom in VALID_DENOMINATIONS:
-                try:
-                    count = int(request.POST.get(f'insert_{denom}', 0))
-                except ValueError:
-                    count = 0
-                inserted[denom] = count
-                money_inserted += denom * count
-
-            print(f"Money inserted: {money_inserted}")
-
-            if money_inserted < total_cost:
-                deficit = total_cost - money_inserted
-                print(f"Insufficient funds: {deficit} deficit")
-                return render(request, 'machine_app/purchase.html', {
-                    'cart': cart,
-                    'total_cost': total_cost,
-                    'student_name': student_name,
-                    'money_inserted': money_inserted,
-                    'denominations': VALID_DENOMINATIONS,
-                    'insufficient': f"❌ Not enough money! Please insert at least Rs {deficit:.2f} more."
-                })
-
-            change = round(money_inserted - total_cost, 2)
-            print(f"Transaction successful. Change: {change}")
-
-            # ✔ CORRECT MAURITIUS TIME
-            mauritius_time = timezone.now().astimezone(ZoneInfo("Indian/Mauritius"))
-
-            session = CustomerSession.objects.create(
-                customer_id=student_name,
-                deposited_amount=money_inserted,
-                final_total=total_cost,
-                returned_change=change,
-                session_start=mauritius_time,
-                is_completed=True
-            )
-
-            for denom, count in inserted.items():
-                if count > 0:
-                    MoneyTransaction.objects.create(
-                        session=session,
-                        denomination=denom,
-                        count=count,
-                        type='inserted'
-                    )
-
-            change_details = {}
-            if change > 0:
-                remaining = change
-                for denom in sorted(VALID_DENOMINATIONS, reverse=True):
-                    num = int(remaining // denom)
-                    if num > 0:
-                        change_details[denom] = num
-                        remaining -= denom * num
-                        remaining = round(remaining, 2)
-
-                for denom, count in change_details.items():
-                    MoneyTransaction.objects.create(
-                        session=session,
-                        denomination=denom,
-                        count=count,
-                        type='change'
-                    )
-
-            for item in cart:
-                product = VendingProduct.objects.get(id=item['id'])
-                qty = item['qty']
-
-                if product.available_quantity < qty:
-                    refill_qty = 30 - product.available_quantity
-                    if refill_qty > 0:
-                        PurchaseRecord.objects.create(
-                            customer_session=session,
-                            product=product,
-                            quantity=refill_qty,
-                            total_price=0,
-                            transaction_type='refill'
-                        )
-                        product.available_quantity = 30
-                        product.save()
-
-                if product.available_quantity >= qty:
-                    product.available_quantity -= qty
-                    product.save()
-
-                    PurchaseRecord.objects.create(
-                        customer_session=session,
-                        product=product,
-                        quantity=qty,
-                        total_price=float(product.cost) * qty,
-                        transaction_type='purchase'
-                    )
-                else:
-                    messages.warning(request, f"Insufficient stock for {product.product_name}")
-
-            if 'cart' in request.session:
-                del request.session['cart']
-            if 'total_cost' in request.session:
-                del request.session['total_cost']
-
-            return render(request, 'machine_app/success.html', {
-                'cart': cart,
-                'student_name': student_name,
-                'total_cost': total_cost,
-                'money_inserted': money_inserted,
-                'change': change,
-                'change_details': change_details,
-                'session': session,
-            })
+            return direct_payment(request, student_name)
 
     print("No valid POST data detected, redirecting to products")
     return redirect('products')
 
+@immediate_atomic
+def direct_payment(request, student_name):
+    """Payment step, written in one IMMEDIATE transaction so concurrent checkouts queue for the lock"""
+    print("=== PAYMENT PROCESSING DETECTED ===")
+    
+    store = CartStore(request.session)
+    # Price the stored quantities now, locking the product rows for the checkout
+    priced = price_cart(store.quantities(), for_update=True)
+    cart = cart_lines(priced)
+    total_cost = float(priced.total)
+    
+    print("Cart from session:", store.quantities())
+    print("Total cost:", total_cost)
+
+    if not cart:
+        messages.error(request, "❌ Cart is empty. Please select items first.")
+        return redirect('products')
+
+    inserted, money_inserted = inserted_money(request.POST)
+
+    print(f"Money inserted: {money_inserted}")
+
+    if money_inserted < total_cost:
+        deficit = total_cost - money_inserted
+        print(f"Insufficient funds: {deficit} deficit")
+        return render(request, 'machine_app/purchase.html', {
+            'cart': cart,
+            'total_cost': total_cost,
+            'student_name': student_name,
+            'money_inserted': money_inserted,
+            'denominations': VALID_DENOMINATIONS,
+            'insufficient': f"❌ Not enough money! Please insert at least Rs {deficit:.2f} more."
+        })
+
+    # Notes go into the float and the change comes out of it
+    try:
+        settlement = settle_payment(money_inserted, priced.total, inserted)
+    except ChangeUnavailable as e:
+        return render(request, 'machine_app/purchase.html', {
+            'cart': cart,
+            'total_cost': total_cost,
+            'student_name': student_name,
+            'money_inserted': money_inserted,
+            'denominations': VALID_DENOMINATIONS,
+            'insufficient': f"❌ {e}"
+        })
+
+    change = float(settlement.change)
+    print(f"Transaction successful. Change: {change}")
+
+    # ✔ CORRECT MAURITIUS TIME
+    mauritius_time = timezone.now().astimezone(ZoneInfo("Indian/Mauritius"))
+
+    session = CustomerSession.objects.create(
+        customer_id=student_name,
+        deposited_amount=money_inserted,
+        final_total=total_cost,
+        returned_change=change,
+        session_start=mauritius_time,
+        is_completed=True
+    )
+
+    ledger = CheckoutLedger(session)
+
+    for denom, count in settlement.inserted.items():
+        ledger.add_money(denom, count, 'inserted')
+
+    change_details = settlement.breakdown
+    for denom, count in change_details.items():
+        ledger.add_money(denom, count, 'change')
+
+    # Reserve stock for the whole cart in one conditional UPDATE. Lines that
+    # are short get refilled once; anything still short is skipped.
+    quantities = {item['id']: item['qty'] for item in cart}
+    unavailable = set()
+    refilled = False
+    while True:
+        remaining = {pid: qty for pid, qty in quantities.items() if pid not in unavailable}
+        short = VendingProduct.objects.reserve_stock(remaining)
+        if not short:
+            break
+        if refilled:
+            unavailable.update(short)
+            continue
+        refilled = True
+        refill_ids = []
+        for product in VendingProduct.objects.filter(id__in=short):
+            refill_qty = 30 - product.available_quantity
+            if refill_qty > 0:
+                ledger.add_purchase(product, refill_qty, 0, transaction_type='refill')
+                refill_ids.append(product.id)
+        VendingProduct.objects.filter(id__in=refill_ids).restock(30)
+
+    for line in priced.lines:
+        if line['product'].id in unavailable:
+            continue
+        ledger.add_purchase(line['product'], line['quantity'], line['line_total'])
+    for item in cart:
+        if item['id'] in unavailable:
+            messages.warning(request, f"Insufficient stock for {item['name']}")
+
+    ledger.commit()
+
+    store.clear()
+
+    return render(request, 'machine_app/success.html', {
+        'cart': cart,
+        'student_name': student_name,
+        'total_cost': total_cost,
+        'money_inserted': money_inserted,
+        'change': change,
+        'change_details': change_details,
+        'change_shortfall': float(settlement.shortfall),
+        'session': session,
+    })
+
+def submit_cart(request, price):
+    """Cart step: price the selected quantities with price(), keep them in the session and ask for payment"""
+    student_name = request.session.get('student_name', '')
+    if not student_name:
+        return redirect('enter_name')
+
+    print("=== CART SUBMISSION DETECTED ===")
+    selected = []
+    for key, value in request.POST.items():
+        if key.startswith('qty_'):
+            try:
+                selected.append((int(key.split('_')[1]), int(value)))
+            except (ValueError, IndexError):
+                continue
+
+    priced = price(selected)
+    cart = cart_lines(priced)
+    total_cost = float(priced.total)
+
+    if not cart:
+        messages.error(request, "Your cart is empty!")
+        return redirect('products')
+
+    # Only {product id: qty} goes into the session
+    CartStore(request.session).set(priced)
+    print(f"Cart saved to session: {request.session['cart']}")
+
+    return render(request, 'machine_app/purchase.html', {
+        'cart': cart,
+        'total_cost': total_cost,
+        'student_name': student_name,
+        'denominations': VALID_DENOMINATIONS
+    })
+
+def inserted_money(post):
+    """Notes/coins entered on the payment form: ({denomination: count}, total)"""
+    inserted = {}
+    money_inserted = 0
+    for denom in VALID_DENOMINATIONS:
+        try:
+            count = int(post.get(f'insert_{denom}', 0))
+        except ValueError:
+            count = 0
+        inserted[denom] = count
+        money_inserted += denom * count
+    return inserted, money_inserted
+
+def journaled_payment(request, journal):
+    """Payment step in journaled mode: checked in memory, answered once the journal is on disk"""
+    student_name = request.session.get('student_name', '')
+    if not student_name:
+        return redirect('enter_name')
+
+    store = CartStore(request.session)
+    priced = journal.price(store.quantities())
+    cart = cart_lines(priced)
+    total_cost = float(priced.total)
+
+    if not cart:
+        messages.error(request, "❌ Cart is empty. Please select items first.")
+        return redirect('products')
+
+    inserted, money_inserted = inserted_money(request.POST)
+
+    def payment_error(message):
+        return render(request, 'machine_app/purchase.html', {
+            'cart': cart,
+            'total_cost': total_cost,
+            'student_name': student_name,
+            'money_inserted': money_inserted,
+            'denominations': VALID_DENOMINATIONS,
+            'insufficient': message
+        })
+
+    if money_inserted < total_cost:
+        return payment_error(f"❌ Not enough money! Please insert at least Rs {total_cost - money_inserted:.2f} more.")
+
+    # No automatic refill here: the refill is a database write
+    try:
+        settlement, seq = journal.checkout(student_name, priced, money_inserted, inserted)
+    except OutOfStock as e:
+        names = ', '.join(item['name'] for item in cart if item['id'] in e.product_ids)
+        return payment_error(f"❌ Insufficient stock for {names}")
+    except ChangeUnavailable as e:
+        return payment_error(f"❌ {e}")
+
+    logger.info("Checkout journaled as #%s. Change: %s", seq, settlement.change)
+    store.clear()
+
+    return render(request, 'machine_app/success.html', {
+        'cart': cart,
+        'student_name': student_name,
+        'total_cost': total_cost,
+        'money_inserted': money_inserted,
+        'change': float(settlement.change),
+        'change_details': settlement.breakdown,
+        'change_shortfall': float(settlement.shortfall),
+        'session': None,
+    })
+
 def logout_view(request):
     request.session.flush()
     messages.success(request, "You have been logged out successfully.")
     return redirect('index')
 
-from django.http import JsonResponse
-from .models import VendingProduct
-
-def products_api(request):
-    product_list = list(VendingProduct.objects.values('id', 'product_name', 'cost', 'available_quantity'))
-    
-    for p in product_list:
-        p['name'] = p.pop('product_name')
-        p['price'] = float(p.pop('cost'))
-        p['quantity'] = p.pop('available_quantity')
-        if p.get('image'):
-            p['image'] = request.build_absolute_uri(settings.MEDIA_URL + str(p['image']))
-    return JsonResponse(product_list, safe=False)
-
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from django.db import transaction
 import json
 
+@condition(etag_func=catalogue_etag)
 @api_view(['GET'])
 def api_products(request):
-    products = VendingProduct.objects.filter(is_available=True)
+    products = [product for product in get_products() if product.is_available]
     product_list = []
     for product in products:
+        thumbs = variant_urls(product)
         product_list.append({
             'id': product.id,
             'product_name': product.product_name,
@@ -289,18 +360,32 @@ def api_products(request):
             'quantity': product.available_quantity,
             'category': product.category,
             'is_available': product.is_available,
-            'image': request.build_absolute_uri(product.product_image.url) if product.product_image else None
+            'image': request.build_absolute_uri(product.product_image.url) if product.product_image else None,
+            # Only thumbnails that have been generated; otherwise the original image
+            'thumbnail': request.build_absolute_uri(
+                thumbs['80']['png'] if thumbs else product.product_image.url
+            ) if product.product_image else None,
+            'thumbnails': {
+                size: {ext: request.build_absolute_uri(url) for ext, url in formats.items()}
+                for size, formats in thumbs.items()
+            } if thumbs else None
         })
     return Response(product_list)
 
 @api_view(['POST'])
-@transaction.atomic
 def api_purchase(request):
+    journal = purchase_journal()
+    if journal:
+        return journaled_api_purchase(request, journal)
+    return direct_api_purchase(request)
+
+@immediate_atomic
+def direct_api_purchase(request):
     try:
         data = request.data
         customer_name = data.get('customer', '').strip()
         items = data.get('items', [])
-        deposited_amount = float(data.get('deposited_amount', 0))
+        deposited_amount = Decimal(str(data.get('deposited_amount', 0)))
         
         if not customer_name:
             return Response({'error': 'Customer name is required'}, status=400)
@@ -308,37 +393,35 @@ def api_purchase(request):
         if not items:
             return Response({'error': 'No items selected'}, status=400)
         
-        total_cost = 0
-        purchased_items = []
+        priced = price_cart(
+            [(item.get('product'), item.get('quantity', 0)) for item in items],
+            for_update=True
+        )
+        if priced.missing:
+            return Response({'error': f'Product {priced.missing[0]} not found'}, status=404)
         
-        for item in items:
-            product_id = item.get('product')
-            quantity = int(item.get('quantity', 0))
-            
-            if quantity <= 0:
-                continue
-                
-            product = VendingProduct.objects.get(id=product_id)
-            
-            if product.available_quantity < quantity:
-                return Response({'error': f'Not enough stock for {product.product_name}'}, status=400)
-            
-            item_total = float(product.cost) * quantity
-            total_cost += item_total
-            
-            product.available_quantity -= quantity
-            product.save()
-            
-            purchased_items.append({
-                'product_name': product.product_name,
-                'quantity': quantity,
-                'total': item_total
-            })
+        total_cost = priced.total
+        purchased_items = [{
+            'product_name': line['product'].product_name,
+            'quantity': line['quantity'],
+            'total': float(line['line_total'])
+        } for line in priced.lines]
         
         if deposited_amount < total_cost:
             return Response({'error': f'Insufficient funds. Need Rs {total_cost - deposited_amount:.2f} more'}, status=400)
         
-        change = deposited_amount - total_cost
+        short = VendingProduct.objects.reserve_stock(priced.quantities())
+        if short:
+            product = next(line['product'] for line in priced.lines if line['product'].id == short[0])
+            return Response({'error': f'Not enough stock for {product.product_name}'}, status=400)
+        
+        try:
+            settlement = settle_payment(deposited_amount, total_cost, data.get('inserted'))
+        except ChangeUnavailable as e:
+            # Give the reserved stock back
+            transaction.set_rollback(True)
+            return Response({'error': str(e)}, status=400)
+        change = settlement.change
         
         # ✔ CORRECT MAURITIUS TIME
         mauritius_time = timezone.now().astimezone(ZoneInfo("Indian/Mauritius"))
@@ -352,44 +435,108 @@ def api_purchase(request):
             is_completed=True
         )
         
-        for item in purchased_items:
-            product = VendingProduct.objects.get(product_name=item['product_name'])
-            PurchaseRecord.objects.create(
-                customer_session=session,
-                product=product,
-                quantity=item['quantity'],
-                total_price=item['total'],
-                transaction_type='purchase'
-            )
+        ledger = CheckoutLedger(session)
+        for denom, count in settlement.inserted.items():
+            ledger.add_money(denom, count, 'inserted')
+        for denom, count in settlement.breakdown.items():
+            ledger.add_money(denom, count, 'change')
+        for line in priced.lines:
+            ledger.add_purchase(line['product'], line['quantity'], line['line_total'])
+        ledger.commit()
         
         return Response({
             'success': True,
             'message': 'Purchase successful',
-            'total_amount': total_cost,
-            'change_returned': change,
+            'total_amount': float(total_cost),
+            'change_returned': float(change),
+            'change_breakdown': {str(d): n for d, n in settlement.breakdown.items()},
+            'change_shortfall': float(settlement.shortfall),
             'items': purchased_items
         })
         
+    except Exception as e:
+        # Undo any stock or float already taken in this request
+        transaction.set_rollback(True)
+        return Response({'error': str(e)}, status=400)
+
+def journaled_api_purchase(request, journal):
+    """api_purchase in journaled mode; the response carries the journal sequence number"""
+    try:
+        data = request.data
+        customer_name = data.get('customer', '').strip()
+        items = data.get('items', [])
+        deposited_amount = Decimal(str(data.get('deposited_amount', 0)))
+
+        if not customer_name:
+            return Response({'error': 'Customer name is required'}, status=400)
+
+        if not items:
+            return Response({'error': 'No items selected'}, status=400)
+
+        priced = journal.price([(item.get('product'), item.get('quantity', 0)) for item in items])
+        if priced.missing:
+            return Response({'error': f'Product {priced.missing[0]} not found'}, status=404)
+
+        total_cost = priced.total
+        if deposited_amount < total_cost:
+            return Response({'error': f'Insufficient funds. Need Rs {total_cost - deposited_amount:.2f} more'}, status=400)
+
+        try:
+            settlement, seq = journal.checkout(customer_name, priced, deposited_amount, data.get('inserted'))
+        except OutOfStock as e:
+            product = next(line['product'] for line in priced.lines if line['product'].id == e.product_ids[0])
+            return Response({'error': f'Not enough stock for {product.product_name}'}, status=400)
+        except ChangeUnavailable as e:
+            return Response({'error': str(e)}, status=400)
+
+        return Response({
+            'success': True,
+            'message': 'Purchase successful',
+            'total_amount': float(total_cost),
+            'change_returned': float(settlement.change),
+            'change_breakdown': {str(d): n for d, n in settlement.breakdown.items()},
+            'change_shortfall': float(settlement.shortfall),
+            'items': [{
+                'product_name': line['product'].product_name,
+                'quantity': line['quantity'],
+                'total': float(line['line_total'])
+            } for line in priced.lines],
+            'journal_seq': seq
+        })
+
     except Exception as e:
         return Response({'error': str(e)}, status=400)
 
+@condition(**history_conditions(CustomerSession, 'session_start', is_completed=True))
 @api_view(['GET'])
 def api_purchases(request):
-    sessions = CustomerSession.objects.filter(is_completed=True).order_by('-session_start')
+    # Two queries in total: one for the sessions and one for all of their
+    # purchase lines, with the product name annotated onto each line.
+    purchase_lines = PurchaseRecord.objects.filter(
+        transaction_type='purchase'
+    ).annotate(
+        product_name=F('product__product_name')
+    ).only('id', 'customer_session_id', 'quantity')
+
+    sessions = CustomerSession.objects.filter(is_completed=True).order_by('-session_start').prefetch_related(
+        Prefetch('transactions', queryset=purchase_lines, to_attr='purchase_lines')
+    )
+
+    # ?since_id=N returns only sessions newer than N. Sessions are created
+    # already completed, so ids only grow and the id is a safe cursor.
+    since_id = request.GET.get('since_id')
+    if since_id:
+        try:
+            sessions = sessions.filter(id__gt=int(since_id))
+        except ValueError:
+            return Response({'error': 'since_id must be an integer'}, status=400)
     transactions = []
     
     for session in sessions:
-        purchase_items = PurchaseRecord.objects.filter(
-            customer_session=session, 
-            transaction_type='purchase'
-        )
-        
-        items_list = []
-        for item in purchase_items:
-            items_list.append({
-                'product_name': item.product.product_name,
-                'quantity': item.quantity
-            })
+        items_list = [
+            {'product_name': item.product_name, 'quantity': item.quantity}
+            for item in session.purchase_lines
+        ]
         
         # ✔ CORRECT MAURITIUS TIME WHEN DISPLAYING
         mauritius_time = session.session_start.astimezone(ZoneInfo("Indian/Mauritius"))
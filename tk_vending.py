@@ -3,8 +3,16 @@ from tkinter import ttk, messagebox, simpledialog
 import requests
 from datetime import datetime
 from PIL import Image, ImageTk
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import io
+import json
 import os
+import queue
+import random
+import re
+import threading
+import time
 
 # -----------------------
 # API endpoints
@@ -13,9 +21,42 @@ API_BASE = "http://127.0.0.1:8000/api/"
 API_PRODUCTS = f"{API_BASE}products/"
 API_PURCHASE = f"{API_BASE}purchase/"
 API_TRANSACTIONS = f"{API_BASE}purchases/"
+API_EVENTS = f"{API_BASE}events/"
 
 VALID_DENOMINATIONS = [5, 10, 20, 25, 50, 100, 200]
 
+# ---------- HTTP CLIENT ----------
+HTTP_POOL_SIZE = 10
+GET_RETRIES = 3
+RETRY_BACKOFF = 0.3  # seconds, doubled on each attempt
+RETRY_STATUSES = {502, 503, 504}
+# Set VENDING_LATENCY_REPORT=1 to print per-endpoint latency when the app exits
+LATENCY_REPORT = os.environ.get("VENDING_LATENCY_REPORT") == "1"
+
+# ---------- PRODUCT IMAGES ----------
+THUMBNAIL_SIZE = (80, 80)
+IMAGE_WORKERS = 6
+IMAGE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".vending_cache", "thumbnails")
+
+# ---------- BACKGROUND JOBS ----------
+JOB_WORKERS = 4
+JOB_POLL_MS = 50
+
+# ---------- LIVE EVENTS ----------
+EVENTS_WAIT = 25  # seconds the server holds a long-poll open
+EVENTS_RETRY_MS = 5000
+
+# ---------- ADMIN DASHBOARD ----------
+ADMIN_REFRESH_MS = 10000  # auto-refresh period; unchanged data costs one 304 per table
+
+# ---------- PRODUCT GRID ----------
+GRID_COLUMNS = 3
+CARD_WIDTH = 200
+CARD_HEIGHT = 210
+CARD_PADDING = 10
+ROW_HEIGHT = CARD_HEIGHT + 2 * CARD_PADDING
+GRID_OVERSCAN_ROWS = 1  # rows kept alive above/below the viewport
+
 # ---------- COLORS ----------
 PRIMARY_COLOR = "#2c3e50"
 SECONDARY_COLOR = "#3498db"
@@ -34,6 +75,428 @@ BTN_SUCCESS = "#27ae60"
 BTN_DANGER = "#e74c3c"
 BTN_WARNING = "#f39c12"
 
+
+class ApiClient:
+    """Pooled HTTP client shared by every call the GUI makes.
+
+    One requests.Session keeps connections (and TLS sessions) alive.
+    Idempotent GETs are retried on connection errors and 502/503/504 with
+    jittered exponential backoff; POST/PUT/DELETE are never retried.
+    Latency is recorded per endpoint (method + path, ids collapsed).
+    """
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, retries=GET_RETRIES, backoff=RETRY_BACKOFF):
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.retries = retries
+        self.backoff = backoff
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    def endpoint_name(self, method, url):
+        path = re.sub(r"/\d+/", "/<id>/", requests.utils.urlparse(url).path)
+        return f"{method} {path}"
+
+    def record(self, endpoint, elapsed):
+        with self._lock:
+            stats = self.timings.setdefault(endpoint, {"count": 0, "total": 0.0, "max": 0.0})
+            stats["count"] += 1
+            stats["total"] += elapsed
+            stats["max"] = max(stats["max"], elapsed)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", 10)
+        endpoint = self.endpoint_name(method, url)
+        attempts = self.retries + 1 if method in ("GET", "HEAD") else 1
+
+        for attempt in range(attempts):
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.record(endpoint, time.perf_counter() - started)
+                if attempt == attempts - 1:
+                    raise
+            else:
+                self.record(endpoint, time.perf_counter() - started)
+                if response.status_code not in RETRY_STATUSES or attempt == attempts - 1:
+                    return response
+            time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def latency_summary(self):
+        """One line per endpoint: call count, mean and max latency in ms"""
+        with self._lock:
+            return "\n".join(
+                f"{endpoint}: {stats['count']} calls, "
+                f"avg {stats['total'] / stats['count'] * 1000:.0f} ms, max {stats['max'] * 1000:.0f} ms"
+                for endpoint, stats in sorted(self.timings.items())
+            )
+
+
+class ThumbnailCache:
+    """On-disk cache of resized product images, keyed by image URL.
+
+    Each entry keeps the 80x80 PNG plus the ETag/Last-Modified it was built
+    from, so a cold start only costs a conditional request (304) per image.
+    fetch() is safe to call from worker threads; it never touches Tk.
+    """
+
+    def __init__(self, directory, client):
+        self.directory = directory
+        self.client = client
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + ".png", base + ".json"
+
+    def fetch(self, url):
+        """Return the thumbnail for url as a PIL image, downloading only if it changed"""
+        image_path, meta_path = self._paths(url)
+
+        headers = {}
+        if os.path.exists(image_path) and os.path.exists(meta_path):
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+                if meta.get("etag"):
+                    headers["If-None-Match"] = meta["etag"]
+                if meta.get("last_modified"):
+                    headers["If-Modified-Since"] = meta["last_modified"]
+            except (OSError, ValueError):
+                headers = {}
+
+        response = self.client.get(url, headers=headers, timeout=10)
+        if response.status_code == 304:
+            with Image.open(image_path) as cached:
+                cached.load()
+                return cached.copy()
+        response.raise_for_status()
+
+        image = Image.open(io.BytesIO(response.content)).convert("RGBA")
+        image = image.resize(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+
+        # Write atomically so a half-written file is never read back
+        tmp_path = image_path + ".tmp"
+        image.save(tmp_path, "PNG")
+        os.replace(tmp_path, image_path)
+        with open(meta_path, "w") as f:
+            json.dump({
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }, f)
+        return image
+
+
+class Job:
+    """One background call and the Tk-thread callbacks waiting on it"""
+
+    def __init__(self, key, label, cancellable, on_success, on_error, on_done):
+        self.key = key
+        self.label = label
+        self.cancellable = cancellable
+        # (on_success, on_error, on_done) per caller, run in the order they were added
+        self.callbacks = [(on_success, on_error, on_done)]
+        self.cancelled = False
+
+
+class BackgroundJobs:
+    """Runs blocking API calls on worker threads so the window never freezes.
+
+    submit() runs func on the pool and puts its result (or exception) on a
+    queue; poll() drains that queue from root.after() and calls on_success /
+    on_error / on_done on the Tk thread, the only thread allowed to touch
+    widgets. Only one job per key runs at a time, so a double click cannot
+    send a second purchase; attach() lets a second caller wait on the job
+    already running instead. A cancelled job still finishes on its worker,
+    but its callbacks are dropped. Jobs without a label (the event stream)
+    run silently and are never shown in the status bar.
+    """
+
+    def __init__(self, root, workers=JOB_WORKERS, on_change=None):
+        self.root = root
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.results = queue.Queue()
+        self.active = {}
+        self.on_change = on_change
+        self.root.after(JOB_POLL_MS, self.poll)
+
+    def submit(self, key, func, on_success=None, on_error=None, on_done=None,
+               label="Working", cancellable=True):
+        """Start func() in the background; returns None if key is already running"""
+        if key in self.active:
+            return None
+        job = Job(key, label, cancellable, on_success, on_error, on_done)
+        self.active[key] = job
+        self._changed()
+
+        def run():
+            try:
+                self.results.put((job, func(), None))
+            except Exception as e:
+                self.results.put((job, None, e))
+
+        self.executor.submit(run)
+        return job
+
+    def attach(self, key, on_success=None, on_error=None, on_done=None, cancellable=True):
+        """Run these callbacks too when the job running under key finishes; None if there is none"""
+        job = self.active.get(key)
+        if job is None:
+            return None
+        job.callbacks.append((on_success, on_error, on_done))
+        if not cancellable:
+            # The new caller depends on it, so cancel_all() must leave it alone
+            job.cancellable = False
+        return job
+
+    def running(self, key):
+        return key in self.active
+
+    def cancel_all(self):
+        """Forget every cancellable job; writes such as purchases keep running"""
+        for key, job in list(self.active.items()):
+            if job.cancellable:
+                job.cancelled = True
+                del self.active[key]
+        self._changed()
+
+    def poll(self):
+        try:
+            while True:
+                try:
+                    job, result, error = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                if self.active.get(job.key) is job:
+                    del self.active[job.key]
+                    self._changed()
+                if job.cancelled:
+                    continue
+                if error is not None and not any(on_error for _, on_error, _ in job.callbacks):
+                    print(f"Background job {job.key} failed: {error}")
+                for on_success, on_error, on_done in job.callbacks:
+                    if error is None:
+                        if on_success:
+                            self._call(job, on_success, result)
+                    elif on_error:
+                        self._call(job, on_error, error)
+                    if on_done:
+                        self._call(job, on_done)
+        finally:
+            # Always re-arm: one broken callback must not stop every later result
+            self.root.after(JOB_POLL_MS, self.poll)
+
+    def _call(self, job, callback, *args):
+        """Run one Tk-thread callback, logging (not raising) its errors"""
+        try:
+            callback(*args)
+        except Exception as e:
+            print(f"Background job {job.key}: callback {getattr(callback, '__name__', callback)} failed: {e!r}")
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ProductCard:
+    """Widgets for one grid cell, rebound to whichever product scrolls into it"""
+
+    def __init__(self, canvas, gui):
+        self.gui = gui
+        self.product = None
+        self.bg_color = None
+        self.frame = tk.Frame(canvas, relief="raised", bd=1, width=CARD_WIDTH, height=CARD_HEIGHT)
+        self.frame.pack_propagate(False)
+
+        # Product image
+        self.image_label = tk.Label(self.frame, text="🖼️", font=("Arial", 20), cursor="hand2")
+        self.image_label.pack(pady=5)
+
+        # Product info
+        self.name_label = tk.Label(self.frame, font=("Arial", 10, "bold"), wraplength=180, cursor="hand2")
+        self.name_label.pack()
+        self.price_label = tk.Label(self.frame, font=("Arial", 9, "bold"), fg=SUCCESS_COLOR)
+        self.price_label.pack()
+        self.stock_label = tk.Label(self.frame, font=("Arial", 8))
+        self.stock_label.pack()
+
+        # Quantity controls
+        self.control_frame = tk.Frame(self.frame)
+        self.control_frame.pack(pady=5)
+        tk.Button(self.control_frame, text="➖", command=self.decrease_qty,
+                  bg=ACCENT_COLOR, fg="white", font=("Arial", 8), width=3).pack(side="left")
+        self.qty_label = tk.Label(self.control_frame, bg="white",
+                                  width=3, relief="sunken", font=("Arial", 9))
+        self.qty_label.pack(side="left", padx=2)
+        tk.Button(self.control_frame, text="➕", command=self.increase_qty,
+                  bg=SUCCESS_COLOR, fg="white", font=("Arial", 8), width=3).pack(side="left")
+
+        # Add click functionality to product name and image
+        for widget in (self.image_label, self.name_label, self.qty_label):
+            widget.bind("<Button-1>", self.on_product_click)
+
+        self.backgrounds = [self.frame, self.image_label, self.name_label, self.price_label,
+                            self.stock_label, self.control_frame]
+        self.window = canvas.create_window(0, 0, window=self.frame, anchor="n", state="hidden")
+        self.canvas = canvas
+
+    def show(self, product, index, x, y):
+        """Bind the card to product and move it to (x, y); only changed config is applied"""
+        bg_color = ROW_ODD if index % 2 == 0 else ROW_EVEN
+        if bg_color != self.bg_color:
+            for widget in self.backgrounds:
+                widget.configure(bg=bg_color)
+            self.bg_color = bg_color
+        if self.product is None or self.product['id'] != product['id']:
+            self.release_image_label()
+            self.qty_label.configure(textvariable=self.gui.cart[product['id']])
+            # Swapped for the real thumbnail when it arrives from the image pool
+            self.gui.image_labels[product['id']] = self.image_label
+
+        image = self.gui.product_images.get(product['id'])
+        if image is not None:
+            self.image_label.configure(image=image, text="")
+        else:
+            self.image_label.configure(image="", text="🖼️")
+        self.name_label.configure(text=product['name'])
+        self.price_label.configure(text=f"Rs {product['price']:.2f}")
+        self.update_stock(product)
+
+        self.product = product
+        self.canvas.coords(self.window, x, y)
+        self.canvas.itemconfigure(self.window, state="normal")
+
+    def update_stock(self, product):
+        stock_color = ACCENT_COLOR if product['quantity'] == 0 else PRIMARY_COLOR
+        self.stock_label.configure(text=f"Stock: {product['quantity']}", fg=stock_color)
+
+    def hide(self):
+        self.release_image_label()
+        self.product = None
+        self.canvas.itemconfigure(self.window, state="hidden")
+
+    def release_image_label(self):
+        if self.product and self.gui.image_labels.get(self.product['id']) is self.image_label:
+            del self.gui.image_labels[self.product['id']]
+
+    def qty_var(self):
+        return self.gui.cart[self.product['id']]
+
+    def decrease_qty(self):
+        if self.product and self.qty_var().get() > 0:
+            self.qty_var().set(self.qty_var().get() - 1)
+
+    def increase_qty(self):
+        if self.product and self.qty_var().get() < self.product['quantity']:
+            self.qty_var().set(self.qty_var().get() + 1)
+
+    def on_product_click(self, event):
+        if self.product and self.product['quantity'] > 0:
+            self.qty_var().set(self.qty_var().get() + 1)
+
+
+class VirtualProductGrid:
+    """Scrollable product grid that only builds cards for the visible rows.
+
+    Cards scrolled out of view are hidden and put back in a pool, then
+    rebound to the products scrolling in, so the widget count stays at
+    roughly (visible rows + overscan) * columns however large the
+    catalogue is. set_products() rebinds the visible cards in place, which
+    is how a refresh updates stock without rebuilding the grid.
+    """
+
+    def __init__(self, parent, gui, columns=GRID_COLUMNS):
+        self.gui = gui
+        self.columns = columns
+        self.products = []
+        self.visible = {}  # index in self.products -> ProductCard
+        self.spare = []
+
+        self.canvas = tk.Canvas(parent, bg=BG_COLOR, highlightthickness=0,
+                                yscrollincrement=ROW_HEIGHT // 4)
+        self.scrollbar = tk.Scrollbar(parent, orient="vertical", command=self.yview)
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+
+        self.canvas.pack(side="left", fill="both", expand=True, padx=5, pady=5)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.canvas.bind("<Configure>", lambda e: self.layout())
+        # Wheel events go to the widget under the pointer, which is usually a card
+        self.canvas.bind_all("<MouseWheel>", self.on_mousewheel)
+        self.canvas.bind_all("<Button-4>", self.on_mousewheel)
+        self.canvas.bind_all("<Button-5>", self.on_mousewheel)
+
+    def set_products(self, products):
+        self.products = [prod for prod in products if prod['is_available'] and prod['quantity'] > 0]
+        self.layout()
+
+    def layout(self):
+        rows = -(-len(self.products) // self.columns)
+        width = max(self.canvas.winfo_width(), self.columns * (CARD_WIDTH + 2 * CARD_PADDING))
+        self.canvas.configure(scrollregion=(0, 0, width, rows * ROW_HEIGHT))
+        self.render()
+
+    def render(self):
+        column_width = max(self.canvas.winfo_width() / self.columns, CARD_WIDTH + 2 * CARD_PADDING)
+        top = self.canvas.canvasy(0)
+        bottom = self.canvas.canvasy(self.canvas.winfo_height())
+        first_row = max(int(top // ROW_HEIGHT) - GRID_OVERSCAN_ROWS, 0)
+        last_row = int(bottom // ROW_HEIGHT) + GRID_OVERSCAN_ROWS
+        wanted = range(first_row * self.columns,
+                       min((last_row + 1) * self.columns, len(self.products)))
+
+        for index in list(self.visible):
+            if index not in wanted:
+                card = self.visible.pop(index)
+                card.hide()
+                self.spare.append(card)
+
+        for index in wanted:
+            card = self.visible.get(index)
+            if card is None:
+                card = self.spare.pop() if self.spare else ProductCard(self.canvas, self.gui)
+                self.visible[index] = card
+            row, col = divmod(index, self.columns)
+            card.show(self.products[index], index,
+                      col * column_width + column_width / 2, row * ROW_HEIGHT + CARD_PADDING)
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self.render()
+
+    def on_mousewheel(self, event):
+        if not self.canvas.winfo_exists() or not str(event.widget).startswith(str(self.canvas)):
+            return
+        if event.num == 4 or event.delta > 0:
+            self.canvas.yview_scroll(-1, "units")
+        else:
+            self.canvas.yview_scroll(1, "units")
+        self.render()
+
+    def exists(self):
+        return self.canvas.winfo_exists()
+
+
 class VendingGUI:
     def __init__(self, root):
         self.root = root
@@ -46,14 +509,46 @@ class VendingGUI:
         self.admin_tree = None
         self.product_tree = None
         self.product_images = {}
+        self.product_grid = None
+        self.product_image_urls = {}
+        self.image_labels = {}
+
+        # Every HTTP call goes through one pooled client
+        self.api = ApiClient(pool_size=max(HTTP_POOL_SIZE, IMAGE_WORKERS))
+
+        # Product images are fetched on a thread pool and handed back to the
+        # Tk thread through image_results, which is drained with after()
+        self.thumbnails = ThumbnailCache(IMAGE_CACHE_DIR, self.api)
+        self.image_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS)
+        self.image_results = queue.Queue()
+        self.root.after(50, self.process_image_results)
+        # ETags from the last successful fetch, sent back as If-None-Match
+        self.products_etag = None
+        self.transactions_etag = None
+        # Rows currently shown in the admin trees, keyed by Treeview iid
+        self.product_rows = {}
+        self.transaction_rows = {}
+        self.transactions_cursor = None  # highest session id already shown
+        self.auto_refresh_var = None
+        self.auto_refresh_job = None
+        self.events_since = None  # last event id applied from /api/events/
 
         # Configure styles
         self.setup_styles()
+
+        # API calls run on background workers; the status bar shows what is in flight
+        self.jobs = BackgroundJobs(root, on_change=self.update_status_bar)
+        self.setup_status_bar()
         
         self.main_frame = tk.Frame(root, bg=BG_COLOR)
         self.main_frame.pack(fill="both", expand=True, padx=20, pady=20)
         self.show_role_selection()
 
+        # Stock and sales changes are pushed through a long-poll. This first
+        # call only takes the current event id; the long-poll itself runs
+        # while the product grid or the admin dashboard is on screen.
+        self.poll_events()
+
     def setup_styles(self):
         style = ttk.Style()
         style.configure("Custom.TButton", padding=10, relief="flat", background=BTN_PRIMARY)
@@ -61,11 +556,62 @@ class VendingGUI:
         style.configure("Danger.TButton", background=BTN_DANGER)
         style.configure("Warning.TButton", background=BTN_WARNING)
 
+    def setup_status_bar(self):
+        self.status_frame = tk.Frame(self.root, bg=HEADER_BG)
+        self.status_frame.pack(side="bottom", fill="x")
+        self.status_label = tk.Label(self.status_frame, text="Ready", font=("Arial", 9),
+                                     bg=HEADER_BG, fg=HEADER_FG)
+        self.status_label.pack(side="left", padx=10, pady=3)
+        self.status_progress = ttk.Progressbar(self.status_frame, mode="indeterminate", length=150)
+        self.status_cancel = tk.Button(self.status_frame, text="✖ Cancel", font=("Arial", 8, "bold"),
+                                       bg=ACCENT_COLOR, fg="white", relief="flat", cursor="hand2",
+                                       command=self.jobs.cancel_all)
+
+    def update_status_bar(self):
+        jobs = [job for job in self.jobs.active.values() if job.label]
+        if not jobs:
+            self.status_label.config(text="Ready")
+            self.status_progress.stop()
+            self.status_progress.pack_forget()
+            self.status_cancel.pack_forget()
+            return
+
+        self.status_label.config(text="⏳ " + ", ".join(job.label for job in jobs) + "...")
+        if not self.status_progress.winfo_manager():
+            self.status_progress.pack(side="left", padx=5)
+            self.status_progress.start(10)
+        if any(job.cancellable for job in jobs):
+            self.status_cancel.pack(side="right", padx=10, pady=2)
+        else:
+            self.status_cancel.pack_forget()
+
     # ---------- Utilities ----------
     def clear_frame(self):
         for widget in self.main_frame.winfo_children():
             widget.destroy()
 
+    def sync_tree(self, tree, rows, shown):
+        """
+        Make tree show rows (a list of (iid, values)) in that order,
+        touching only the rows that were added, changed, moved or removed.
+        shown maps iid -> values for what the tree currently displays.
+        """
+        wanted = dict(rows)
+        for iid in list(shown):
+            if iid not in wanted:
+                tree.delete(iid)
+                del shown[iid]
+
+        for index, (iid, values) in enumerate(rows):
+            if iid not in shown:
+                tree.insert("", index, iid=iid, values=values)
+            else:
+                if shown[iid] != values:
+                    tree.item(iid, values=values)
+                if tree.index(iid) != index:
+                    tree.move(iid, "", index)
+            shown[iid] = values
+
     def create_styled_button(self, parent, text, command, bg=BTN_PRIMARY, width=20, height=2):
         btn = tk.Button(parent, text=text, width=width, height=height, 
                        bg=bg, fg="white", font=("Arial", 10, "bold"),
@@ -140,56 +686,194 @@ class VendingGUI:
             messagebox.showerror("Error", "Name is required")
             self.show_role_selection()
             return
-        if not self.fetch_products(show_errors=True):
-            self.show_role_selection()
-            return
-        self.show_student_interface()
-
-    def fetch_products(self, show_errors=False):
-        try:
-            response = requests.get(API_PRODUCTS, timeout=10)
+        # Not cancellable: the frame is empty until the catalogue arrives
+        self.fetch_products(on_success=self.show_student_interface,
+                            on_error=self.show_role_selection, show_errors=True,
+                            cancellable=False)
+
+    def fetch_products(self, on_success=None, on_error=None, show_errors=False, cancellable=True):
+        """Fetch the catalogue on a worker thread; callbacks run on the Tk thread"""
+        headers = {}
+        if self.products and self.products_etag:
+            headers["If-None-Match"] = self.products_etag
+
+        def request():
+            response = self.api.get(API_PRODUCTS, headers=headers, timeout=10)
+            if response.status_code == 304:
+                # Catalogue unchanged since the last fetch
+                return None
             response.raise_for_status()
-            products = response.json()
-            self.products = []
-            for p in products:
-                product_data = {
-                    "id": p.get("id"),
-                    "name": p.get("product_name", p.get("name", "Unknown")),
-                    "price": float(p.get("cost", p.get("price", 0))),
-                    "quantity": int(p.get("available_quantity", p.get("quantity", 0))),
-                    "category": p.get("category", ""),
-                    "is_available": p.get("is_available", True),
-                    "image_url": p.get("image", None)
-                }
-                self.products.append(product_data)
-                
-                # Load product image if available
-                if product_data["image_url"]:
-                    self.load_product_image(product_data["id"], product_data["image_url"])
-                    
-            return True
-        except requests.exceptions.RequestException as e:
+            return response.headers.get("ETag"), response.json()
+
+        def apply(result):
+            if result is not None:
+                self.products_etag, products = result
+                self.products = []
+                for p in products:
+                    product_data = {
+                        "id": p.get("id"),
+                        "name": p.get("product_name", p.get("name", "Unknown")),
+                        "price": float(p.get("cost", p.get("price", 0))),
+                        "quantity": int(p.get("available_quantity", p.get("quantity", 0))),
+                        "category": p.get("category", ""),
+                        "is_available": p.get("is_available", True),
+                        # Prefer the server-side 80px thumbnail over the full-size upload
+                        "image_url": p.get("thumbnail") or p.get("image"),
+                        "fallback_url": p.get("image")
+                    }
+                    self.products.append(product_data)
+
+                    # Load product image if available
+                    if product_data["image_url"]:
+                        self.load_product_image(product_data["id"], product_data["image_url"],
+                                                product_data["fallback_url"])
+            if on_success:
+                on_success()
+
+        def failed(error):
             if show_errors:
                 messagebox.showerror("Connection Error", 
-                                   f"Cannot connect to Django server.\nError: {str(e)}")
-            return False
+                                   f"Cannot connect to Django server.\nError: {str(error)}")
+            if on_error:
+                on_error()
+
+        if self.jobs.running("products"):
+            # A fetch (e.g. a quiet refresh) is already on its way: wait for
+            # its result rather than dropping this caller's callbacks
+            return self.jobs.attach("products", lambda result: on_success and on_success(), failed,
+                                    cancellable=cancellable)
+        return self.jobs.submit("products", request, apply, failed,
+                                label="Loading products", cancellable=cancellable)
+
+    def load_product_image(self, product_id, image_url, fallback_url=None):
+        """Queue a thumbnail fetch on the image pool (returns immediately)
+
+        If image_url cannot be fetched, fallback_url (the original upload) is
+        tried before settling for the placeholder.
+        """
+        if not (image_url and image_url.startswith('http')):
+            # Create a default image placeholder
+            self.create_default_image(product_id)
+            return
 
-    def load_product_image(self, product_id, image_url):
+        if self.product_image_urls.get(product_id) == image_url and product_id in self.product_images:
+            # Already decoded for this URL; nothing to download
+            return
+        self.product_image_urls[product_id] = image_url
+
+        def fetch():
+            image = None
+            for url in dict.fromkeys(u for u in (image_url, fallback_url) if u):
+                try:
+                    image = self.thumbnails.fetch(url)
+                    break
+                except Exception as e:
+                    print(f"Error loading image {url} for product {product_id}: {e}")
+            self.image_results.put((product_id, image_url, image))
+
+        self.image_executor.submit(fetch)
+
+    def process_image_results(self):
+        """Turn fetched thumbnails into PhotoImages on the Tk thread"""
         try:
-            if image_url and image_url.startswith('http'):
-                response = requests.get(image_url, timeout=10)
-                if response.status_code == 200:
-                    image_data = response.content
-                    image = Image.open(io.BytesIO(image_data))
-                    image = image.resize((80, 80), Image.Resampling.LANCZOS)
-                    photo = ImageTk.PhotoImage(image)
-                    self.product_images[product_id] = photo
-            else:
-                # Create a default image placeholder
-                self.create_default_image(product_id)
-        except Exception as e:
-            print(f"Error loading image for product {product_id}: {e}")
-            self.create_default_image(product_id)
+            while True:
+                product_id, image_url, image = self.image_results.get_nowait()
+                if self.product_image_urls.get(product_id) != image_url:
+                    continue  # superseded by a newer URL
+                if image is None:
+                    self.create_default_image(product_id)
+                else:
+                    self.product_images[product_id] = ImageTk.PhotoImage(image)
+
+                label = self.image_labels.get(product_id)
+                if label is not None and label.winfo_exists() and product_id in self.product_images:
+                    label.configure(image=self.product_images[product_id], text="")
+        except queue.Empty:
+            pass
+        self.root.after(50, self.process_image_results)
+
+    # ---------- Live events ----------
+    def events_wanted(self):
+        """True while a screen that applies events (product grid, admin dashboard) is shown"""
+        if self.product_grid is not None and self.product_grid.exists():
+            return True
+        return bool(self.admin_tree and self.admin_tree.winfo_exists())
+
+    def poll_events(self):
+        """Long-poll /api/events/ and apply what changed; re-arms itself while events_wanted()"""
+        since = self.events_since
+        if since is not None and not self.events_wanted():
+            # Stop holding a server thread; the next grid or dashboard resumes
+            # from events_since, so nothing published meanwhile is lost
+            return
+
+        def request():
+            params = {"since": since, "timeout": EVENTS_WAIT} if since is not None else {}
+            response = self.api.get(API_EVENTS, params=params, timeout=EVENTS_WAIT + 10)
+            response.raise_for_status()
+            return response.json()
+
+        def apply(result):
+            try:
+                if since is not None:
+                    if result.get("reset"):
+                        # Too far behind to replay; reload whatever is on screen
+                        self.reload_products()
+                        self.refresh_transactions(full=True, quiet=True)
+                    else:
+                        self.apply_events(result.get("events", []))
+            finally:
+                # Move past these events and keep listening even if applying them failed
+                self.events_since = result.get("last_id")
+                if result.get("retry_after"):
+                    # Every long-poll slot on the server is taken; ask again later
+                    self.root.after(int(result["retry_after"] * 1000), self.poll_events)
+                else:
+                    self.poll_events()
+
+        def failed(error):
+            print(f"Event stream error: {error}")
+            self.root.after(EVENTS_RETRY_MS, self.poll_events)
+
+        self.jobs.submit("events", request, apply, failed, label=None, cancellable=False)
+
+    def apply_events(self, events):
+        products = {prod['id']: prod for prod in self.products}
+        stock_updated = False
+        reload_catalogue = False
+
+        for event in events:
+            data = event.get("data", {})
+            if event.get("type") == "stock":
+                prod = products.get(data.get("product_id"))
+                if prod is None:
+                    reload_catalogue = True
+                    continue
+                prod['quantity'] = data.get("available_quantity", prod['quantity'])
+                prod['is_available'] = data.get("is_available", prod['is_available'])
+                stock_updated = True
+            elif event.get("type") == "session":
+                self.add_transaction_row(data)
+            elif event.get("type") == "catalogue":
+                reload_catalogue = True
+
+        if reload_catalogue:
+            self.reload_products()
+        elif stock_updated:
+            self.show_products_changed()
+
+    def reload_products(self):
+        """Quietly refetch the catalogue (a 304 if nothing changed) and update the screen"""
+        self.fetch_products(on_success=self.show_products_changed)
+
+    def show_products_changed(self):
+        """Push self.products into whichever product views are on screen, in place"""
+        if self.product_grid is not None and self.product_grid.exists():
+            self.sync_cart_vars()
+            self.product_grid.set_products(self.products)
+            self.update_total_cost()
+        if self.product_tree and self.product_tree.winfo_exists():
+            self.populate_product_tree()
 
     def create_default_image(self, product_id):
         """Create a default placeholder image"""
@@ -237,111 +921,24 @@ class VendingGUI:
         cart_frame.pack(side="right", fill="y", padx=(10, 0), pady=10, ipadx=10)
 
         self.create_cart_section(cart_frame)
+        self.poll_events()
 
     def create_products_grid(self, parent):
-        # Canvas and scrollbar for products
-        canvas = tk.Canvas(parent, bg=BG_COLOR, highlightthickness=0)
-        scrollbar = tk.Scrollbar(parent, orient="vertical", command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas, bg=BG_COLOR)
-
-        scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-
-        canvas.pack(side="left", fill="both", expand=True, padx=5, pady=5)
-        scrollbar.pack(side="right", fill="y")
-
         self.cart = {}
         self.total_cost = 0
+        self.sync_cart_vars()
 
-        # Create product cards in a grid
-        row, col = 0, 0
-        max_cols = 3  # 3 products per row
-        
-        for i, prod in enumerate(self.products):
-            if not prod['is_available'] or prod['quantity'] <= 0:
-                continue
-                
-            product_card = self.create_product_card(scrollable_frame, prod, i)
-            product_card.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
-            
-            col += 1
-            if col >= max_cols:
-                col = 0
-                row += 1
+        # Only the visible rows get card widgets
+        self.product_grid = VirtualProductGrid(parent, self)
+        self.product_grid.set_products(self.products)
 
-        # Configure grid weights for responsive layout
-        for i in range(max_cols):
-            scrollable_frame.grid_columnconfigure(i, weight=1)
-
-    def create_product_card(self, parent, product, index):
-        bg_color = ROW_ODD if index % 2 == 0 else ROW_EVEN
-        card = tk.Frame(parent, bg=bg_color, relief="raised", bd=1, width=200, height=180)
-        
-        # Product image
-        image_frame = tk.Frame(card, bg=bg_color)
-        image_frame.pack(pady=5)
-        
-        if product['id'] in self.product_images:
-            img_label = tk.Label(image_frame, image=self.product_images[product['id']], bg=bg_color, cursor="hand2")
-        else:
-            img_label = tk.Label(image_frame, text="🖼️", font=("Arial", 20), bg=bg_color, cursor="hand2")
-        img_label.pack()
-        
-        # Product info
-        info_frame = tk.Frame(card, bg=bg_color)
-        info_frame.pack(fill="x", pady=5)
-        
-        # Product name (clickable)
-        name_label = tk.Label(info_frame, text=product['name'], bg=bg_color, 
-                font=("Arial", 10, "bold"), wraplength=180, cursor="hand2")
-        name_label.pack()
-        
-        tk.Label(info_frame, text=f"Rs {product['price']:.2f}", bg=bg_color,
-                font=("Arial", 9, "bold"), fg=SUCCESS_COLOR).pack()
-        
-        stock_text = f"Stock: {product['quantity']}"
-        stock_color = ACCENT_COLOR if product['quantity'] == 0 else PRIMARY_COLOR
-        tk.Label(info_frame, text=stock_text, bg=bg_color, font=("Arial", 8), fg=stock_color).pack()
-        
-        # Quantity controls
-        control_frame = tk.Frame(card, bg=bg_color)
-        control_frame.pack(pady=5)
-        
-        qty_var = tk.IntVar(value=0)
-        
-        def decrease_qty():
-            if qty_var.get() > 0:
-                qty_var.set(qty_var.get() - 1)
-        
-        def increase_qty():
-            if qty_var.get() < product['quantity']:
-                qty_var.set(qty_var.get() + 1)
-        
-        tk.Button(control_frame, text="➖", command=decrease_qty, 
-                 bg=ACCENT_COLOR, fg="white", font=("Arial", 8), width=3).pack(side="left")
-        
-        qty_label = tk.Label(control_frame, textvariable=qty_var, bg="white", 
-                           width=3, relief="sunken", font=("Arial", 9))
-        qty_label.pack(side="left", padx=2)
-        
-        tk.Button(control_frame, text="➕", command=increase_qty,
-                 bg=SUCCESS_COLOR, fg="white", font=("Arial", 8), width=3).pack(side="left")
-        
-        # Add click functionality to product name and image
-        def on_product_click(event):
-            if product['quantity'] > 0:
-                current_qty = qty_var.get()
-                qty_var.set(current_qty + 1)
-        
-        img_label.bind("<Button-1>", on_product_click)
-        name_label.bind("<Button-1>", on_product_click)
-        qty_label.bind("<Button-1>", on_product_click)
-        
-        self.cart[product['id']] = qty_var
-        qty_var.trace_add("write", lambda *args: self.update_total_cost())
-        
-        return card
+    def sync_cart_vars(self):
+        """Give every product in the catalogue a quantity variable"""
+        for prod in self.products:
+            if prod['id'] not in self.cart:
+                qty_var = tk.IntVar(value=0)
+                qty_var.trace_add("write", lambda *args: self.update_total_cost())
+                self.cart[prod['id']] = qty_var
 
     def create_cart_section(self, parent):
         # Total cost display
@@ -418,9 +1015,16 @@ class VendingGUI:
         self.cart_text.config(state="disabled")
 
     def refresh_student(self):
-        if not self.fetch_products(show_errors=True):
-            return
-        self.show_student_interface()
+        def apply():
+            if self.product_grid is not None and self.product_grid.exists():
+                # Update the existing cards in place instead of rebuilding the screen
+                self.sync_cart_vars()
+                self.product_grid.set_products(self.products)
+                self.update_total_cost()
+            else:
+                self.show_student_interface()
+
+        self.fetch_products(on_success=apply, show_errors=True)
 
     def process_purchase(self):
         selected_items = []
@@ -464,37 +1068,47 @@ class VendingGUI:
         payload = {
             "customer": self.student_name,
             "items": selected_items,
-            "deposited_amount": money_inserted
+            "deposited_amount": money_inserted,
+            # The notes themselves, so the server can add them to its change float
+            "inserted": {str(denom): var.get() for denom, var in self.denom_vars.items() if var.get() > 0}
         }
+        # Snapshot the cart now; the receipt must match what was sent
+        receipt_items = [(prod['name'], self.cart[prod['id']].get(), prod['price'])
+                         for prod in self.products if self.cart[prod['id']].get() > 0]
 
-        try:
+        def request():
             print(f"Sending purchase request: {payload}")  # Debug
-            response = requests.post(API_PURCHASE, json=payload, timeout=10)
+            response = self.api.post(API_PURCHASE, json=payload, timeout=10)
             print(f"Response status: {response.status_code}")  # Debug
             print(f"Response content: {response.text}")  # Debug
-            
-            if response.status_code not in [200, 201]:
-                error_data = response.json()
-                error_msg = error_data.get('error', 'Purchase failed')
+            try:
+                data = response.json()
+            except ValueError:
+                data = {}
+            return response.status_code, data
+
+        def completed(result):
+            status_code, data = result
+            if status_code not in [200, 201]:
+                error_msg = data.get('error', 'Purchase failed')
                 messagebox.showerror("Purchase Failed", f"Error: {error_msg}")
                 self.refresh_student()
                 return
 
-            data = response.json()
             change = data.get('change_returned', 0)
             
             # Build receipt
             receipt_lines = ["🎉 PURCHASE SUCCESSFUL!\n"]
             receipt_lines.append("=" * 40)
-            for prod in self.products:
-                qty = self.cart[prod['id']].get()
-                if qty > 0:
-                    receipt_lines.append(f"{prod['name']} x{qty}")
-                    receipt_lines.append(f"  Rs {prod['price'] * qty:.2f}")
+            for name, qty, price in receipt_items:
+                receipt_lines.append(f"{name} x{qty}")
+                receipt_lines.append(f"  Rs {price * qty:.2f}")
             receipt_lines.append("=" * 40)
             receipt_lines.append(f"TOTAL: Rs {total_cost:.2f}")
             receipt_lines.append(f"PAID: Rs {money_inserted:.2f}")
             receipt_lines.append(f"CHANGE: Rs {change:.2f}")
+            for denom, count in data.get('change_breakdown', {}).items():
+                receipt_lines.append(f"  Rs {denom} x{count}")
             receipt_lines.append("\nThank you! 👋")
             
             messagebox.showinfo("Purchase Complete", "\n".join(receipt_lines))
@@ -504,12 +1118,23 @@ class VendingGUI:
                 var.set(0)
             for var in self.denom_vars.values():
                 var.set(0)
-            self.update_total_cost()
+            if self.total_label.winfo_exists():
+                self.update_total_cost()
             self.refresh_student()
 
-        except requests.exceptions.RequestException as e:
+        def failed(error):
             messagebox.showerror("Connection Error", 
-                               f"Cannot process purchase:\n{str(e)}")
+                               f"Cannot process purchase:\n{str(error)}")
+
+        def finished():
+            if self.purchase_btn.winfo_exists():
+                self.purchase_btn.config(state="normal", text="🚀 PURCHASE NOW")
+
+        # A purchase is never cancelled or sent twice; the button stays
+        # disabled until the server has answered
+        if self.jobs.submit("purchase", request, completed, failed, finished,
+                            label="Processing purchase", cancellable=False):
+            self.purchase_btn.config(state="disabled", text="⏳ Processing...")
 
     # ---------- Admin ----------
     def admin_login(self):
@@ -535,7 +1160,12 @@ class VendingGUI:
         button_frame = tk.Frame(header_frame, bg=HEADER_BG)
         button_frame.pack(side="right", padx=10, pady=5)
         
-        self.create_styled_button(button_frame, "🔄 Refresh", self.refresh_admin, 
+        self.auto_refresh_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(button_frame, text="Auto-refresh", variable=self.auto_refresh_var,
+                      command=self.schedule_auto_refresh, bg=HEADER_BG, fg=HEADER_FG,
+                      selectcolor=PRIMARY_COLOR, activebackground=HEADER_BG,
+                      font=("Arial", 9)).pack(side="left", padx=5)
+        self.create_styled_button(button_frame, "🔄 Refresh", lambda: self.refresh_admin(full=True), 
                                  bg=INFO_COLOR, width=12).pack(side="left", padx=5)
         self.create_styled_button(button_frame, "⬅ Back", self.show_role_selection, 
                                  bg=ACCENT_COLOR, width=10).pack(side="left", padx=5)
@@ -555,6 +1185,7 @@ class VendingGUI:
         self.setup_transactions_view(transactions_frame)
 
         self.refresh_admin()
+        self.poll_events()
 
     def setup_products_management(self, parent):
         # Control buttons frame
@@ -576,6 +1207,7 @@ class VendingGUI:
 
         columns = ("ID", "Name", "Price", "Quantity", "Category", "Available")
         self.product_tree = ttk.Treeview(tree_frame, columns=columns, show="headings", height=15)
+        self.product_rows = {}
         
         for col in columns:
             self.product_tree.heading(col, text=col)
@@ -597,6 +1229,8 @@ class VendingGUI:
 
         columns = ("ID", "Customer", "Total", "Deposited", "Change", "Items", "Date")
         self.admin_tree = ttk.Treeview(tree_frame, columns=columns, show="headings", height=20)
+        self.transaction_rows = {}
+        self.transactions_cursor = None
         
         # Configure columns
         col_widths = {"ID": 60, "Customer": 120, "Total": 80, "Deposited": 80, 
@@ -612,69 +1246,127 @@ class VendingGUI:
         self.admin_tree.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
-    def refresh_admin(self):
-        self.refresh_products()
-        self.refresh_transactions()
-
-    def refresh_products(self):
+    def refresh_admin(self, full=False, quiet=False):
+        self.refresh_products(quiet=quiet)
+        self.refresh_transactions(full=full, quiet=quiet)
+
+    def schedule_auto_refresh(self):
+        if self.auto_refresh_job is not None:
+            self.root.after_cancel(self.auto_refresh_job)
+            self.auto_refresh_job = None
+        if self.auto_refresh_var is not None and self.auto_refresh_var.get():
+            self.auto_refresh_job = self.root.after(ADMIN_REFRESH_MS, self.auto_refresh)
+
+    def auto_refresh(self):
+        self.auto_refresh_job = None
+        if not (self.admin_tree and self.admin_tree.winfo_exists()):
+            return  # left the dashboard; the timer stops here
+        # Incremental and silent: 304s for unchanged tables, new sessions only
+        self.refresh_admin(quiet=True)
+        self.schedule_auto_refresh()
+
+    def refresh_products(self, quiet=False):
         if not self.product_tree:
             return
-            
-        for item in self.product_tree.get_children():
-            self.product_tree.delete(item)
-            
-        if not self.fetch_products(show_errors=True):
+
+        def populate():
+            if self.product_tree.winfo_exists():
+                self.populate_product_tree()
+
+        self.fetch_products(on_success=populate, show_errors=not quiet)
+
+    def populate_product_tree(self):
+        rows = [(str(prod['id']), (
+            prod['id'],
+            prod['name'],
+            f"Rs {prod['price']:.2f}",
+            prod['quantity'],
+            prod['category'],
+            "Yes" if prod['is_available'] else "No"
+        )) for prod in self.products]
+        self.sync_tree(self.product_tree, rows, self.product_rows)
+
+    def add_transaction_row(self, trans):
+        """Put one new session at the top of the transaction log"""
+        if not (self.admin_tree and self.admin_tree.winfo_exists()) or self.transactions_cursor is None:
+            return  # the next full load will include it
+        iid = str(trans.get('id'))
+        if iid in self.transaction_rows:
             return
-            
-        for prod in self.products:
-            self.product_tree.insert("", "end", values=(
-                prod['id'],
-                prod['name'],
-                f"Rs {prod['price']:.2f}",
-                prod['quantity'],
-                prod['category'],
-                "Yes" if prod['is_available'] else "No"
-            ))
-
-    def refresh_transactions(self):
+        values = self.transaction_row(trans)
+        self.admin_tree.insert("", 0, iid=iid, values=values)
+        self.transaction_rows[iid] = values
+        if isinstance(trans.get('id'), int):
+            self.transactions_cursor = max(self.transactions_cursor, trans['id'])
+
+    def transaction_row(self, trans):
+        # Format items
+        items_text = ", ".join([f"{item.get('product_name', 'Unknown')} x{item.get('quantity', 0)}" 
+                              for item in trans.get('items', [])])
+        
+        # Format timestamp
+        timestamp = trans.get('timestamp', '')
+        if timestamp:
+            try:
+                dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+                timestamp = dt.strftime("%Y-%m-%d %H:%M")
+            except:
+                pass
+        
+        return (
+            trans.get('id', ''),
+            trans.get('customer', ''),
+            f"Rs {trans.get('total_amount', 0):.2f}",
+            f"Rs {trans.get('deposited_amount', 0):.2f}",
+            f"Rs {trans.get('change_returned', 0):.2f}",
+            items_text,
+            timestamp
+        )
+
+    def refresh_transactions(self, full=False, quiet=False):
+        """
+        Fetch only sessions newer than the last one shown (?since_id=)
+        and add them at the top. full=True reloads the whole history and
+        diffs it against the tree, which also drops deleted sessions.
+        """
         if not self.admin_tree:
             return
-            
-        for item in self.admin_tree.get_children():
-            self.admin_tree.delete(item)
-            
-        try:
-            response = requests.get(API_TRANSACTIONS, timeout=10)
+
+        incremental = not full and self.transactions_cursor is not None
+        params = {"since_id": self.transactions_cursor} if incremental else {}
+        headers = {}
+        if incremental and self.transactions_etag:
+            headers["If-None-Match"] = self.transactions_etag
+
+        def request():
+            response = self.api.get(API_TRANSACTIONS, params=params, headers=headers, timeout=10)
+            if response.status_code == 304:
+                # No new transactions; keep the rows already shown
+                return None
             response.raise_for_status()
-            transactions = response.json()
-            
-            for trans in transactions:
-                # Format items
-                items_text = ", ".join([f"{item.get('product_name', 'Unknown')} x{item.get('quantity', 0)}" 
-                                      for item in trans.get('items', [])])
-                
-                # Format timestamp
-                timestamp = trans.get('timestamp', '')
-                if timestamp:
-                    try:
-                        dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                        timestamp = dt.strftime("%Y-%m-%d %H:%M")
-                    except:
-                        pass
-                
-                self.admin_tree.insert("", "end", values=(
-                    trans.get('id', ''),
-                    trans.get('customer', ''),
-                    f"Rs {trans.get('total_amount', 0):.2f}",
-                    f"Rs {trans.get('deposited_amount', 0):.2f}",
-                    f"Rs {trans.get('change_returned', 0):.2f}",
-                    items_text,
-                    timestamp
-                ))
-                
-        except requests.exceptions.RequestException as e:
-            messagebox.showerror("Connection Error", 
-                               f"Cannot fetch transactions:\n{str(e)}")
+            return response.headers.get("ETag"), response.json()
+
+        def populate(result):
+            if result is None or not self.admin_tree.winfo_exists():
+                return
+            self.transactions_etag, transactions = result
+            ids = [trans['id'] for trans in transactions if isinstance(trans.get('id'), int)]
+
+            if incremental:
+                # Newest first from the server; insert oldest first at the top
+                for trans in reversed(transactions):
+                    self.add_transaction_row(trans)
+            else:
+                rows = [(str(trans.get('id')), self.transaction_row(trans)) for trans in transactions]
+                self.sync_tree(self.admin_tree, rows, self.transaction_rows)
+                self.transactions_cursor = max(ids, default=0)
+
+        def failed(error):
+            if not quiet:
+                messagebox.showerror("Connection Error", 
+                                   f"Cannot fetch transactions:\n{str(error)}")
+
+        self.jobs.submit("transactions", request, populate, failed, label="Loading transactions")
 
     def add_product(self):
         self.show_product_dialog()
@@ -708,16 +1400,26 @@ class VendingGUI:
         product_name = item['values'][1]
         product_id = item['values'][0]
         
-        if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete '{product_name}'?"):
-            try:
-                response = requests.delete(f"{API_PRODUCTS}{product_id}/", timeout=5)
-                if response.status_code == 204:
-                    messagebox.showinfo("Success", f"Product '{product_name}' deleted successfully")
-                    self.refresh_products()
-                else:
-                    messagebox.showerror("Error", f"Failed to delete product: {response.text}")
-            except requests.exceptions.RequestException as e:
-                messagebox.showerror("Connection Error", f"Cannot delete product:\n{str(e)}")
+        if not messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete '{product_name}'?"):
+            return
+
+        def request():
+            response = self.api.delete(f"{API_PRODUCTS}{product_id}/", timeout=5)
+            return response.status_code, response.text
+
+        def completed(result):
+            status_code, text = result
+            if status_code == 204:
+                messagebox.showinfo("Success", f"Product '{product_name}' deleted successfully")
+                self.refresh_products()
+            else:
+                messagebox.showerror("Error", f"Failed to delete product: {text}")
+
+        def failed(error):
+            messagebox.showerror("Connection Error", f"Cannot delete product:\n{str(error)}")
+
+        self.jobs.submit(f"delete-{product_id}", request, completed, failed,
+                         label=f"Deleting {product_name}", cancellable=False)
 
     def show_product_dialog(self, product_data=None):
         dialog = tk.Toplevel(self.root)
@@ -765,25 +1467,39 @@ class VendingGUI:
                     "category": category_var.get(),
                     "is_available": available_var.get()
                 }
+            except ValueError:
+                messagebox.showerror("Invalid Input", "Please enter valid numbers for price and quantity")
+                return
 
+            def request():
                 if product_data:
                     # Update existing product
-                    response = requests.put(f"{API_PRODUCTS}{product_data['id']}/", json=data, timeout=10)
+                    response = self.api.put(f"{API_PRODUCTS}{product_data['id']}/", json=data, timeout=10)
                 else:
                     # Create new product
-                    response = requests.post(API_PRODUCTS, json=data, timeout=10)
-
-                if response.status_code in [200, 201]:
+                    response = self.api.post(API_PRODUCTS, json=data, timeout=10)
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = {}
+                return response.status_code, body
+
+            def completed(result):
+                status_code, body = result
+                if status_code in [200, 201]:
                     messagebox.showinfo("Success", "Product saved successfully")
-                    dialog.destroy()
+                    if dialog.winfo_exists():
+                        dialog.destroy()
                     self.refresh_products()
                 else:
-                    error_msg = response.json().get('error', 'Failed to save product')
+                    error_msg = body.get('error', 'Failed to save product')
                     messagebox.showerror("Error", f"Failed to save product: {error_msg}")
-            except ValueError:
-                messagebox.showerror("Invalid Input", "Please enter valid numbers for price and quantity")
-            except requests.exceptions.RequestException as e:
-                messagebox.showerror("Connection Error", f"Cannot save product:\n{str(e)}")
+
+            def failed(error):
+                messagebox.showerror("Connection Error", f"Cannot save product:\n{str(error)}")
+
+            self.jobs.submit("save-product", request, completed, failed,
+                             label="Saving product", cancellable=False)
 
         button_frame = tk.Frame(dialog, bg=BG_COLOR)
         button_frame.pack(pady=20)
@@ -811,4 +1527,9 @@ if __name__ == "__main__":
     
     app = VendingGUI(root)
     root.mainloop()
+    app.jobs.shutdown()
+
+    # Per-endpoint latency for this run
+    if LATENCY_REPORT:
+        print(app.api.latency_summary())
 
@@ -1,5 +1,7 @@
 from pathlib import Path
 import os
+import sys
+import tempfile
 import dj_database_url
 
 
@@ -30,6 +32,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  
+    'machine_app.metrics.MetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -39,6 +42,17 @@ MIDDLEWARE = [
 ]
 
 
+# Session storage: 'cached_db' (default; reads come from the cache, writes
+# go through to the database), 'signed_cookies' (no server-side storage
+# at all) or 'db'. The cart kept in the session is a small {id: qty} map.
+# cached_db uses the file-based 'sessions' cache below, which every
+# gunicorn worker on the machine shares; a per-process cache would serve
+# stale sessions as soon as there is more than one worker.
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'cached_db')
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_BACKEND}'
+SESSION_CACHE_ALIAS = 'sessions'
+
+
 ROOT_URLCONF = 'vending_machine_project.urls'
 WSGI_APPLICATION = 'vending_machine_project.wsgi.application'
 
@@ -74,6 +88,77 @@ if os.environ.get('DATABASE_URL'):
         conn_max_age=600
     )
 
+# Tests use a file rather than SQLite's shared in-memory database, so
+# tests that write from several threads lock the way production does.
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['TEST'] = {'NAME': BASE_DIR / 'test_db.sqlite3'}
+
+# SQLite production profile (machine_app/sqlite_tuning.py): PRAGMAs run on
+# every new connection and purchases start with BEGIN IMMEDIATE.
+# SQLITE_TUNING=0 restores SQLite's defaults. WAL mode is stored in the
+# database file, so it stays on until journal_mode is changed back.
+SQLITE_TUNING = os.environ.get('SQLITE_TUNING', '1') == '1'
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),  # ms
+    'synchronous': 'NORMAL',
+    'cache_size': -int(os.environ.get('SQLITE_CACHE_KB', 16000)),  # negative = KiB
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_BYTES', 64 * 1024 * 1024)),
+}
+# Keep each thread's connection open between requests, so the PRAGMAs
+# and the page cache are not thrown away after every request
+if SQLITE_TUNING and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('SQLITE_CONN_MAX_AGE', 600))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Write-behind purchase journal (machine_app/journal.py). When on, checkouts
+# are answered once they are fsync'd to the local journal and a background
+# thread writes them to the database in batches. The journal belongs to one
+# process, so run gunicorn with a single worker (threads are fine).
+PURCHASE_JOURNAL = os.environ.get('PURCHASE_JOURNAL', '0') == '1'
+PURCHASE_JOURNAL_PATH = os.environ.get('PURCHASE_JOURNAL_PATH', os.path.join(BASE_DIR, 'journal', 'purchases.log'))
+PURCHASE_JOURNAL_BATCH = int(os.environ.get('PURCHASE_JOURNAL_BATCH', 200))
+PURCHASE_JOURNAL_INTERVAL = float(os.environ.get('PURCHASE_JOURNAL_INTERVAL', 1.0))  # seconds
+
+
+# Product catalogue cache. Use "file" (default) or "sqlite" when several
+# gunicorn workers must share one catalogue; "locmem" is per-process only.
+CATALOGUE_CACHE = os.environ.get('CATALOGUE_CACHE', 'file')
+CATALOGUE_CACHE_ALIAS = 'catalogue'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'sessions'),
+    },
+}
+
+if CATALOGUE_CACHE == 'sqlite':
+    CACHES['catalogue'] = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'catalogue_cache',
+    }
+elif CATALOGUE_CACHE == 'locmem':
+    CACHES['catalogue'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalogue',
+    }
+else:
+    CACHES['catalogue'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'catalogue'),
+    }
+
+# manage.py test gets in-process caches, so a test run never writes
+# entries that the live server (sharing BASE_DIR/cache) would read
+TESTING = sys.argv[1:2] == ['test']
+if TESTING:
+    CACHES['catalogue'] = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-catalogue'}
+    CACHES['sessions'] = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-sessions'}
+
 
 AUTH_PASSWORD_VALIDATORS = []
 
@@ -92,6 +177,45 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Browser cache lifetime for media without a content hash in the name
+MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', 60 * 60))
+
+# Live events (/api/events/): events kept in memory, and the longest a
+# long-poll may wait. Each waiting client holds a gunicorn thread, so only
+# EVENTS_MAX_WAITERS may wait at once per worker (render.yaml runs 8
+# threads); the rest are answered at once and told to retry after
+# EVENTS_BUSY_RETRY seconds.
+EVENT_LOG_SIZE = int(os.environ.get('EVENT_LOG_SIZE', 1000))
+EVENTS_MAX_WAIT = int(os.environ.get('EVENTS_MAX_WAIT', 25))
+EVENTS_MAX_WAITERS = int(os.environ.get('EVENTS_MAX_WAITERS', 4))
+EVENTS_BUSY_RETRY = int(os.environ.get('EVENTS_BUSY_RETRY', 5))
+
+# Per-view request metrics (machine_app/metrics.py), served at /metrics.
+# The counters are kept in a memory-mapped file shared by every gunicorn
+# worker; each worker process takes one of METRICS_MAX_PROCESSES regions.
+# The file name gets the layout checksum added (cache/metrics-<crc>.bin).
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_FILE = os.environ.get('METRICS_FILE', os.path.join(BASE_DIR, 'cache', 'metrics.bin'))
+METRICS_MAX_PROCESSES = int(os.environ.get('METRICS_MAX_PROCESSES', 32))
+if TESTING:
+    # Never add test requests to the live server's counters
+    METRICS_FILE = os.path.join(tempfile.gettempdir(), 'vending-test-metrics.bin')
+
+# machine_app logs (purchase journal, checkouts) go to the console, as the
+# gunicorn logs on Render
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'machine_app': {
+            'handlers': ['console'],
+            'level': os.environ.get('MACHINE_APP_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
 
 if not os.path.exists(MEDIA_ROOT):
     os.makedirs(MEDIA_ROOT)
@@ -1,9 +1,8 @@
 from django.contrib import admin
 from django.urls import path, include
-from django.conf import settings
-from django.views.static import serve
 from django.urls import re_path
 from machine_app import api
+from machine_app.media import serve_media
 
 
 from django.contrib.auth.models import User
@@ -20,7 +19,5 @@ urlpatterns = [
 
 
 urlpatterns += [
-    re_path(r'^media/(?P<path>.*)$', serve, {
-        'document_root': settings.MEDIA_ROOT,
-    }),
+    re_path(r'^media/(?P<path>.*)$', serve_media, name='media'),
 ]
\ No newline at end of file
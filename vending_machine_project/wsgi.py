@@ -4,3 +4,9 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vending_machine_project.settings')
 application = get_wsgi_application()
+
+# Replay any checkouts left in the purchase journal before serving requests
+from django.conf import settings  # noqa: E402
+if settings.PURCHASE_JOURNAL:
+    from machine_app.journal import purchase_journal  # noqa: E402
+    purchase_journal()